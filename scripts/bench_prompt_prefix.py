@@ -0,0 +1,120 @@
+"""Benchmark Ollama prefill time with and without prompt-prefix (KV cache) reuse.
+
+The same questions are sent (non-streaming) in three modes, and Ollama's
+prompt_eval_count / prompt_eval_duration are read back from the LLMResponse.
+These are the prompt tokens actually evaluated and the time spent on them.
+Tokens served from the cached prefix are not counted.
+
+    generate      PROMPT_LAYOUT=generate: one text prompt via /api/generate
+                  (question before context)
+    chat          PROMPT_LAYOUT=chat: /api/chat, fixed system message and
+                  instructions first, context and question last
+    chat-nocache  chat layout with a unique marker at the start of the system
+                  message, so no prefix can be reused (baseline for "chat")
+
+Usage:
+    python -m scripts.bench_prompt_prefix [--rounds 3] [--num-predict 16]
+
+Requires a running Ollama and a built index (contexts come from the retriever).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from typing import Dict, List, Tuple
+
+from src.core.config import get_settings
+from src.rag.context_builder import build_context
+from src.rag.llm_clients import ChatPrompt, OllamaClient, Prompt
+from src.rag.retriever import Retriever
+from src.rag.service import _build_chat_prompt, _build_prompt
+
+QUESTIONS = [
+    "Как восстановить доступ к аккаунту?",
+    "Какие признаки подозрительной активности?",
+    "Какие правила у пунктов выдачи (ПВЗ)?",
+    "Как оформить возврат товара?",
+    "Сколько хранится заказ в пункте выдачи?",
+]
+
+MODES = ("generate", "chat", "chat-nocache")
+
+
+def _prompt(mode: str, question: str, context: str) -> Prompt:
+    """Prompt of the given benchmark mode."""
+    if mode == "generate":
+        return _build_prompt(question, context)
+    prompt = _build_chat_prompt(question, context)
+    if mode == "chat-nocache":
+        return ChatPrompt(system=f"[{uuid.uuid4().hex}] {prompt.system}", user=prompt.user)
+    return prompt
+
+
+async def _send(client: OllamaClient, prompt: Prompt) -> Tuple[int, float]:
+    """Run one request; return (evaluated prompt tokens, prefill ms)."""
+    resp = await client.generate_response(prompt, timeout_s=300.0)
+    return resp.prompt_tokens or 0, (resp.prefill_s or 0.0) * 1000
+
+
+async def _run_mode(
+    client: OllamaClient,
+    mode: str,
+    contexts: Dict[str, str],
+    rounds: int,
+) -> List[Tuple[int, float]]:
+    """Warm up once, then send every question `rounds` times."""
+    q0 = QUESTIONS[0]
+    await _send(client, _prompt(mode, q0, contexts[q0]))
+    samples = []
+    for _ in range(rounds):
+        for q in QUESTIONS:
+            samples.append(await _send(client, _prompt(mode, q, contexts[q])))
+    return samples
+
+
+async def _bench(client: OllamaClient, contexts: Dict[str, str], rounds: int) -> None:
+    """Print one row of prefill stats per mode."""
+    try:
+        for mode in MODES:
+            t0 = time.perf_counter()
+            samples = await _run_mode(client, mode, contexts, rounds)
+            wall = time.perf_counter() - t0
+            tokens = [t for t, _ in samples]
+            prefill = [ms for _, ms in samples]
+            print(
+                f"{mode:<14} {len(samples):>8} {statistics.mean(tokens):>12.0f} "
+                f"{statistics.median(prefill):>15.1f} {statistics.mean(prefill):>8.1f} {wall:>8.1f}"
+            )
+    finally:
+        await client.aclose()
+
+
+def main() -> None:
+    """Print prefill stats per prompt layout."""
+    parser = argparse.ArgumentParser(description="Measure Ollama prefill with and without prefix reuse.")
+    parser.add_argument("--rounds", type=int, default=3, help="Times each question is sent per mode.")
+    parser.add_argument("--num-predict", type=int, default=16, help="Generated tokens per request (keep small).")
+    args = parser.parse_args()
+
+    settings = get_settings()
+    retriever = Retriever()
+    contexts = {
+        q: build_context(retriever.search(q, top_k=settings.top_k), max_tokens=settings.context_max_tokens)
+        for q in QUESTIONS
+    }
+
+    client = OllamaClient()
+    # No hedging: the counters come from non-streamed responses.
+    client.hedging = False
+    client.num_predict = args.num_predict
+    print(f"model={client.model} host={client.base_url} questions={len(QUESTIONS)} rounds={args.rounds}")
+    print(f"{'mode':<14} {'requests':>8} {'eval tokens':>12} {'prefill ms p50':>15} {'mean':>8} {'wall s':>8}")
+    asyncio.run(_bench(client, contexts, args.rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -2,29 +2,75 @@
 
 Example:
     python -m scripts.build_index
+    python -m scripts.build_index --index-type hnsw --hnsw-m 32
+    python -m scripts.build_index --index-type ivfpq --nlist 1024 --pq-bits 8
+    python -m scripts.build_index --incremental
+    python -m scripts.build_index --incremental --calibrate-relevance
 """
 from pathlib import Path
+import argparse
 import json
+from dataclasses import replace
 from datetime import datetime
 
+from typing import List, Optional
+
 from src.core.config import get_settings
-from src.ingest.pipeline import build_chunks
+from src.ingest.chunker import Chunk
+from src.ingest.loader import iter_source_paths, load_document
+from src.ingest.pipeline import build_chunks, chunk_document, file_sha256
 from src.ingest.embedder_hf import HFEmbedder
-from src.index.faiss_store import ChunkRecord, FaissStore
+from src.ingest.embedding_cache import EmbeddingCache
+from src.ingest.faq_extractor import FAQPair, extract_faq_pairs
+from src.index.chunk_store import ChunkColumns
+from src.index.faq_store import FAQ_ENTRIES_FILE, FAQ_INDEX_FILE, FAQEntry, FAQStore
+from src.index.faiss_store import INDEX_TYPES, ChunkRecord, FaissStore, IndexParams
+from src.index.manifest import diff_manifest, load_manifest, save_manifest
+from src.rag.relevance import OFF_TOPIC_PROBES, calibrate_min_score
 
 
-def main():
-    """Create embeddings and persist the FAISS index files."""
-    settings = get_settings()
-    index_dir = Path(settings.index_dir)
+def parse_args(argv=None) -> argparse.Namespace:
+    """Parse CLI overrides for index type and build parameters."""
+    p = argparse.ArgumentParser(description="Build FAISS index from DOCS_DIR.")
+    p.add_argument("--index-type", choices=INDEX_TYPES, default=None, help="Index type (default: INDEX_TYPE).")
+    p.add_argument("--nlist", type=int, default=None, help="IVF lists (0 = auto).")
+    p.add_argument("--hnsw-m", type=int, default=None, help="HNSW graph degree M.")
+    p.add_argument("--ef-construction", type=int, default=None, help="HNSW efConstruction.")
+    p.add_argument("--pq-m", type=int, default=None, help="PQ subquantizers (0 = auto).")
+    p.add_argument("--pq-bits", type=int, default=None, help="PQ bits per code.")
+    p.add_argument("--train-size", type=int, default=None, help="Max vectors sampled for IVF/PQ training.")
+    p.add_argument("--no-embed-cache", action="store_true", help="Do not use the on-disk embedding cache.")
+    p.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Re-embed only new/changed files (per-file hash manifest); full build if not possible.",
+    )
+    p.add_argument(
+        "--calibrate-relevance",
+        action="store_true",
+        help="Derive the relevance gate threshold from off-topic probe queries (stored in index_meta.json).",
+    )
+    return p.parse_args(argv)
 
-    chunks = build_chunks(settings)
-    if not chunks:
-        print("No chunks found. Put docs into data/sample_docs first.")
-        return
 
-    texts = [c.text for c in chunks]
-    records = [
+def index_params_from_args(settings, args: argparse.Namespace) -> IndexParams:
+    """Merge CLI overrides on top of settings-based index parameters."""
+    params = IndexParams.from_settings(settings)
+    overrides = {
+        "index_type": args.index_type,
+        "nlist": args.nlist,
+        "hnsw_m": args.hnsw_m,
+        "hnsw_ef_construction": args.ef_construction,
+        "pq_m": args.pq_m,
+        "pq_bits": args.pq_bits,
+        "train_size": args.train_size,
+    }
+    return replace(params, **{k: v for k, v in overrides.items() if v is not None})
+
+
+def _to_records(chunks: List[Chunk]) -> List[ChunkRecord]:
+    """Convert ingestion chunks into persisted chunk records."""
+    return [
         ChunkRecord(
             source_path=c.source_path,
             chunk_id=c.chunk_id,
@@ -35,40 +81,280 @@ def main():
         for c in chunks
     ]
 
-    print(f"Chunks: {len(records)}")
+
+def _embed(settings, texts: List[str], use_cache: bool):
+    """Embed texts, loading the model only for texts missing from the cache."""
     print(f"Embedding model: {settings.embedding_model_name}")
+    embedder: Optional[HFEmbedder] = None
 
-    embedder = HFEmbedder(settings.embedding_model_name)
-    vectors = embedder.embed_texts(texts)
-    print(f"Vectors: {vectors.shape} dtype={vectors.dtype}")
+    def encode(batch: List[str]):
+        nonlocal embedder
+        if embedder is None:
+            embedder = HFEmbedder(settings.embedding_model_name)
+        return embedder.embed_texts(batch)
 
-    store = FaissStore.build(vectors=vectors, records=records)
-    store.save(index_dir)
+    if not (use_cache and settings.embedding_cache_enabled):
+        return encode(texts)
+
+    cache = EmbeddingCache(Path(settings.embedding_cache_dir), settings.embedding_model_name)
+    vectors = cache.embed(texts, encode)
+    st = cache.stats()
+    print(f"Embedding cache: hits={st['hits']} misses={st['misses']} rows={st['rows']} ({cache.dir})")
+    return vectors
 
-    # --- index passport (metadata) -----------
+
+def _scan_docs(settings) -> dict[str, str]:
+    """Return {source_path: sha256} for all supported files in DOCS_DIR."""
+    return {str(p): file_sha256(p) for p in iter_source_paths(Path(settings.docs_dir))}
+
+
+def _read_meta(index_dir: Path) -> Optional[dict]:
+    """Read index_meta.json if present and valid."""
+    meta_path = index_dir / "index_meta.json"
+    if not meta_path.exists():
+        return None
+    try:
+        return json.loads(meta_path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def _write_meta(index_dir: Path, settings, store: FaissStore, created_at: str, **extra) -> None:
+    """Write the index passport (index_meta.json)."""
     meta = {
-        "created_at": datetime.now().isoformat(),
+        "created_at": created_at,
         "embedding_model_name": settings.embedding_model_name,
         "docs_dir": settings.docs_dir,
         "chunk_size": settings.chunk_size,
         "chunk_overlap": settings.chunk_overlap,
-        "total_chunks": len(records),
-        "vector_dim": int(vectors.shape[1]),
+        "total_chunks": len(store.records),
+        "vector_dim": int(store.index.d),
+        "index": store.index_meta(),
     }
+    meta.update(extra)
+
+    (index_dir / "index_meta.json").write_text(
+        json.dumps(meta, ensure_ascii=False, indent=2),
+        encoding="utf-8",
+    )
 
+
+def _faq_chunk_id(records: ChunkColumns, pair: FAQPair) -> int:
+    """chunk_id of the indexed chunk that contains the FAQ question (-1 if none)."""
+    for row in records.rows_for_sources([pair.source_path]).tolist():
+        if pair.question in records.text_at(row):
+            return int(records[row].chunk_id)
+    return -1
+
+
+def build_faq(settings, index_dir: Path, use_cache: bool = True) -> int:
+    """Extract Q/A pairs from Markdown docs and save the FAQ question index.
+
+    Always rebuilt from scratch: it is small and question embeddings come
+    from the embedding cache.
+    """
+    pairs: List[FAQPair] = []
+    for path in iter_source_paths(Path(settings.docs_dir)):
+        if path.suffix.lower() == ".md":
+            doc = load_document(path)
+            pairs.extend(extract_faq_pairs(doc.source_path, doc.text))
+    if not pairs:
+        FAQStore.remove(index_dir)
+        return 0
+
+    records = ChunkColumns.open(index_dir)
+    entries = [FAQEntry(p.source_path, _faq_chunk_id(records, p), p.question, p.answer) for p in pairs]
+    vectors = _embed(settings, [p.question for p in pairs], use_cache)
+    FAQStore.build(vectors, entries).save(index_dir)
+    return len(entries)
+
+
+def calibrate_relevance(settings, index_dir: Path) -> Optional[dict]:
+    """Search the saved index with off-topic probes and store the gate threshold."""
+    meta = _read_meta(index_dir)
+    if meta is None:
+        print("Relevance calibration skipped: index_meta.json is missing.")
+        return None
+    store = FaissStore.load(index_dir)
+    vectors = HFEmbedder(settings.embedding_model_name).embed_texts(list(OFF_TOPIC_PROBES))
+    scores, rows = store.search_rows(vectors, k=1)
+    top1 = [float(s[0]) for s, r in zip(scores, rows) if r[0] != -1]
+
+    relevance = {
+        "min_score": calibrate_min_score(top1),
+        "method": "p95 of off-topic probe top-1 scores + 0.02",
+        "probes": len(top1),
+        "probe_max": round(max(top1), 4) if top1 else None,
+        "calibrated_at": datetime.now().isoformat(),
+    }
+    meta["relevance"] = relevance
     (index_dir / "index_meta.json").write_text(
         json.dumps(meta, ensure_ascii=False, indent=2),
         encoding="utf-8",
     )
-    # -----------------------------------------
+    print(f"Relevance gate: min_score={relevance['min_score']} (off-topic max={relevance['probe_max']})")
+    return relevance
+
+
+def build_full(settings, params: IndexParams, index_dir: Path, use_cache: bool = True) -> bool:
+    """Chunk and embed all of DOCS_DIR and overwrite the index."""
+    hashes = _scan_docs(settings)
+    chunks = build_chunks(settings)
+    if not chunks:
+        print("No chunks found. Put docs into data/sample_docs first.")
+        return False
+
+    texts = [c.text for c in chunks]
+    records = _to_records(chunks)
+
+    print(f"Chunks: {len(records)}")
+    vectors = _embed(settings, texts, use_cache)
+    print(f"Vectors: {vectors.shape} dtype={vectors.dtype}")
+
+    print(f"Index type: {params.index_type}")
+    # id_map keeps vector ids stable so later --incremental runs can drop/add per file.
+    store = FaissStore.build(vectors=vectors, records=records, params=params, id_map=True)
+    store.save(index_dir)
+    _write_meta(index_dir, settings, store, created_at=datetime.now().isoformat())
+    save_manifest(index_dir, hashes)
+    return True
+
+
+def _index_params_change(params: IndexParams, built: dict) -> Optional[str]:
+    """Describe how the requested index parameters differ from the built index (None if they match).
+
+    `params` is the effective configuration (settings/env plus CLI overrides).
+    Auto values (nlist=0, pq_m=0) match whatever the full build chose.
+    """
+    built_type = built.get("type", "flat")
+    if params.index_type != built_type:
+        return f"index type changed ({built_type} -> {params.index_type})"
+    wanted = {}
+    if params.index_type in ("ivf", "ivfpq") and params.nlist:
+        wanted["nlist"] = params.nlist
+    if params.index_type == "ivfpq":
+        if params.pq_m:
+            wanted["pq_m"] = params.pq_m
+        wanted["pq_bits"] = params.pq_bits
+    if params.index_type == "hnsw":
+        wanted.update(M=params.hnsw_m, efConstruction=params.hnsw_ef_construction)
+    for key, value in wanted.items():
+        if key in built and built[key] != value:
+            return f"index {key} changed ({built[key]!r} -> {value!r})"
+    return None
+
+
+def _incremental_blocker(settings, params: IndexParams, index_dir: Path, meta: Optional[dict]) -> Optional[str]:
+    """Return why an incremental update is not possible (None if it is)."""
+    if not (index_dir / "faiss.index").exists() or not (index_dir / "chunks.jsonl").exists():
+        return "index files not found"
+    if meta is None:
+        return "index_meta.json is missing"
+    if load_manifest(index_dir) is None:
+        return "manifest.json is missing"
+    for key in ("embedding_model_name", "chunk_size", "chunk_overlap"):
+        if meta.get(key) != getattr(settings, key):
+            return f"{key} changed ({meta.get(key)!r} -> {getattr(settings, key)!r})"
+    return _index_params_change(params, meta.get("index") or {})
+
+
+def build_incremental(settings, index_dir: Path, use_cache: bool = True) -> bool:
+    """Update the index in place for added/changed/removed files.
+
+    Returns:
+        False if the existing index cannot be updated (caller rebuilds).
+    """
+    meta = _read_meta(index_dir) or {}
+    store = FaissStore.load(index_dir)
+    if not store.supports_updates:
+        print(f"Index type '{store.params.index_type}' cannot drop vectors; full rebuild required.")
+        return False
+    train_size = (meta.get("index") or {}).get("train_size")
+    if isinstance(train_size, int):
+        # Not recoverable from the FAISS file: keep what the full build recorded.
+        store.params = replace(store.params, train_size=train_size)
+
+    old_hashes = load_manifest(index_dir) or {}
+    new_hashes = _scan_docs(settings)
+    diff = diff_manifest(old_hashes, new_hashes)
+    print(
+        f"Files: +{len(diff.added)} added, ~{len(diff.changed)} changed, "
+        f"-{len(diff.removed)} removed, ={len(diff.unchanged)} unchanged"
+    )
+    if diff.is_empty:
+        print("Index is up to date.")
+        return True
+
+    dropped = store.remove_sources(diff.changed + diff.removed)
+
+    chunks: List[Chunk] = []
+    for path in diff.added + diff.changed:
+        doc = load_document(Path(path))
+        if doc.text.strip():
+            chunks.extend(chunk_document(doc, settings))
+
+    if chunks:
+        vectors = _embed(settings, [c.text for c in chunks], use_cache)
+        store.add(vectors, _to_records(chunks))
+
+    print(f"Chunks: -{dropped} dropped, +{len(chunks)} added, total={len(store.records)}")
+    if store.params.index_type in ("ivf", "ivfpq"):
+        # Quantizers are not retrained; rebuild after large corpus shifts.
+        print("Note: IVF centroids were trained on the original corpus.")
+
+    store.save(index_dir)
+    _write_meta(
+        index_dir,
+        settings,
+        store,
+        created_at=meta.get("created_at") or datetime.now().isoformat(),
+        updated_at=datetime.now().isoformat(),
+        **({"relevance": meta["relevance"]} if "relevance" in meta else {}),
+        last_update={
+            "added": len(diff.added),
+            "changed": len(diff.changed),
+            "removed": len(diff.removed),
+            "chunks_dropped": dropped,
+            "chunks_added": len(chunks),
+        },
+    )
+    save_manifest(index_dir, new_hashes)
+    return True
+
+
+def main(argv=None):
+    """Create embeddings and persist the FAISS index files."""
+    args = parse_args(argv)
+    settings = get_settings()
+    index_dir = Path(settings.index_dir)
+    params = index_params_from_args(settings, args)
+    use_cache = not args.no_embed_cache
+
+    done = False
+    if args.incremental:
+        blocker = _incremental_blocker(settings, params, index_dir, _read_meta(index_dir))
+        if blocker:
+            print(f"Incremental update not possible: {blocker}. Running full build.")
+        else:
+            done = build_incremental(settings, index_dir, use_cache=use_cache)
+
+    if not done and not build_full(settings, params, index_dir, use_cache=use_cache):
+        return
+    faq_pairs = build_faq(settings, index_dir, use_cache=use_cache) if settings.faq_index_enabled else 0
+    print(f"FAQ pairs: {faq_pairs}")
+    if args.calibrate_relevance:
+        calibrate_relevance(settings, index_dir)
 
     print(f"Saved index to: {index_dir.resolve()}")
     print("Files:")
     print(f" - {index_dir / 'faiss.index'}")
     print(f" - {index_dir / 'chunks.jsonl'}")
     print(f" - {index_dir / 'index_meta.json'}")
+    print(f" - {index_dir / 'manifest.json'}")
+    if faq_pairs:
+        print(f" - {index_dir / FAQ_INDEX_FILE}")
+        print(f" - {index_dir / FAQ_ENTRIES_FILE}")
 
 
 if __name__ == "__main__":
     main()
-    
\ No newline at end of file
@@ -42,8 +42,7 @@ async def main():
             question=q,
             tools=tools,
             max_steps=4,
-            llm_timeout_s=90.0,
-            retry_once=True,
+            llm_timeout_s=settings.llm_timeout_s,
         )
         print("tool:", steps[0].tool)
         if steps[0].tool == "search_docs":
@@ -17,7 +17,6 @@ from src.rag.llm_clients import OllamaClient
 async def main() -> None:
     """Run a short MCP-backed agent demo."""
     settings = get_settings()
-    _ = settings
 
     # TOOL_BACKEND toggles MCP usage in the main app, kept for parity in demos.
     os.environ["TOOL_BACKEND"] = "mcp"
@@ -46,8 +45,7 @@ async def main() -> None:
             question=q,
             tools=tools,
             max_steps=4,
-            llm_timeout_s=90.0,
-            retry_once=True,
+            llm_timeout_s=settings.llm_timeout_s,
         )
         print("tool:", steps[0].tool)
         if steps[0].tool == "search_docs":
@@ -0,0 +1,65 @@
+"""Smoke test for mmap loading of every index type (INDEX_MMAP=true).
+
+Builds a small random index of each type, saves it, loads it back with
+mmap=True and checks that the index was actually mapped (no silent heap
+fallback) and that search results match a regular in-memory load.
+"""
+
+from __future__ import annotations
+
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from src.index.faiss_store import INDEX_TYPES, ChunkRecord, FaissStore, IndexParams
+
+EXPECTED_MODE = {"flat": "mmap_ifc", "hnsw": "mmap_ifc", "ivf": "mmap", "ivfpq": "mmap"}
+
+
+def assert_true(condition: bool, message: str) -> None:
+    """Raise AssertionError with a message if condition is false."""
+    if not condition:
+        raise AssertionError(message)
+
+
+def _data(n: int = 2000, d: int = 32) -> tuple[np.ndarray, list[ChunkRecord]]:
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((n, d)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    records = [ChunkRecord(f"doc{i // 10}.md", i % 10, 0, 10, f"text {i}") for i in range(n)]
+    return vectors, records
+
+
+def check_round_trip(index_type: str, id_map: bool) -> None:
+    """save -> load(mmap=True) for one index type; results must match a heap load."""
+    vectors, records = _data()
+    params = IndexParams(index_type=index_type, nlist=16, pq_m=8, train_size=2000)
+    store = FaissStore.build(vectors, records, params=params, id_map=id_map)
+    with tempfile.TemporaryDirectory() as tmp:
+        dir_path = Path(tmp)
+        store.save(dir_path)
+        heap = FaissStore.load(dir_path, mmap=False)
+        mapped = FaissStore.load(dir_path, mmap=True)
+        expected = EXPECTED_MODE[index_type]
+        assert_true(
+            mapped.load_mode in (expected, "mmap"),
+            f"{index_type}: load_mode={mapped.load_mode}, expected {expected}",
+        )
+        queries = vectors[:5]
+        for q in queries:
+            a = [(h.record.source_path, h.record.chunk_id) for h in heap.search(q, k=5)]
+            b = [(h.record.source_path, h.record.chunk_id) for h in mapped.search(q, k=5)]
+            assert_true(a == b, f"{index_type}: mmap results differ from heap load")
+    print(f"OK: {index_type:<6} id_map={id_map!s:<5} load_mode={mapped.load_mode}")
+
+
+def main() -> None:
+    """Run the round trip for every index type, with and without id maps."""
+    for index_type in INDEX_TYPES:
+        for id_map in (False, True):
+            check_round_trip(index_type, id_map)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Smoke test for RetrievalExecutor backlog accounting.
+
+Queued tasks that are cancelled (request deadline, client disconnect) must
+free their slot; otherwise the executor ends up rejecting all retrieval.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+
+from src.rag.retrieval_executor import RetrievalExecutor, RetrievalOverloaded
+
+
+def assert_true(condition: bool, message: str) -> None:
+    """Raise AssertionError with a message if condition is false."""
+    if not condition:
+        raise AssertionError(message)
+
+
+def check_cancel_while_queued() -> None:
+    """One blocking task, one queued task; cancelling the queued one frees its slot."""
+    ex = RetrievalExecutor(max_workers=1, max_queue=1)
+    release = threading.Event()
+    blocker = ex.submit(release.wait)
+    queued = ex.submit(lambda: "never")
+    try:
+        ex.submit(lambda: None)
+        raise AssertionError("third task should be rejected while the backlog is full")
+    except RetrievalOverloaded:
+        pass
+
+    assert_true(queued.cancel(), "queued future should be cancellable")
+    assert_true(ex.stats()["queued"] == 0, f"slot not freed after cancel: {ex.stats()}")
+    release.set()
+    blocker.result(timeout=5)
+    assert_true(ex.submit(lambda: 42).result(timeout=5) == 42, "executor should accept work again")
+    stats = ex.stats()
+    assert_true(stats["queued"] == 0 and stats["in_flight"] == 0, f"counters leaked: {stats}")
+    assert_true(stats["cancelled"] == 1, f"cancelled count wrong: {stats}")
+    ex.shutdown()
+    print("OK: cancel while queued ->", stats)
+
+
+async def _check_asyncio_timeouts() -> None:
+    """Timed-out run_in_executor awaits (the Retriever.asearch path) must not leak slots."""
+    ex = RetrievalExecutor(max_workers=1, max_queue=2)
+    release = threading.Event()
+    loop = asyncio.get_running_loop()
+    blocker = loop.run_in_executor(ex, release.wait)
+    for _ in range(10):
+        try:
+            await asyncio.wait_for(loop.run_in_executor(ex, lambda: "late"), timeout=0.01)
+        except asyncio.TimeoutError:
+            pass
+    release.set()
+    await blocker
+    assert_true(await loop.run_in_executor(ex, lambda: 7) == 7, "executor should accept work again")
+    stats = ex.stats()
+    assert_true(stats["queued"] == 0 and stats["in_flight"] == 0, f"counters leaked: {stats}")
+    ex.shutdown()
+    print("OK: asyncio timeouts ->", stats)
+
+
+def main() -> None:
+    """Run all executor checks."""
+    check_cancel_while_queued()
+    asyncio.run(_check_asyncio_timeouts())
+
+
+if __name__ == "__main__":
+    main()
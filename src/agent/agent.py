@@ -9,13 +9,18 @@ The design favors robustness over strict JSON-only behavior.
 
 from __future__ import annotations
 
-import asyncio
 import json
 import re
+from contextlib import aclosing
 from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
+from src.core.deadline import with_deadline
+from src.core.errors import DeadlineExceeded, ServiceOverloaded
 from src.core.logging import get_logger
+from src.core.resilience import CircuitOpen
+from src.rag.llm_clients import ChatPrompt, Prompt
+from src.rag.relevance import NO_ANSWER, gate as relevance_gate
 from src.agent.tools import ToolRegistry, ToolError
 
 log = get_logger(__name__)
@@ -165,6 +170,17 @@ def _build_user_prompt_final(question: str, memory: List[Tuple[str, str]]) -> st
     return "\n".join(parts)
 
 
+def _build_user_prompt_final_chat(question: str, memory: List[Tuple[str, str]]) -> str:
+    """User message for the chat layout: fixed instruction first, observations and question last."""
+    parts = ["Сгенерируй финальный ответ по наблюдениям ниже.\n"]
+    if memory:
+        parts.append("Наблюдения (результаты инструментов):\n")
+        for role, content in memory:
+            parts.append(f"[{role}]\n{content}\n")
+    parts.append(f"Вопрос:\n{question}")
+    return "\n".join(parts)
+
+
 # --- best-effort extraction for broken JSON-in-string cases
 _ANSWER_FIELD_RE = re.compile(r'"answer"\s*:\s*"(.*)"\s*}\s*$', re.DOTALL)
 
@@ -198,7 +214,7 @@ def _fallback_from_search_hits(tool_result: Dict[str, Any]) -> str:
     """Return a minimal answer from top search hit if the LLM fails."""
     hits = tool_result.get("hits")
     if not isinstance(hits, list) or not hits:
-        return "В базе документов нет релевантного ответа по этому вопросу."
+        return NO_ANSWER
 
     h0 = hits[0] if isinstance(hits[0], dict) else {}
     src = h0.get("source_path") or "unknown_source"
@@ -217,24 +233,19 @@ def _fallback_from_search_hits(tool_result: Dict[str, Any]) -> str:
 # Section: Main agent
 # ---------------------------------------------------------------------------
 # The loop is intentionally minimal and deterministic for demo stability.
-async def run_agent(
-    *,
-    llm_generate,  # async callable(prompt:str, timeout_s:float)->str
+async def _run_tool_step(
     question: str,
     tools: ToolRegistry,
-    max_steps: int = 4,
-    llm_timeout_s: float = 60.0,
-    retry_once: bool = True,
-) -> Tuple[str, List[AgentStep]]:
-    """Run the two-step MVP agent with safe fallbacks.
-
-    Steps:
-        1) Auto-route to a tool: math -> calc, otherwise -> search_docs.
-        2) Ask the LLM to provide a final answer using observations.
+    min_score: Optional[float] = None,
+) -> Tuple[List[AgentStep], str, Dict[str, Any], Optional[str]]:
+    """Step 1: auto-route to a tool and call it.
+
+    Returns:
+        (steps, tool_name, tool_result, final_answer). final_answer is set when
+        the LLM step can be skipped (successful calc, or no search hit scoring
+        at least min_score).
     """
-    _ = max_steps  # сейчас шагов всегда 2; оставляем параметр для совместимости
     steps: List[AgentStep] = []
-    memory: List[Tuple[str, str]] = []
 
     async def call_tool(tool_name: str, args: Dict[str, Any]) -> Dict[str, Any]:
         """Call a tool with guardrails around input size and timeouts."""
@@ -245,7 +256,8 @@ async def run_agent(
             if isinstance(v, str) and len(v) > 2000:
                 # Hard limits keep tool payloads safe against prompt injection abuse.
                 raise ToolError("Tool argument too large.")
-        return await asyncio.wait_for(spec.handler(args), timeout=spec.timeout_s)
+        # Tool timeout, further capped by the request deadline.
+        return await with_deadline(spec.handler(args), f"tool:{tool_name}", cap=spec.timeout_s)
 
     # --- Step 1: auto tool routing (reliable) ---
     if _looks_like_math(question) and tools.get("calc"):
@@ -261,6 +273,8 @@ async def run_agent(
 
     try:
         tool_result = await call_tool(tool_name, tool_args)
+    except DeadlineExceeded:
+        raise
     except Exception as e:
         tool_result = {"error": str(e)}
 
@@ -271,39 +285,98 @@ async def run_agent(
         formatted = tool_result.get("formatted")
         value = tool_result.get("value")
         out = formatted if isinstance(formatted, str) and formatted.strip() else (str(value) if value is not None else "")
-        out = out.strip()
         steps.append(AgentStep(step=2, llm_raw="<skipped>", action="final_from_calc"))
-        return out if out else "", steps
+        return steps, tool_name, tool_result, out.strip()
+
+    # Nothing on topic: answer "no relevant answer" without an LLM call.
+    hits = tool_result.get("hits") if tool_name == "search_docs" and isinstance(tool_result, dict) else None
+    if isinstance(hits, list):
+        scores = (float(h.get("score", 0.0)) for h in hits if isinstance(h, dict))
+        if relevance_gate(scores, min_score, "agent"):
+            steps.append(AgentStep(step=2, llm_raw="<skipped>", action="final_no_relevant_hits"))
+            return steps, tool_name, tool_result, NO_ANSWER
 
+    return steps, tool_name, tool_result, None
+
+
+def _build_final_prompt(
+    question: str,
+    tool_name: str,
+    tool_result: Dict[str, Any],
+    prompt_layout: str = "generate",
+) -> Prompt:
+    """Build the step-2 prompt from the question and the tool observation.
+
+    "generate" layout: one text prompt; "chat": a ChatPrompt with the fixed
+    system prompt as its own message (see PROMPT_LAYOUT).
+    """
     # Keep memory compact to avoid blowing the prompt token budget.
     obs_payload = {"tool": tool_name, "result": _compact_hits(tool_result)}
-    memory.append(("observation", json.dumps(obs_payload, ensure_ascii=False)))
+    memory: List[Tuple[str, str]] = [("observation", json.dumps(obs_payload, ensure_ascii=False))]
 
-    # --- Step 2: LLM final only (best-effort, never crash demo) ---
     system = _build_system_prompt_final_only()
+    if prompt_layout == "chat":
+        return ChatPrompt(system=system, user=_build_user_prompt_final_chat(question, memory))
     user = _build_user_prompt_final(question, memory)
-    prompt = f"{system}\n\n{user}"
+    return f"{system}\n\n{user}"
+
+
+def _fallback_answer(tool_name: str, tool_result: Dict[str, Any]) -> str:
+    """Answer used when the LLM returned nothing."""
+    if tool_name == "search_docs" and isinstance(tool_result, dict):
+        return _fallback_from_search_hits(tool_result)
+    if isinstance(tool_result, dict) and tool_result.get("error"):
+        return f"Ошибка инструмента: {tool_result['error']}"
+    return "Не удалось получить ответ: LLM не вернул результат."
+
+
+async def run_agent(
+    *,
+    llm_generate,  # async callable(prompt:str|ChatPrompt, timeout_s:float)->str
+    question: str,
+    tools: ToolRegistry,
+    max_steps: int = 4,
+    llm_timeout_s: float = 60.0,
+    min_score: Optional[float] = None,
+    prompt_layout: str = "generate",
+) -> Tuple[str, List[AgentStep]]:
+    """Run the two-step MVP agent with safe fallbacks.
+
+    Steps:
+        1) Auto-route to a tool: math -> calc, otherwise -> search_docs.
+        2) Ask the LLM to provide a final answer using observations
+           (skipped if no search hit scores at least `min_score`).
+    """
+    _ = max_steps  # сейчас шагов всегда 2; оставляем параметр для совместимости
+    steps, tool_name, tool_result, final = await _run_tool_step(question, tools, min_score)
+    if final is not None:
+        return final, steps
+
+    # --- Step 2: LLM final only (best-effort, never crash demo) ---
+    prompt = _build_final_prompt(question, tool_name, tool_result, prompt_layout)
 
     llm_raw = ""
     last_err: Optional[Exception] = None
 
-    for attempt in (1, 2) if retry_once else (1,):
-        try:
-            llm_raw = await llm_generate(prompt, timeout_s=llm_timeout_s)
-            llm_raw = (llm_raw or "").strip()
-            if llm_raw:
-                break
-        except Exception as e:
-            last_err = e
-            log.warning("LLM failed%s: %s", " (retry once)" if attempt == 1 and retry_once else "", repr(e))
+    # Transient LLM failures are retried by the client (backoff + retry budget +
+    # circuit breaker); here a failure goes straight to the search-hit fallback.
+    try:
+        llm_raw = await llm_generate(prompt, timeout_s=llm_timeout_s)
+        llm_raw = (llm_raw or "").strip()
+    except CircuitOpen as e:
+        # Backend is down: degrade to the search-hit fallback right away.
+        last_err = e
+        log.warning("LLM circuit open: %s", e)
+    except (ServiceOverloaded, DeadlineExceeded):
+        # Shed by admission control or out of time: surface 429/503/504 instead of a fallback.
+        raise
+    except Exception as e:
+        last_err = e
+        log.warning("LLM failed: %s", repr(e))
 
     if not llm_raw:
         steps.append(AgentStep(step=2, llm_raw=f"<llm_failed:{repr(last_err)}>", action="final_fallback_no_llm"))
-        if tool_name == "search_docs" and isinstance(tool_result, dict):
-            return _fallback_from_search_hits(tool_result), steps
-        if isinstance(tool_result, dict) and tool_result.get("error"):
-            return f"Ошибка инструмента: {tool_result['error']}", steps
-        return "Не удалось получить ответ: LLM не вернул результат.", steps
+        return _fallback_answer(tool_name, tool_result), steps
 
     # Пытаемся разобрать JSON только как "бонус", но никогда не падаем из-за формата.
     try:
@@ -333,3 +406,47 @@ async def run_agent(
 
     # Иначе просто вернём как есть (plain text)
     return llm_raw.strip(), steps
+
+
+async def run_agent_stream(
+    *,
+    llm_stream,  # callable(prompt:str|ChatPrompt, timeout_s:float)->AsyncIterator[str]
+    question: str,
+    tools: ToolRegistry,
+    llm_timeout_s: float = 60.0,
+    min_score: Optional[float] = None,
+    prompt_layout: str = "generate",
+) -> AsyncIterator[Tuple[str, Any]]:
+    """Streaming variant of `run_agent`.
+
+    Yields `(event, data)` pairs:
+        ("tool", AgentStep)   after step 1 (observation available for sources)
+        ("token", str)        LLM fragments as they arrive
+        ("final", str)        full answer (also for calc / fallback paths)
+
+    Step 2 is streamed as plain text, so the JSON post-processing of
+    `run_agent` is not applied; the system prompt already asks for text.
+    """
+    steps, tool_name, tool_result, final = await _run_tool_step(question, tools, min_score)
+    yield "tool", steps[0]
+    if final is not None:
+        yield "final", final
+        return
+
+    prompt = _build_final_prompt(question, tool_name, tool_result, prompt_layout)
+    parts: List[str] = []
+    try:
+        async with aclosing(llm_stream(prompt, timeout_s=llm_timeout_s)) as pieces:
+            async for piece in pieces:
+                parts.append(piece)
+                yield "token", piece
+    except (ServiceOverloaded, DeadlineExceeded):
+        raise
+    except Exception as e:
+        log.warning("LLM stream failed after %d fragments: %s", len(parts), repr(e))
+        if parts:
+            raise
+    answer = "".join(parts).strip()
+    if not answer:
+        answer = _fallback_answer(tool_name, tool_result)
+    yield "final", answer
@@ -2,10 +2,12 @@
 
 from __future__ import annotations
 
+import asyncio
 from typing import Any, Dict, Optional
 
-from src.agent.tool_impl import search_docs_impl, calc_impl
+from src.agent.tool_impl import asearch_docs_impl, calc_impl
 from src.agent.tools import ToolRegistry, ToolSpec
+from src.core.config import get_settings
 from src.core.logging import get_logger
 from src.mcp.client import MCPClient
 from src.rag.retriever import Retriever
@@ -27,6 +29,7 @@ def build_tool_registry(
         retriever: Retriever for local search tools.
         mcp_client: MCP client for remote tool calls.
     """
+    settings = get_settings()
     tools = ToolRegistry()
     backend_norm = (backend or "local").lower()
 
@@ -34,11 +37,13 @@ def build_tool_registry(
         if mcp_client is None:
             raise ValueError("MCP client is required for MCP backend.")
 
+        # The MCP client is blocking (urllib): run it in a thread so the tool
+        # timeout/deadline can actually fire; the deadline context is copied along.
         async def tool_search_docs(args: Dict[str, Any]) -> Dict[str, Any]:
-            return mcp_client.call_tool("search_docs", args)
+            return await asyncio.to_thread(mcp_client.call_tool, "search_docs", args)
 
         async def tool_calc(args: Dict[str, Any]) -> Dict[str, Any]:
-            return mcp_client.call_tool("calc", args)
+            return await asyncio.to_thread(mcp_client.call_tool, "calc", args)
 
         # MCP keeps tools isolated from the app process and is toggled via TOOL_BACKEND.
         log.info("Tool backend configured: mcp")
@@ -48,7 +53,7 @@ def build_tool_registry(
                 return {"error": "Index is not ready. Run: python scripts/build_index.py"}
             query = str(args.get("query", ""))
             top_k = args.get("top_k", 5)
-            return search_docs_impl(retriever, query=query, top_k=top_k)
+            return await asearch_docs_impl(retriever, query=query, top_k=top_k)
 
         async def tool_calc(args: Dict[str, Any]) -> Dict[str, Any]:
             expression = str(args.get("expression", ""))
@@ -69,7 +74,7 @@ def build_tool_registry(
                 "required": ["query"],
             },
             handler=tool_search_docs,
-            timeout_s=2.0,
+            timeout_s=settings.tool_search_timeout_s,
         )
     )
 
@@ -83,7 +88,7 @@ def build_tool_registry(
                 "required": ["expression"],
             },
             handler=tool_calc,
-            timeout_s=1.0,
+            timeout_s=settings.tool_calc_timeout_s,
         )
     )
 
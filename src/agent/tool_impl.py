@@ -2,9 +2,10 @@
 
 from __future__ import annotations
 
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Tuple
 
 from src.agent.calc import safe_calc, CalcError
+from src.index.faiss_store import SearchHit
 from src.rag.retriever import Retriever
 
 
@@ -19,19 +20,22 @@ MAX_TEXT_CHARS = 2000
 MAX_EXPR_LEN = 200
 
 
-def search_docs_impl(retriever: Retriever, query: str, top_k: int = 5) -> Dict[str, Any]:
-    """Search documents with size limits to keep responses safe and bounded."""
+def _prepare_search(query: str, top_k: int) -> Tuple[str, int, Optional[Dict[str, Any]]]:
+    """Validate search args; return (query, top_k, error_payload)."""
     q = (query or "").strip()
     if len(q) > MAX_QUERY_LEN:
-        return {"error": f"Query too long (max {MAX_QUERY_LEN} chars)."}
+        return q, 0, {"error": f"Query too long (max {MAX_QUERY_LEN} chars)."}
 
     try:
         top_k_int = int(top_k)
     except (TypeError, ValueError):
         top_k_int = 5
 
-    top_k_int = max(1, min(top_k_int, MAX_TOP_K))
-    hits = retriever.search(q, top_k=top_k_int)
+    return q, max(1, min(top_k_int, MAX_TOP_K)), None
+
+
+def _format_hits(hits: List[SearchHit]) -> Dict[str, Any]:
+    """Convert hits into the bounded tool response payload."""
     limited_hits = hits[: min(MAX_HITS, len(hits))]
 
     return {
@@ -47,6 +51,22 @@ def search_docs_impl(retriever: Retriever, query: str, top_k: int = 5) -> Dict[s
     }
 
 
+def search_docs_impl(retriever: Retriever, query: str, top_k: int = 5) -> Dict[str, Any]:
+    """Search documents with size limits to keep responses safe and bounded."""
+    q, top_k_int, err = _prepare_search(query, top_k)
+    if err:
+        return err
+    return _format_hits(retriever.search(q, top_k=top_k_int))
+
+
+async def asearch_docs_impl(retriever: Retriever, query: str, top_k: int = 5) -> Dict[str, Any]:
+    """Async variant of `search_docs_impl` for request handlers."""
+    q, top_k_int, err = _prepare_search(query, top_k)
+    if err:
+        return err
+    return _format_hits(await retriever.asearch(q, top_k=top_k_int))
+
+
 def calc_impl(expression: str) -> Dict[str, Any]:
     """Safely evaluate a math expression with strict length limits."""
     expr = (expression or "").strip()
@@ -6,28 +6,56 @@ It intentionally keeps runtime behavior simple and explicit for demos.
 
 from __future__ import annotations
 
+import asyncio
+import json
 import os
+import time
+from contextlib import aclosing
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, AsyncIterator, Optional
 
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
 from src.core.config import get_settings
-from src.core.errors import unhandled_exception_handler
+from src.core.deadline import tighten_deadline
+from src.core.disconnect import CLIENT_DISCONNECTS, cancel_on_disconnect
+from src.core.errors import (
+    ClientDisconnected,
+    DeadlineExceeded,
+    ServiceOverloaded,
+    client_disconnected_handler,
+    deadline_exceeded_handler,
+    service_overloaded_handler,
+    unhandled_exception_handler,
+)
 from src.core.logging import setup_logging, get_logger
-from src.core.middleware import RequestIdMiddleware, SimpleAccessLogMiddleware
-
-from src.rag.schemas import AskRequest, AskResponse, SourceItem
+from src.core.cache import normalize_query
+from src.core.metrics import REGISTRY, render_prometheus
+from src.core.middleware import DeadlineMiddleware, RequestIdMiddleware, SimpleAccessLogMiddleware
+from src.core.singleflight import SingleFlight
+
+from src.rag.schemas import (
+    AskRequest,
+    AskResponse,
+    SearchBatchItem,
+    SearchBatchRequest,
+    SearchBatchResponse,
+    SourceItem,
+)
 from src.rag.retriever import Retriever
-from src.rag.service import generate_answer
-from src.rag.llm_clients import LLMError, OllamaClient, OpenAICompatClient
+from src.index.faq_store import FAQMatch
+from src.rag.answer_cache import AnswerCache, answer_cache_key
+from src.rag.relevance import NO_ANSWER, gate as relevance_gate
+from src.rag.service import generate_answer, prompt_template_version, stream_answer
+from src.rag.llm_clients import LLMError, OllamaClient, OpenAICompatClient, Prompt
 from src.langchain_demo.pipeline import run_langchain_rag
 
 from src.agent.tools import ToolRegistry
 from src.agent.tool_backend import build_tool_registry
-from src.agent.agent import run_agent, AgentError
+from src.agent.agent import run_agent, run_agent_stream, AgentError, AgentStep
 from src.mcp.client import MCPClient
 
 
@@ -40,10 +68,39 @@ log = get_logger(__name__)
 
 app = FastAPI(title="RAG + Agent + MCP (MVP)", version="0.1.0")
 
+app.add_middleware(DeadlineMiddleware)
 app.add_middleware(RequestIdMiddleware)
 app.add_middleware(SimpleAccessLogMiddleware)
+app.add_exception_handler(ServiceOverloaded, service_overloaded_handler)
+app.add_exception_handler(DeadlineExceeded, deadline_exceeded_handler)
+app.add_exception_handler(ClientDisconnected, client_disconnected_handler)
 app.add_exception_handler(Exception, unhandled_exception_handler)
 
+# Concurrent identical questions share one in-flight computation.
+ASK_FLIGHT = SingleFlight("ask")
+AGENT_FLIGHT = SingleFlight("agent")
+
+LLM_TTFT = REGISTRY.histogram(
+    "llm_time_to_first_token_seconds",
+    "Time from request arrival to the first streamed answer fragment.",
+    ("endpoint",),
+)
+LLM_STREAM_DURATION = REGISTRY.histogram(
+    "llm_stream_duration_seconds",
+    "Time from request arrival to the end of a streamed answer.",
+    ("endpoint",),
+)
+LLM_STREAM_ERRORS = REGISTRY.counter(
+    "llm_stream_errors_total",
+    "Streamed answers that ended with an error event.",
+    ("endpoint",),
+)
+FAQ_ANSWERS = REGISTRY.counter(
+    "faq_answers_total",
+    "Questions answered from the FAQ index without retrieval or the LLM.",
+    ("endpoint",),
+)
+
 
 # ---------------------------------------------------------------------------
 # Section: State helpers
@@ -59,6 +116,12 @@ def _get_retriever() -> Retriever:
     return r
 
 
+def _relevance_min_score() -> Optional[float]:
+    """Relevance gate threshold of the loaded index (None: gate off or no index)."""
+    r = getattr(app.state, "retriever", None)
+    return getattr(r, "relevance_min_score", None)
+
+
 def _get_llm_client():
     """Return the app-scoped LLM client or raise HTTP 503 if unavailable."""
     c = getattr(app.state, "llm_client", None)
@@ -70,6 +133,121 @@ def _get_llm_client():
     return c
 
 
+@dataclass
+class _AnswerLookup:
+    """Result of the answer cache lookup for one question."""
+    status: str  # off | hit | semantic | miss (value of X-Answer-Cache)
+    answer: Optional[str] = None
+    key: Optional[str] = None
+    scope: str = ""
+    vector: Any = None
+
+
+async def _lookup_answer(question: str, hits, retriever: Retriever, endpoint: str) -> _AnswerLookup:
+    """Check the exact answer cache, then the retriever's semantic cache."""
+    cache: Optional[AnswerCache] = getattr(app.state, "answer_cache", None)
+    semantic = getattr(retriever, "semantic_cache", None)
+    if cache is None and semantic is None:
+        return _AnswerLookup(status="off")
+
+    llm_mode = os.getenv("LLM_MODE", "ollama").lower()
+    llm_client = getattr(app.state, "llm_client", None)
+    model = getattr(llm_client, "model", None) or (
+        settings.openai_model if llm_mode == "openai" else settings.ollama_model
+    )
+    template_version = prompt_template_version()
+    lookup = _AnswerLookup(status="miss", scope=f"{llm_mode}|{model}|{template_version}")
+
+    if cache is not None:
+        lookup.key = answer_cache_key(question, hits, llm_mode, model, template_version)
+        lookup.answer = await cache.aget(lookup.key, retriever.index_version, endpoint=endpoint)
+        if lookup.answer is not None:
+            lookup.status = "hit"
+            return lookup
+
+    if semantic is not None and hits:
+        lookup.vector = await retriever.aquery_vector(question)
+        lookup.answer = semantic.lookup(lookup.vector, hits, lookup.scope)
+        if lookup.answer is not None:
+            lookup.status = "semantic"
+            # Promote to the exact tier so a repeat of this wording skips the embedding.
+            if cache is not None and lookup.key is not None:
+                await cache.aset(lookup.key, retriever.index_version, lookup.answer)
+    return lookup
+
+
+async def _store_answer(lookup: _AnswerLookup, hits, retriever: Retriever, answer: str) -> None:
+    """Put a freshly generated answer into the enabled cache tiers."""
+    if not answer or lookup.status == "off":
+        return
+    cache: Optional[AnswerCache] = getattr(app.state, "answer_cache", None)
+    if cache is not None and lookup.key is not None:
+        await cache.aset(lookup.key, retriever.index_version, answer)
+    semantic = getattr(retriever, "semantic_cache", None)
+    if semantic is not None and lookup.vector is not None:
+        semantic.add(lookup.vector, hits, lookup.scope, answer)
+
+
+def _source_items(hits) -> list[SourceItem]:
+    """Convert search hits to response source items."""
+    return [
+        SourceItem(
+            source_path=h.record.source_path,
+            chunk_id=h.record.chunk_id,
+            score=h.score,
+            text=h.record.text[:800],
+        )
+        for h in hits
+    ]
+
+
+async def _match_faq(retriever: Optional[Retriever], question: str, endpoint: str) -> Optional[FAQMatch]:
+    """Look the question up in the FAQ index (None if no confident match)."""
+    if retriever is None:
+        return None
+    match = await retriever.amatch_faq(question)
+    if match is not None:
+        FAQ_ANSWERS.inc(endpoint=endpoint)
+    return match
+
+
+def _faq_source(match: FAQMatch) -> SourceItem:
+    """Source item pointing at the FAQ entry that answered the question."""
+    e = match.entry
+    return SourceItem(
+        source_path=e.source_path,
+        chunk_id=e.chunk_id,
+        score=match.score,
+        text=f"{e.question}\n{e.answer}"[:800],
+    )
+
+
+def _sse(event: str, data: Any) -> str:
+    """Format one Server-Sent Events frame with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    """Wrap an SSE frame generator into an unbuffered streaming response."""
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream; charset=utf-8",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _sse_known_answer(sources: list[dict], answer: str, status: str) -> StreamingResponse:
+    """SSE response for an answer available without the LLM (FAQ, relevance gate)."""
+
+    async def events() -> AsyncIterator[str]:
+        yield _sse("sources", {"sources": sources})
+        yield _sse("done", {"answer": answer, "cached": status})
+
+    resp = _sse_response(events())
+    resp.headers["X-Answer-Cache"] = status
+    return resp
+
+
 # ---------------------------------------------------------------------------
 # Section: Startup init (retriever + LLM client + agent tools)
 # ---------------------------------------------------------------------------
@@ -91,11 +269,26 @@ async def startup_event() -> None:
             app.state.llm_client = OpenAICompatClient()
         else:
             app.state.llm_client = OllamaClient()
+        # One pooled HTTP client per backend, reused by /ask, agent and langchain.
+        await app.state.llm_client.start()
         log.info("LLM client ready: mode=%s", llm_mode)
     except Exception as e:
         app.state.llm_client = None
         log.warning("LLM client not ready: %s", e)
 
+    # Exact answer cache (memory LRU + SQLite), invalidated by index version.
+    app.state.answer_cache = None
+    if settings.answer_cache_enabled:
+        try:
+            app.state.answer_cache = AnswerCache(
+                Path(settings.answer_cache_db),
+                maxsize=settings.answer_cache_size,
+                ttl_s=settings.answer_cache_ttl_s,
+                max_rows=settings.answer_cache_disk_max_rows,
+            )
+        except Exception as e:
+            log.warning("Answer cache disabled: %s", e)
+
     # Tool registry can be backed by local tools or MCP, controlled by TOOL_BACKEND.
     # MCP is a separate service for isolation and easier tool deployment.    
     tool_backend = settings.tool_backend
@@ -113,13 +306,44 @@ async def startup_event() -> None:
     log.info("Agent tools registered: %s", sorted(tools.allowlist()))
 
 
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    """Stop background helpers and close pooled connections."""
+    retriever = getattr(app.state, "retriever", None)
+    if retriever is not None:
+        await retriever.aclose()
+    llm_client = getattr(app.state, "llm_client", None)
+    if llm_client is not None:
+        await llm_client.aclose()
+    answer_cache = getattr(app.state, "answer_cache", None)
+    if answer_cache is not None:
+        answer_cache.close()
+
+
 # ---------------------------------------------------------------------------
 # Section: Basic endpoints
 # ---------------------------------------------------------------------------
 # Minimal service metadata and health checks
 @app.get("/health")
 def health():
-    return {"status": "ok", "env": settings.app_env}
+    info: dict[str, Any] = {"status": "ok", "env": settings.app_env}
+    retriever = getattr(app.state, "retriever", None)
+    if retriever is not None and hasattr(retriever, "executor"):
+        info["retrieval_executor"] = retriever.executor.stats()
+    info["singleflight"] = [ASK_FLIGHT.stats(), AGENT_FLIGHT.stats()]
+    llm_client = getattr(app.state, "llm_client", None)
+    if llm_client is not None:
+        info["llm_admission"] = llm_client.admission.stats()
+        info["llm_circuit"] = llm_client.breaker.stats()
+        if hasattr(llm_client, "pool"):
+            info["llm_endpoints"] = llm_client.pool.stats()
+    return info
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Expose in-process metrics in Prometheus text format."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
 
 
 @app.get("/")
@@ -131,9 +355,14 @@ def root():
             "endpoints": [
                 "/health (GET)",
                 "/ask (POST)",
+                "/ask/stream (POST, SSE)",
                 "/ask_langchain (POST)",
+                "/search/batch (POST)",
                 "/agent/ask (POST)",
+                "/agent/ask/stream (POST, SSE)",
+                "/metrics (GET)",
                 "/debug/index (GET)",
+                "/debug/index/reload (POST)",
                 "/debug/search (POST)",
             ],
         }
@@ -144,36 +373,154 @@ def root():
 # Section: RAG endpoint
 # ---------------------------------------------------------------------------
 # Standard retrieval + generation flow without tool-calling
-@app.post("/ask", response_model=AskResponse)
-async def ask(req: AskRequest):
-    """Answer a question using local retrieval and an LLM."""
+async def _answer_question(question: str, top_k: int) -> tuple[str, list[SourceItem], str]:
+    """Retrieve, consult the answer caches and generate; returns (answer, sources, cache_status)."""
     retriever = _get_retriever()
+    faq = await _match_faq(retriever, question, "ask")
+    if faq is not None:
+        # Known FAQ question: stored answer, no retrieval and no generation.
+        return faq.entry.answer, [_faq_source(faq)], "faq"
 
-    top_k = req.top_k or settings.top_k
-    hits = retriever.search(req.question, top_k=top_k)
+    hits = await retriever.asearch(question, top_k=top_k)
+    if relevance_gate((h.score for h in hits), retriever.relevance_min_score, "ask"):
+        # Off-topic: standard no-answer response without spending a generation.
+        return NO_ANSWER, [], "gated"
+
+    lookup = await _lookup_answer(question, hits, retriever, "ask")
+    if lookup.answer is not None:
+        return lookup.answer, _source_items(hits), lookup.status
 
     llm_mode = os.getenv("LLM_MODE", "ollama").lower()  # ollama|openai
 
-    # One retry guards against transient LLM errors without changing output format
+    llm_client = getattr(app.state, "llm_client", None)
+
+    # Transient failures are retried inside the client (backoff + budget + breaker).
     try:
-        answer = await generate_answer(req.question, hits, llm_mode=llm_mode)
+        answer = await generate_answer(question, hits, llm_mode=llm_mode, client=llm_client)
     except LLMError as e:
-        log.warning("LLM failed, retry once: %s", e)
+        raise HTTPException(status_code=502, detail=str(e)) from e
+
+    await _store_answer(lookup, hits, retriever, answer)
+    return answer, _source_items(hits), lookup.status
+
+
+@app.post("/ask", response_model=AskResponse)
+async def ask(req: AskRequest, request: Request, response: Response):
+    """Answer a question using local retrieval and an LLM.
+
+    Identical questions in flight at the same time share one retrieval +
+    generation (single-flight). When a client disconnects its wait is
+    cancelled; the shared work is cancelled too once no caller is left.
+    The shared work runs under the deadline of the caller that started it.
+    """
+    _get_retriever()
+    tighten_deadline(req.timeout_s)
+
+    top_k = req.top_k or settings.top_k
+    llm_mode = os.getenv("LLM_MODE", "ollama").lower()
+    key = (normalize_query(req.question), top_k, llm_mode)
+    (answer, sources, cache_status), shared = await cancel_on_disconnect(
+        request, ASK_FLIGHT.do(key, lambda: _answer_question(req.question, top_k)), "ask"
+    )
+
+    response.headers["X-Answer-Cache"] = cache_status
+    response.headers["X-Coalesced"] = "1" if shared else "0"
+    return AskResponse(answer=answer, sources=sources)
+
+
+@app.post("/ask/stream")
+async def ask_stream(req: AskRequest):
+    """Stream the /ask answer as SSE: `sources`, then `token`*, then `done`.
+
+    Sources are sent as soon as retrieval finishes so the client can render
+    them before the first LLM token. LLM failures mid-stream are reported as
+    an `error` event (the HTTP status is already 200 at that point).
+    """
+    started = time.perf_counter()
+    retriever = _get_retriever()
+    llm_client = _get_llm_client()
+    tighten_deadline(req.timeout_s)
+
+    faq = await _match_faq(retriever, req.question, "ask_stream")
+    if faq is not None:
+        return _sse_known_answer([_faq_source(faq).model_dump()], faq.entry.answer, "faq")
+
+    top_k = req.top_k or settings.top_k
+    hits = await retriever.asearch(req.question, top_k=top_k)
+    if relevance_gate((h.score for h in hits), retriever.relevance_min_score, "ask_stream"):
+        return _sse_known_answer([], NO_ANSWER, "gated")
+
+    sources = [s.model_dump() for s in _source_items(hits)]
+    lookup = await _lookup_answer(req.question, hits, retriever, "ask_stream")
+
+    async def events() -> AsyncIterator[str]:
+        yield _sse("sources", {"sources": sources})
+        if lookup.answer is not None:
+            yield _sse("done", {"answer": lookup.answer, "cached": lookup.status})
+            return
+        parts: list[str] = []
         try:
-            answer = await generate_answer(req.question, hits, llm_mode=llm_mode)
-        except LLMError as e2:
-            raise HTTPException(status_code=502, detail=str(e2)) from e2
+            # aclosing: a disconnect closes the whole stream chain down to the upstream connection.
+            async with aclosing(stream_answer(req.question, hits, llm_client)) as pieces:
+                async for piece in pieces:
+                    if not parts:
+                        LLM_TTFT.observe(time.perf_counter() - started, endpoint="ask_stream")
+                    parts.append(piece)
+                    yield _sse("token", {"text": piece})
+        except (asyncio.CancelledError, GeneratorExit):
+            CLIENT_DISCONNECTS.inc(endpoint="ask_stream")
+            raise
+        except ServiceOverloaded as e:
+            LLM_STREAM_ERRORS.inc(endpoint="ask_stream")
+            yield _sse("error", {"detail": str(e), "status": e.status_code, "retry_after_s": e.retry_after_s})
+            return
+        except DeadlineExceeded as e:
+            LLM_STREAM_ERRORS.inc(endpoint="ask_stream")
+            yield _sse("error", {"detail": str(e), "status": 504})
+            return
+        except LLMError as e:
+            LLM_STREAM_ERRORS.inc(endpoint="ask_stream")
+            log.warning("LLM stream failed: %s", e)
+            yield _sse("error", {"detail": str(e)})
+            return
+        LLM_STREAM_DURATION.observe(time.perf_counter() - started, endpoint="ask_stream")
+        answer = "".join(parts).strip()
+        await _store_answer(lookup, hits, retriever, answer)
+        yield _sse("done", {"answer": answer})
+
+    resp = _sse_response(events())
+    resp.headers["X-Answer-Cache"] = lookup.status
+    return resp
 
-    sources = [
-        SourceItem(
-            source_path=h.record.source_path,
-            chunk_id=h.record.chunk_id,
-            score=h.score,
-            text=h.record.text[:800],
+
+# ---------------------------------------------------------------------------
+# Section: Batch retrieval endpoint
+# ---------------------------------------------------------------------------
+# Bulk QA / offline evaluation: one encoder pass and one FAISS call per batch.
+@app.post("/search/batch", response_model=SearchBatchResponse)
+def search_batch(req: SearchBatchRequest):
+    """Return top-k hits for many queries in one retrieval pass."""
+    retriever = _get_retriever()
+
+    top_k = req.top_k or settings.top_k
+    batch_hits = retriever.search_many(req.queries, top_k=top_k)
+
+    results = [
+        SearchBatchItem(
+            query=q,
+            hits=[
+                SourceItem(
+                    source_path=h.record.source_path,
+                    chunk_id=h.record.chunk_id,
+                    score=h.score,
+                    text=h.record.text[:800],
+                )
+                for h in hits
+            ],
         )
-        for h in hits
+        for q, hits in zip(req.queries, batch_hits)
     ]
-    return AskResponse(answer=answer, sources=sources)
+    return SearchBatchResponse(results=results)
 
 
 # ---------------------------------------------------------------------------
@@ -181,19 +528,24 @@ async def ask(req: AskRequest):
 # ---------------------------------------------------------------------------
 # Separate endpoint to keep the core RAG path stable.
 @app.post("/ask_langchain", response_model=AskResponse)
-async def ask_langchain(req: AskRequest):
+async def ask_langchain(req: AskRequest, request: Request):
     """Answer a question via the optional LangChain pipeline."""
     retriever = _get_retriever()
     llm_client = _get_llm_client()
+    tighten_deadline(req.timeout_s)
 
     top_k = req.top_k or settings.top_k
 
     try:
-        answer, sources = await run_langchain_rag(
-            question=req.question,
-            retriever=retriever,
-            llm_client=llm_client,
-            top_k=top_k,
+        answer, sources = await cancel_on_disconnect(
+            request,
+            run_langchain_rag(
+                question=req.question,
+                retriever=retriever,
+                llm_client=llm_client,
+                top_k=top_k,
+            ),
+            "ask_langchain",
         )
     except LLMError as exc:
         raise HTTPException(status_code=502, detail=f"LLM timeout or error: {exc}") from exc
@@ -258,9 +610,30 @@ def debug_index():
     if retriever is not None and hasattr(retriever, "store") and hasattr(retriever.store, "records"):
         info["chunks_loaded"] = len(retriever.store.records)
         info["embedding_model_name"] = getattr(retriever, "embedding_model_name", None)
+        info["relevance_min_score"] = getattr(retriever, "relevance_min_score", None)
+        info["index_load_mode"] = getattr(retriever.store, "load_mode", None)
+        # Columnar chunk metadata vs the equivalent List[ChunkRecord] estimate.
+        if hasattr(retriever.store.records, "memory_usage"):
+            info["records_memory"] = retriever.store.records.memory_usage()
+        if hasattr(retriever, "cache_stats"):
+            info["retriever_cache"] = retriever.cache_stats()
+    answer_cache = getattr(app.state, "answer_cache", None)
+    if answer_cache is not None:
+        info["answer_cache"] = answer_cache.stats()
     return info
 
 
+@app.post("/debug/index/reload")
+def debug_index_reload():
+    """Reload the index from disk (e.g. after build_index) and drop query caches."""
+    retriever = _get_retriever()
+    try:
+        version = retriever.reload()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Index reload failed: {e}") from e
+    return {"reloaded": True, "index_version": version, "chunks_loaded": len(retriever.store.records)}
+
+
 # ---------------------------------------------------------------------------
 # Section: Response encoding
 # ---------------------------------------------------------------------------
@@ -284,6 +657,7 @@ class AgentAskRequest(BaseModel):
     question: str = Field(min_length=2, max_length=2000)
     top_k: Optional[int] = Field(default=5, ge=1, le=10)
     debug: Optional[bool] = False
+    timeout_s: Optional[float] = Field(default=None, gt=0, le=600)
 
 
 class AgentAskResponse(BaseModel):
@@ -292,28 +666,57 @@ class AgentAskResponse(BaseModel):
     trace: Optional[list[dict]] = None
 
 
+def _agent_sources(steps, top_k: int) -> list[dict]:
+    """Take sources from the first successful search_docs step (if any)."""
+    for st in steps:
+        if st.tool in ("search_docs", "faq") and st.tool_result and isinstance(st.tool_result, dict):
+            hits = st.tool_result.get("hits")
+            if isinstance(hits, list):
+                return hits[:top_k]
+    return []
+
+
 @app.post("/agent/ask", response_model=AgentAskResponse)
-async def agent_ask(req: AgentAskRequest):
+async def agent_ask(req: AgentAskRequest, request: Request, response: Response):
     """Run the tool-calling agent and return answer with optional trace."""
     tools: ToolRegistry = getattr(app.state, "agent_tools", None)
     if tools is None:
         raise HTTPException(status_code=503, detail="Agent tools are not ready.")
 
     llm_client = _get_llm_client()
+    tighten_deadline(req.timeout_s)
 
-    async def llm_generate(prompt: str, timeout_s: float):
+    async def llm_generate(prompt: Prompt, timeout_s: float):
         """Adapter to pass the configured LLM client into the agent."""
         # llm_client должен поддерживать generate(prompt, timeout_s=...)
         return await llm_client.generate(prompt, timeout_s=timeout_s)
 
-    try:
-        answer, steps = await run_agent(
+    async def run() -> tuple[str, list]:
+        faq = await _match_faq(getattr(app.state, "retriever", None), req.question, "agent")
+        if faq is not None:
+            step = AgentStep(
+                step=1,
+                llm_raw="<faq>",
+                action="final_from_faq",
+                tool="faq",
+                tool_args={"query": req.question},
+                tool_result={"hits": [_faq_source(faq).model_dump()]},
+            )
+            return faq.entry.answer, [step]
+        return await run_agent(
             llm_generate=llm_generate,
             question=req.question,
             tools=tools,
             max_steps=4,
-            llm_timeout_s=90.0,
-            retry_once=True,
+            llm_timeout_s=settings.llm_timeout_s,
+            min_score=_relevance_min_score(),
+            prompt_layout=settings.prompt_layout,
+        )
+
+    # top_k/debug only shape the response, so they are not part of the key.
+    try:
+        (answer, steps), shared = await cancel_on_disconnect(
+            request, AGENT_FLIGHT.do(normalize_query(req.question), run), "agent"
         )
     except AgentError as e:
         return AgentAskResponse(
@@ -321,15 +724,9 @@ async def agent_ask(req: AgentAskRequest):
             sources=[],
             trace=None,
         )
+    response.headers["X-Coalesced"] = "1" if shared else "0"
 
-    # Источники: берём из первого успешного search_docs (если агент его вызывал)
-    sources: list[dict] = []
-    for st in steps:
-        if st.tool == "search_docs" and st.tool_result and isinstance(st.tool_result, dict):
-            hits = st.tool_result.get("hits")
-            if isinstance(hits, list):
-                sources = hits[: (req.top_k or 5)]
-                break
+    sources = _agent_sources(steps, req.top_k or 5)
 
     trace = None
     if req.debug:
@@ -345,3 +742,54 @@ async def agent_ask(req: AgentAskRequest):
         ]
 
     return AgentAskResponse(answer=answer, sources=sources, trace=trace)
+
+
+@app.post("/agent/ask/stream")
+async def agent_ask_stream(req: AgentAskRequest):
+    """Stream the agent answer as SSE: `sources`, then `token`*, then `done`."""
+    started = time.perf_counter()
+    tools: ToolRegistry = getattr(app.state, "agent_tools", None)
+    if tools is None:
+        raise HTTPException(status_code=503, detail="Agent tools are not ready.")
+
+    llm_client = _get_llm_client()
+    tighten_deadline(req.timeout_s)
+
+    async def events() -> AsyncIterator[str]:
+        first = True
+        agent_events = run_agent_stream(
+            llm_stream=llm_client.stream,
+            question=req.question,
+            tools=tools,
+            llm_timeout_s=settings.llm_timeout_s,
+            min_score=_relevance_min_score(),
+            prompt_layout=settings.prompt_layout,
+        )
+        try:
+            async with aclosing(agent_events):
+                async for kind, data in agent_events:
+                    if kind == "tool":
+                        yield _sse("sources", {"sources": _agent_sources([data], req.top_k or 5), "tool": data.tool})
+                    elif kind == "token":
+                        if first:
+                            LLM_TTFT.observe(time.perf_counter() - started, endpoint="agent_stream")
+                            first = False
+                        yield _sse("token", {"text": data})
+                    else:
+                        LLM_STREAM_DURATION.observe(time.perf_counter() - started, endpoint="agent_stream")
+                        yield _sse("done", {"answer": data})
+        except (asyncio.CancelledError, GeneratorExit):
+            CLIENT_DISCONNECTS.inc(endpoint="agent_stream")
+            raise
+        except ServiceOverloaded as e:
+            LLM_STREAM_ERRORS.inc(endpoint="agent_stream")
+            yield _sse("error", {"detail": str(e), "status": e.status_code, "retry_after_s": e.retry_after_s})
+        except DeadlineExceeded as e:
+            LLM_STREAM_ERRORS.inc(endpoint="agent_stream")
+            yield _sse("error", {"detail": str(e), "status": 504})
+        except Exception as e:
+            LLM_STREAM_ERRORS.inc(endpoint="agent_stream")
+            log.warning("Agent stream failed: %s", repr(e))
+            yield _sse("error", {"detail": f"Не смог завершить агентный ответ: {e}"})
+
+    return _sse_response(events())
@@ -0,0 +1,80 @@
+"""Small in-process caches shared by the retrieval and answer layers."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Generic, Hashable, Optional, TypeVar
+
+V = TypeVar("V")
+
+
+def normalize_query(text: str) -> str:
+    """Normalise a user question for cache keys (case + whitespace)."""
+    return " ".join((text or "").split()).casefold()
+
+
+class TTLCache(Generic[V]):
+    """Thread-safe LRU cache with a per-entry TTL and hit/miss counters.
+
+    maxsize <= 0 disables the cache (every lookup is a miss, nothing is stored).
+    """
+
+    def __init__(self, maxsize: int, ttl_s: float, name: str = "cache") -> None:
+        """Create a cache holding at most maxsize entries for ttl_s seconds."""
+        self.maxsize = int(maxsize)
+        self.ttl_s = float(ttl_s)
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[Hashable, tuple[float, V]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[V]:
+        """Return a cached value or None (expired entries are dropped)."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: V) -> None:
+        """Insert or refresh an entry, evicting the least recently used."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_s, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop all entries (counters are kept)."""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return size and hit/miss counters."""
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_s": self.ttl_s,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
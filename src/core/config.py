@@ -40,12 +40,30 @@ class Settings(BaseSettings):
     log_level: str = Field(default="INFO", alias="LOG_LEVEL")
     tool_backend: Literal["local", "mcp"] = Field(default="local", alias="TOOL_BACKEND")
     mcp_url: str = Field(default="http://localhost:9001", alias="MCP_URL")
+    # per-request time budget (overridable by X-Request-Timeout header / timeout_s field)
+    request_timeout_s: float = Field(default=120.0, alias="REQUEST_TIMEOUT_S")
+    request_timeout_max_s: float = Field(default=300.0, alias="REQUEST_TIMEOUT_MAX_S")
+    # per-stage caps inside that budget (the request deadline clips them further)
+    llm_timeout_s: float = Field(default=90.0, alias="LLM_TIMEOUT_S")
+    tool_search_timeout_s: float = Field(default=2.0, alias="TOOL_SEARCH_TIMEOUT_S")
+    tool_calc_timeout_s: float = Field(default=1.0, alias="TOOL_CALC_TIMEOUT_S")
 
     # ------------------------------------------------------------------
     # Data paths
     # ------------------------------------------------------------------
     docs_dir: str = Field(default=str(PROJECT_ROOT / "data" / "sample_docs"), alias="DOCS_DIR")
     index_dir: str = Field(default=str(PROJECT_ROOT / "data" / "index"), alias="INDEX_DIR")
+    # on-disk chunk embedding cache for index builds (keyed by model + text hash)
+    embedding_cache_dir: str = Field(
+        default=str(PROJECT_ROOT / "data" / "embedding_cache"),
+        alias="EMBEDDING_CACHE_DIR",
+    )
+    embedding_cache_enabled: bool = Field(default=True, alias="EMBEDDING_CACHE_ENABLED")
+    # exact answer cache for /ask (SQLite tier; memory tier size/TTL below)
+    answer_cache_db: str = Field(
+        default=str(PROJECT_ROOT / "data" / "answer_cache.sqlite3"),
+        alias="ANSWER_CACHE_DB",
+    )
 
     # ------------------------------------------------------------------
     # Chunking / Retrieval
@@ -53,6 +71,8 @@ class Settings(BaseSettings):
     chunk_size: int = Field(default=800, alias="CHUNK_SIZE")
     chunk_overlap: int = Field(default=120, alias="CHUNK_OVERLAP")
     top_k: int = Field(default=5, alias="TOP_K")
+    # LLM context budget in (estimated) tokens; adjacent chunks are merged, overlap dropped
+    context_max_tokens: int = Field(default=1200, alias="CONTEXT_MAX_TOKENS")
 
     # HF sentence-transformers model (small, multilingual, ok for MVP)
     embedding_model_name: str = Field(
@@ -63,19 +83,119 @@ class Settings(BaseSettings):
     # Fail fast if index_meta mismatch (recommended)
     rag_strict_index_meta: bool = Field(default=True, alias="RAG_STRICT_INDEX_META")
 
+    # ------------------------------------------------------------------
+    # FAISS index type (build time) and search knobs (load time)
+    # ------------------------------------------------------------------
+    # flat = exact brute-force scan; ivf/hnsw/ivfpq = approximate (ANN)
+    index_type: Literal["flat", "ivf", "hnsw", "ivfpq"] = Field(default="flat", alias="INDEX_TYPE")
+    # 0 -> auto (~4*sqrt(N) lists)
+    index_nlist: int = Field(default=0, alias="INDEX_NLIST")
+    index_hnsw_m: int = Field(default=32, alias="INDEX_HNSW_M")
+    index_hnsw_ef_construction: int = Field(default=200, alias="INDEX_HNSW_EF_CONSTRUCTION")
+    # 0 -> auto (largest divisor of dim giving >= 8 dims per subquantizer)
+    index_pq_m: int = Field(default=0, alias="INDEX_PQ_M")
+    index_pq_bits: int = Field(default=8, alias="INDEX_PQ_BITS")
+    # max vectors used to train IVF/PQ (random sample of the corpus)
+    index_train_size: int = Field(default=100_000, alias="INDEX_TRAIN_SIZE")
+    # runtime: lists probed per query (IVF) and beam width (HNSW)
+    index_nprobe: int = Field(default=16, alias="INDEX_NPROBE")
+    index_hnsw_ef_search: int = Field(default=64, alias="INDEX_HNSW_EF_SEARCH")
+    # mmap index + chunk store: near-instant startup, pages shared across workers
+    index_mmap: bool = Field(default=False, alias="INDEX_MMAP")
+
+    # Retriever caches (size 0 disables a tier)
+    query_vec_cache_size: int = Field(default=2048, alias="QUERY_VEC_CACHE_SIZE")
+    query_vec_cache_ttl_s: float = Field(default=3600.0, alias="QUERY_VEC_CACHE_TTL_S")
+    result_cache_size: int = Field(default=2048, alias="RESULT_CACHE_SIZE")
+    result_cache_ttl_s: float = Field(default=300.0, alias="RESULT_CACHE_TTL_S")
+
+    # Answer cache (0 size disables the memory tier; ENABLED=false disables both)
+    answer_cache_enabled: bool = Field(default=True, alias="ANSWER_CACHE_ENABLED")
+    answer_cache_size: int = Field(default=1024, alias="ANSWER_CACHE_SIZE")
+    answer_cache_ttl_s: float = Field(default=86400.0, alias="ANSWER_CACHE_TTL_S")
+    # SQLite tier row cap (oldest rows purged first, together with expired ones)
+    answer_cache_disk_max_rows: int = Field(default=100_000, alias="ANSWER_CACHE_DISK_MAX_ROWS")
+    # Semantic answer cache: cosine >= threshold AND same top-N chunks -> reuse answer
+    semantic_cache_enabled: bool = Field(default=True, alias="SEMANTIC_CACHE_ENABLED")
+    semantic_cache_size: int = Field(default=512, alias="SEMANTIC_CACHE_SIZE")
+    semantic_cache_ttl_s: float = Field(default=3600.0, alias="SEMANTIC_CACHE_TTL_S")
+    semantic_cache_threshold: float = Field(default=0.93, alias="SEMANTIC_CACHE_THRESHOLD")
+    semantic_cache_top_n: int = Field(default=3, alias="SEMANTIC_CACHE_TOP_N")
+
+    # Relevance gate: no hit scoring >= min score -> standard "no answer", LLM skipped.
+    # Unset min score -> calibrated value from index_meta.json (build_index --calibrate-relevance) or 0.30
+    relevance_gate_enabled: bool = Field(default=True, alias="RELEVANCE_GATE_ENABLED")
+    relevance_min_score: Optional[float] = Field(default=None, alias="RELEVANCE_MIN_SCORE")
+
+    # FAQ answers: Q/A pairs from FAQ Markdown, served without the LLM above the threshold
+    faq_index_enabled: bool = Field(default=True, alias="FAQ_INDEX_ENABLED")
+    faq_match_threshold: float = Field(default=0.9, alias="FAQ_MATCH_THRESHOLD")
+
+    # Micro-batching of concurrent query embeddings (async request path)
+    embed_batching_enabled: bool = Field(default=True, alias="EMBED_BATCHING_ENABLED")
+    embed_batch_window_ms: float = Field(default=3.0, alias="EMBED_BATCH_WINDOW_MS")
+    embed_batch_max: int = Field(default=32, alias="EMBED_BATCH_MAX")
+
+    # Retrieval executor: worker threads and max waiting tasks (beyond -> 503)
+    retrieval_workers: int = Field(default=2, alias="RETRIEVAL_WORKERS")
+    retrieval_max_queue: int = Field(default=64, alias="RETRIEVAL_MAX_QUEUE")
+
     # ------------------------------------------------------------------
     # LLM mode: ollama or openai-compatible (any provider that mimics OpenAI API)
     # ------------------------------------------------------------------
     llm_mode: Literal["ollama", "openai"] = Field(default="ollama", alias="LLM_MODE")
+    # "generate": one text prompt (question before context);
+    # "chat": fixed system message + invariant instructions, context/question last,
+    # so the backend can reuse the KV cache of the common prefix (Ollama /api/chat)
+    prompt_layout: Literal["generate", "chat"] = Field(default="generate", alias="PROMPT_LAYOUT")
 
     # Ollama
     ollama_base_url: str = Field(default="http://localhost:11434", alias="OLLAMA_BASE_URL")
+    # several hosts: "http://gpu1:11434|2, http://gpu2:11434" (|weight optional);
+    # empty -> OLLAMA_BASE_URL only
+    ollama_base_urls: str = Field(default="", alias="OLLAMA_BASE_URLS")
+    # passive health: eject a host for EJECT_S after EJECT_FAILURES failures in a row
+    ollama_eject_failures: int = Field(default=3, alias="OLLAMA_EJECT_FAILURES")
+    ollama_eject_s: float = Field(default=30.0, alias="OLLAMA_EJECT_S")
+    # hedging: fire a 2nd host if no first token after the TTFT percentile
+    # (DEFAULT_DELAY_S until enough samples are collected)
+    ollama_hedging_enabled: bool = Field(default=False, alias="OLLAMA_HEDGING_ENABLED")
+    ollama_hedge_percentile: float = Field(default=95.0, alias="OLLAMA_HEDGE_PERCENTILE")
+    ollama_hedge_min_delay_s: float = Field(default=0.2, alias="OLLAMA_HEDGE_MIN_DELAY_S")
+    ollama_hedge_default_delay_s: float = Field(default=2.0, alias="OLLAMA_HEDGE_DEFAULT_DELAY_S")
     ollama_model: str = Field(default="llama3.2:3b", alias="OLLAMA_MODEL")
     # keep model warm: "10m", "0", "-1" (forever)
     ollama_keep_alive: str = Field(default="10m", alias="OLLAMA_KEEP_ALIVE")
     # generation caps (helps avoid long stalls)
     ollama_num_predict: int = Field(default=512, alias="OLLAMA_NUM_PREDICT")
     ollama_temperature: float = Field(default=0.2, alias="OLLAMA_TEMPERATURE")
+    # num_ctx per request: smallest bucket >= prompt tokens + num_predict;
+    # few sizes -> few model reloads. Empty -> model default window.
+    ollama_num_ctx_buckets: str = Field(default="2048,4096,8192", alias="OLLAMA_NUM_CTX_BUCKETS")
+
+    # Shared HTTP connection pool per LLM backend
+    llm_pool_max_connections: int = Field(default=32, alias="LLM_POOL_MAX_CONNECTIONS")
+    llm_pool_max_keepalive: int = Field(default=16, alias="LLM_POOL_MAX_KEEPALIVE")
+    llm_pool_keepalive_expiry_s: float = Field(default=60.0, alias="LLM_POOL_KEEPALIVE_EXPIRY_S")
+    # HTTP/2 needs `pip install httpx[http2]` (mostly useful for OpenAI-compatible HTTPS)
+    llm_http2: bool = Field(default=False, alias="LLM_HTTP2")
+
+    # Admission control per LLM backend: concurrent generations, waiters, max wait
+    # (queue full -> 429, wait exceeded -> 503; both with Retry-After; wait 0 = no limit).
+    # Concurrency is per host of weight 1: Ollama with OLLAMA_BASE_URLS gets it x total weight.
+    llm_max_concurrency: int = Field(default=4, alias="LLM_MAX_CONCURRENCY")
+    llm_max_queue: int = Field(default=32, alias="LLM_MAX_QUEUE")
+    llm_max_queue_wait_s: float = Field(default=30.0, alias="LLM_MAX_QUEUE_WAIT_S")
+
+    # Retries of transient LLM failures (timeouts, connect errors, 429/5xx; never other 4xx)
+    llm_retry_max_attempts: int = Field(default=2, alias="LLM_RETRY_MAX_ATTEMPTS")
+    llm_retry_base_delay_s: float = Field(default=0.5, alias="LLM_RETRY_BASE_DELAY_S")
+    llm_retry_max_delay_s: float = Field(default=4.0, alias="LLM_RETRY_MAX_DELAY_S")
+    # retries allowed as a fraction of requests (0.2 -> at most +20% load on failures)
+    llm_retry_budget_ratio: float = Field(default=0.2, alias="LLM_RETRY_BUDGET_RATIO")
+    # circuit breaker: consecutive failures to open, seconds before a half-open probe
+    llm_breaker_failures: int = Field(default=5, alias="LLM_BREAKER_FAILURES")
+    llm_breaker_reset_s: float = Field(default=30.0, alias="LLM_BREAKER_RESET_S")
 
     # OpenAI-compatible
     openai_base_url: str = Field(default="https://api.openai.com/v1", alias="OPENAI_BASE_URL")
@@ -89,6 +209,8 @@ class Settings(BaseSettings):
         s = self.model_copy(deep=True)
         s.docs_dir = _resolve_from_root(s.docs_dir)
         s.index_dir = _resolve_from_root(s.index_dir)
+        s.embedding_cache_dir = _resolve_from_root(s.embedding_cache_dir)
+        s.answer_cache_db = _resolve_from_root(s.answer_cache_db)
 
         # sanity
         if s.chunk_overlap < 0:
@@ -1,3 +1,6 @@
 from contextvars import ContextVar
+from typing import Optional
 
 request_id_var: ContextVar[str] = ContextVar("request_id", default="-")
+# Absolute request deadline (time.monotonic()); None = no deadline. See src/core/deadline.py.
+deadline_var: ContextVar[Optional[float]] = ContextVar("deadline", default=None)
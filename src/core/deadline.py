@@ -0,0 +1,102 @@
+"""Per-request deadlines carried in a context variable.
+
+The deadline is set once per request (header `X-Request-Timeout`, request
+field, or the default budget) and every stage asks for its share:
+
+    timeout = budget("llm", cap=90.0)   # min(cap, time left); raises if none left
+    await with_deadline(coro, "faiss")  # cancel the wait when time is up
+
+Context variables follow asyncio tasks and `asyncio.to_thread`, so the
+deadline reaches coalesced work, tool handlers and MCP calls.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from contextvars import Token
+from typing import Awaitable, Optional, TypeVar
+
+from src.core.context import deadline_var
+from src.core.errors import DeadlineExceeded
+from src.core.metrics import REGISTRY
+
+T = TypeVar("T")
+
+DEADLINE_HEADER = "X-Request-Timeout"
+
+DEADLINE_EXCEEDED = REGISTRY.counter(
+    "request_deadline_exceeded_total",
+    "Requests stopped because their deadline ran out, by stage.",
+    ("stage",),
+)
+
+
+def set_deadline(budget_s: float) -> Token:
+    """Start a deadline budget_s seconds from now (returns a reset token)."""
+    return deadline_var.set(time.monotonic() + max(0.0, float(budget_s)))
+
+
+def tighten_deadline(budget_s: Optional[float]) -> None:
+    """Shorten the current deadline to budget_s from now (never extends it)."""
+    if budget_s is None:
+        return
+    new = time.monotonic() + max(0.0, float(budget_s))
+    current = deadline_var.get()
+    if current is None or new < current:
+        deadline_var.set(new)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left until the deadline (None if no deadline is set)."""
+    deadline = deadline_var.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def expired() -> bool:
+    """True if a deadline is set and has passed."""
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def check(stage: str) -> None:
+    """Raise DeadlineExceeded if the deadline has passed."""
+    if expired():
+        DEADLINE_EXCEEDED.inc(stage=stage)
+        raise DeadlineExceeded(stage)
+
+
+def budget(stage: str, cap: Optional[float] = None) -> Optional[float]:
+    """Timeout for a stage: min(cap, time left).
+
+    Returns None only if there is neither a cap nor a deadline.
+    Raises DeadlineExceeded if no time is left.
+    """
+    check(stage)
+    left = remaining()
+    if left is None:
+        return cap
+    return left if cap is None else min(cap, left)
+
+
+async def with_deadline(aw: Awaitable[T], stage: str, cap: Optional[float] = None) -> T:
+    """Await aw within the stage budget.
+
+    Raises DeadlineExceeded if the request deadline cut the wait short;
+    asyncio.TimeoutError if the (tighter) stage cap did.
+    """
+    try:
+        timeout = budget(stage, cap)
+    except DeadlineExceeded:
+        if asyncio.iscoroutine(aw):
+            aw.close()
+        raise
+    try:
+        return await asyncio.wait_for(aw, timeout=timeout)
+    except asyncio.TimeoutError:
+        if expired():
+            DEADLINE_EXCEEDED.inc(stage=stage)
+            raise DeadlineExceeded(stage) from None
+        raise
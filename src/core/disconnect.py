@@ -0,0 +1,61 @@
+"""Cancel request work when the HTTP client goes away.
+
+Non-streaming endpoints do not notice a disconnect on their own: the
+handler keeps awaiting the LLM until it finishes. `cancel_on_disconnect`
+runs the work next to a watcher that polls `request.is_disconnected()`
+and cancels the work as soon as the client is gone. Cancelling an httpx
+request closes its connection, so the LLM backend stops generating.
+
+Coalesced work is protected by `SingleFlight`: it is only cancelled when
+no other caller is still waiting for it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Awaitable, TypeVar
+
+from fastapi import Request
+
+from src.core.errors import ClientDisconnected
+from src.core.metrics import REGISTRY
+
+T = TypeVar("T")
+
+DISCONNECT_POLL_S = 0.25
+
+CLIENT_DISCONNECTS = REGISTRY.counter(
+    "client_disconnects_total",
+    "Requests whose client disconnected before the answer; their work was cancelled.",
+    ("endpoint",),
+)
+
+
+async def _wait_disconnect(request: Request, poll_s: float) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(poll_s)
+
+
+async def cancel_on_disconnect(
+    request: Request,
+    aw: Awaitable[T],
+    endpoint: str,
+    poll_s: float = DISCONNECT_POLL_S,
+) -> T:
+    """Await aw; cancel it and raise ClientDisconnected if the client disconnects first."""
+    work = asyncio.ensure_future(aw)
+    watcher = asyncio.ensure_future(_wait_disconnect(request, poll_s))
+    try:
+        await asyncio.wait((work, watcher), return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        # Also reached when this handler itself is cancelled (e.g. shutdown).
+        watcher.cancel()
+        if not work.done():
+            work.cancel()
+            await asyncio.gather(work, return_exceptions=True)
+
+    disconnected = watcher.done() and not watcher.cancelled() and watcher.exception() is None
+    if work.cancelled() and disconnected:
+        CLIENT_DISCONNECTS.inc(endpoint=endpoint)
+        raise ClientDisconnected(endpoint)
+    return work.result()
@@ -20,3 +20,50 @@ async def unhandled_exception_handler(request: Request, exc: Exception):
     # В проде лучше не отдавать детали исключения наружу
     log.exception("Unhandled error: %s %s", request.method, request.url.path)
     return JSONResponse(status_code=500, content=error_payload("Internal server error"))
+
+
+class ServiceOverloaded(RuntimeError):
+    """Raised when a bounded resource (queue/pool) rejects new work."""
+
+    def __init__(self, message: str, retry_after_s: float = 1.0, status_code: int = 503) -> None:
+        super().__init__(message)
+        self.retry_after_s = retry_after_s
+        self.status_code = status_code
+
+
+async def service_overloaded_handler(request: Request, exc: ServiceOverloaded):
+    # Быстрый отказ вместо очереди до таймаута: клиент может повторить позже
+    log.warning("Overloaded: %s %s: %s", request.method, request.url.path, exc)
+    return JSONResponse(
+        status_code=exc.status_code,
+        content=error_payload(str(exc)),
+        headers={"Retry-After": str(max(1, int(round(exc.retry_after_s))))},
+    )
+
+
+class DeadlineExceeded(RuntimeError):
+    """Raised when the request's time budget is used up before a stage can run/finish."""
+
+    def __init__(self, stage: str) -> None:
+        super().__init__(f"Request deadline exceeded at stage '{stage}'.")
+        self.stage = stage
+
+
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    # Бюджет запроса исчерпан: прекращаем работу и отвечаем 504
+    log.warning("Deadline exceeded: %s %s: stage=%s", request.method, request.url.path, exc.stage)
+    return JSONResponse(status_code=504, content=error_payload(str(exc)))
+
+
+class ClientDisconnected(RuntimeError):
+    """Raised when the HTTP client went away and the request work was cancelled."""
+
+    def __init__(self, endpoint: str) -> None:
+        super().__init__(f"Client disconnected from '{endpoint}'; work cancelled.")
+        self.endpoint = endpoint
+
+
+async def client_disconnected_handler(request: Request, exc: ClientDisconnected):
+    # Клиент уже ушёл: ответ никто не прочитает, 499 только для access‑логов
+    log.info("Client disconnected: %s %s", request.method, request.url.path)
+    return JSONResponse(status_code=499, content=error_payload(str(exc)))
@@ -4,7 +4,9 @@ from fastapi import Request
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import Response
 
-from .context import request_id_var
+from .config import get_settings
+from .context import deadline_var, request_id_var
+from .deadline import DEADLINE_HEADER, set_deadline
 from .logging import get_logger
 
 log = get_logger(__name__)
@@ -29,6 +31,31 @@ class RequestIdMiddleware(BaseHTTPMiddleware):
             request_id_var.reset(token)
 
 
+class DeadlineMiddleware(BaseHTTPMiddleware):
+    """
+    - Бюджет запроса из X-Request-Timeout (секунды), иначе REQUEST_TIMEOUT_S
+    - Ограничен сверху REQUEST_TIMEOUT_MAX_S
+    - Кладёт абсолютный дедлайн в контекст (см. src/core/deadline.py)
+    """
+
+    async def dispatch(self, request: Request, call_next):
+        s = get_settings()
+        budget_s = s.request_timeout_s
+        incoming = request.headers.get(DEADLINE_HEADER.lower())
+        if incoming:
+            try:
+                budget_s = float(incoming)
+            except ValueError:
+                log.warning("Ignoring invalid %s header: %r", DEADLINE_HEADER, incoming)
+        budget_s = min(max(0.0, budget_s), s.request_timeout_max_s)
+
+        token = set_deadline(budget_s)
+        try:
+            return await call_next(request)
+        finally:
+            deadline_var.reset(token)
+
+
 class SimpleAccessLogMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
         t0 = time.perf_counter()
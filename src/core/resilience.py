@@ -0,0 +1,144 @@
+"""Retry and circuit-breaker primitives for calls to flaky upstreams.
+
+- RetryPolicy: capped exponential backoff with full jitter.
+- RetryBudget: retries allowed as a ratio of requests, so a failing
+  upstream sees at most (1 + ratio) x normal traffic, not 2x.
+- CircuitBreaker: after N consecutive failures, fail fast for a cool-down
+  period, then let one half-open probe through to test recovery.
+
+The objects are used from a single event loop and need no locking.
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Dict
+
+from src.core.errors import ServiceOverloaded
+from src.core.metrics import REGISTRY
+
+CIRCUIT_STATE = REGISTRY.gauge(
+    "circuit_breaker_state",
+    "Circuit breaker state (0 = closed, 1 = half-open, 2 = open).",
+    ("name",),
+)
+CIRCUIT_REJECTIONS = REGISTRY.counter(
+    "circuit_breaker_rejections_total",
+    "Calls failed fast because the circuit was open.",
+    ("name",),
+)
+
+_STATE_VALUE = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class CircuitOpen(ServiceOverloaded):
+    """Upstream is considered down; call was not attempted."""
+    pass
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """How many attempts and how long to wait between them."""
+    max_attempts: int = 2
+    base_delay_s: float = 0.5
+    max_delay_s: float = 4.0
+
+    def backoff(self, attempt: int) -> float:
+        """Delay before retry number `attempt` (1-based), with full jitter."""
+        cap = min(self.max_delay_s, self.base_delay_s * (2 ** max(0, attempt - 1)))
+        return random.uniform(0.0, cap)
+
+
+class RetryBudget:
+    """Token bucket: each request earns `ratio` tokens, each retry spends one."""
+
+    def __init__(self, ratio: float = 0.2, max_tokens: float = 10.0) -> None:
+        """Create a full bucket of max_tokens."""
+        self.ratio = max(0.0, float(ratio))
+        self.max_tokens = max(1.0, float(max_tokens))
+        self.tokens = self.max_tokens
+        self.exhausted = 0
+
+    def record_request(self) -> None:
+        """Credit the budget for one first attempt."""
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        """Take one retry token; False if the budget is exhausted."""
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return True
+        self.exhausted += 1
+        return False
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failures.
+
+    While open, `before_call()` raises CircuitOpen until `reset_timeout_s`
+    has passed; then one probe is let through (half-open). A successful
+    probe closes the circuit, a failed one opens it again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout_s: float = 30.0) -> None:
+        """Create a closed breaker; name labels the metrics."""
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout_s = max(0.0, float(reset_timeout_s))
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        CIRCUIT_STATE.set(0, name=name)
+
+    def _set_state(self, state: str) -> None:
+        self.state = state
+        CIRCUIT_STATE.set(_STATE_VALUE[state], name=self.name)
+
+    def before_call(self) -> None:
+        """Admit a call or raise CircuitOpen."""
+        if self.state == "open":
+            remaining = self.opened_at + self.reset_timeout_s - time.monotonic()
+            if remaining > 0:
+                CIRCUIT_REJECTIONS.inc(name=self.name)
+                raise CircuitOpen(
+                    f"Upstream '{self.name}' is unavailable (circuit open).",
+                    retry_after_s=remaining,
+                    status_code=503,
+                )
+            self._set_state("half_open")
+            self._probe_in_flight = False
+        if self.state == "half_open":
+            if self._probe_in_flight:
+                CIRCUIT_REJECTIONS.inc(name=self.name)
+                raise CircuitOpen(
+                    f"Upstream '{self.name}' is being probed (circuit half-open).",
+                    retry_after_s=1.0,
+                    status_code=503,
+                )
+            self._probe_in_flight = True
+
+    def on_success(self) -> None:
+        """Upstream answered: close the circuit."""
+        self.failures = 0
+        self._probe_in_flight = False
+        if self.state != "closed":
+            self._set_state("closed")
+
+    def on_failure(self) -> None:
+        """Upstream failed: count it and open the circuit if needed."""
+        self._probe_in_flight = False
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._set_state("open")
+
+    def on_abandoned(self) -> None:
+        """Call ended without an upstream verdict (cancelled, shed locally)."""
+        self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        """Return state and consecutive failure count."""
+        return {"name": self.name, "state": self.state, "failures": self.failures}
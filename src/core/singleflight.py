@@ -0,0 +1,79 @@
+"""Single-flight coalescing of identical concurrent async calls.
+
+The first caller for a key starts the work as a task; callers arriving
+while it runs await the same task. Each waiter awaits through
+`asyncio.shield`, so a cancelled (disconnected) waiter never cancels work
+that other callers still wait for. When the last waiter goes away the work
+is cancelled: nobody needs its result any more.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple, TypeVar
+
+from src.core.metrics import REGISTRY
+
+T = TypeVar("T")
+
+SINGLEFLIGHT_CALLS = REGISTRY.counter(
+    "singleflight_calls_total",
+    "Coalesced calls by role (leader = ran the work, follower = shared it).",
+    ("name", "role"),
+)
+SINGLEFLIGHT_CANCELLED = REGISTRY.counter(
+    "singleflight_cancelled_total",
+    "Shared calls cancelled because every waiter went away.",
+    ("name",),
+)
+
+
+@dataclass
+class _Call:
+    task: asyncio.Task
+    waiters: int = 0
+
+
+class SingleFlight:
+    """Deduplicate concurrent calls with the same key (per event loop)."""
+
+    def __init__(self, name: str) -> None:
+        """Create a group; name labels the metrics."""
+        self.name = name
+        self._inflight: Dict[Hashable, _Call] = {}
+
+    def _forget(self, key: Hashable, call: _Call) -> None:
+        """Done-callback: drop the key and consume the task outcome."""
+        if self._inflight.get(key) is call:
+            del self._inflight[key]
+        if not call.task.cancelled():
+            call.task.exception()  # mark retrieved even if every waiter went away
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Run fn() once per key among concurrent callers.
+
+        Returns:
+            (result, shared): shared is True if this caller joined work
+            started by another caller.
+        """
+        call = self._inflight.get(key)
+        shared = call is not None
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._inflight[key] = call
+            call.task.add_done_callback(lambda t, k=key, c=call: self._forget(k, c))
+        SINGLEFLIGHT_CALLS.inc(name=self.name, role="follower" if shared else "leader")
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task), shared
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+                SINGLEFLIGHT_CANCELLED.inc(name=self.name)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the number of keys currently in flight."""
+        return {"name": self.name, "inflight": len(self._inflight)}
@@ -0,0 +1,306 @@
+"""Chunk records and their compact columnar representation.
+
+In memory, chunk metadata is kept column-wise (numpy int arrays, a
+source-path dictionary with small int codes and one UTF-8 text buffer
+with an offset table). `ChunkRecord` objects are only materialised for
+rows that are actually read, e.g. the top-k hits of a search.
+
+On-disk layout (next to faiss.index):
+    chunks.bin          UTF-8 chunk texts, concatenated
+    chunks_offsets.npy  int64 (n+1,) byte offsets into chunks.bin
+    chunks_meta.npy     int64 (n, 4): source_id, chunk_id, start_char, end_char
+    chunks_sources.json list of source paths (source_id -> path)
+    chunks_ids.npy      int64 (n,) FAISS vector ids, ascending (ID-mapped indexes)
+
+With mmap loading all arrays are memory-mapped, so N processes share one
+page-cache copy and texts are decoded only for returned rows.
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+from array import array
+from itertools import chain
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+BLOB_FILE = "chunks.bin"
+OFFSETS_FILE = "chunks_offsets.npy"
+META_FILE = "chunks_meta.npy"
+SOURCES_FILE = "chunks_sources.json"
+IDS_FILE = "chunks_ids.npy"
+
+
+@dataclass(frozen=True)
+class ChunkRecord:
+    """Persisted record for a chunk stored in FAISS."""
+    source_path: str
+    chunk_id: int
+    start_char: int
+    end_char: int
+    text: str
+
+
+def chunk_store_exists(dir_path: Path) -> bool:
+    """Return True if the binary chunk store files are present."""
+    return all((dir_path / name).exists() for name in (BLOB_FILE, OFFSETS_FILE, META_FILE, SOURCES_FILE))
+
+
+def _code_dtype(n_sources: int) -> np.dtype:
+    """Smallest unsigned dtype able to hold source codes."""
+    if n_sources <= np.iinfo(np.uint8).max + 1:
+        return np.dtype(np.uint8)
+    if n_sources <= np.iinfo(np.uint16).max + 1:
+        return np.dtype(np.uint16)
+    return np.dtype(np.uint32)
+
+
+class ChunkColumns(Sequence[ChunkRecord]):
+    """Read-only columnar table of chunks, indexable like List[ChunkRecord]."""
+
+    def __init__(
+        self,
+        chunk_id: np.ndarray,
+        start_char: np.ndarray,
+        end_char: np.ndarray,
+        source_codes: np.ndarray,
+        sources: List[str],
+        text_offsets: np.ndarray,
+        text_blob: np.ndarray,
+        ids: Optional[np.ndarray] = None,
+        mmapped: bool = False,
+    ) -> None:
+        """Initialize from column arrays (see `from_records` / `open`).
+
+        `ids` are the FAISS vector ids of the rows (ascending); they
+        default to row positions for indexes that are not ID-mapped.
+        """
+        n = chunk_id.shape[0]
+        if not (start_char.shape[0] == end_char.shape[0] == source_codes.shape[0] == n):
+            raise ValueError("chunk column lengths do not match")
+        if text_offsets.shape[0] != n + 1:
+            raise ValueError("chunk text offsets and metadata row counts do not match")
+        if ids is None:
+            ids = np.arange(n, dtype=np.int64)
+        if ids.shape[0] != n:
+            raise ValueError("chunk ids and metadata row counts do not match")
+        self.chunk_id = chunk_id
+        self.start_char = start_char
+        self.end_char = end_char
+        self.source_codes = source_codes
+        self.sources = sources
+        self.text_offsets = text_offsets
+        self.text_blob = text_blob
+        self.ids = ids
+        self.mmapped = mmapped
+
+    # -----------------------------------------------------------------------
+    # Section: Construction
+    # -----------------------------------------------------------------------
+    @staticmethod
+    def from_records(records: Iterable[ChunkRecord], ids: Optional[np.ndarray] = None) -> "ChunkColumns":
+        """Build columns from records (streams; does not keep the records)."""
+        source_ids: Dict[str, int] = {}
+        codes = array("I")
+        chunk_ids = array("q")
+        starts = array("q")
+        ends = array("q")
+        offsets = array("q", [0])
+        blob = bytearray()
+
+        for r in records:
+            codes.append(source_ids.setdefault(r.source_path, len(source_ids)))
+            chunk_ids.append(r.chunk_id)
+            starts.append(r.start_char)
+            ends.append(r.end_char)
+            blob += r.text.encode("utf-8")
+            offsets.append(len(blob))
+
+        return ChunkColumns(
+            chunk_id=np.frombuffer(chunk_ids, dtype=np.int64).astype(np.int32),
+            start_char=np.frombuffer(starts, dtype=np.int64).astype(np.int32),
+            end_char=np.frombuffer(ends, dtype=np.int64).astype(np.int32),
+            source_codes=np.frombuffer(codes, dtype=np.uint32).astype(_code_dtype(len(source_ids))),
+            sources=list(source_ids),
+            text_offsets=np.frombuffer(offsets, dtype=np.int64).copy(),
+            text_blob=np.frombuffer(bytes(blob), dtype=np.uint8),
+            ids=None if ids is None else np.asarray(ids, dtype=np.int64),
+        )
+
+    @staticmethod
+    def from_jsonl(path: Path) -> "ChunkColumns":
+        """Build columns from a chunks.jsonl file, one line at a time."""
+        def _iter() -> Iterator[ChunkRecord]:
+            with path.open("r", encoding="utf-8") as f:
+                for line in f:
+                    yield ChunkRecord(**json.loads(line))
+
+        return ChunkColumns.from_records(_iter())
+
+    @staticmethod
+    def open(dir_path: Path, mmap: bool = False) -> "ChunkColumns":
+        """Open the binary chunk store in dir_path.
+
+        Args:
+            dir_path: Index directory.
+            mmap: Map files read-only instead of copying them into memory.
+        """
+        blob_path = dir_path / BLOB_FILE
+        mode = "r" if mmap else None
+        # np.memmap cannot map empty files.
+        if mmap and blob_path.stat().st_size > 0:
+            blob = np.memmap(blob_path, dtype=np.uint8, mode="r")
+        else:
+            blob = np.fromfile(blob_path, dtype=np.uint8)
+        offsets = np.load(dir_path / OFFSETS_FILE, mmap_mode=mode)
+        meta = np.load(dir_path / META_FILE, mmap_mode=mode)
+        sources = json.loads((dir_path / SOURCES_FILE).read_text(encoding="utf-8"))
+        ids_path = dir_path / IDS_FILE
+        ids = np.load(ids_path, mmap_mode=mode) if ids_path.exists() else None
+
+        if mmap:
+            # Strided views over the mapped table: no copies.
+            return ChunkColumns(
+                chunk_id=meta[:, 1],
+                start_char=meta[:, 2],
+                end_char=meta[:, 3],
+                source_codes=meta[:, 0],
+                sources=sources,
+                text_offsets=offsets,
+                text_blob=blob,
+                ids=ids,
+                mmapped=True,
+            )
+
+        return ChunkColumns(
+            chunk_id=meta[:, 1].astype(np.int32),
+            start_char=meta[:, 2].astype(np.int32),
+            end_char=meta[:, 3].astype(np.int32),
+            source_codes=meta[:, 0].astype(_code_dtype(len(sources))),
+            sources=sources,
+            text_offsets=offsets,
+            text_blob=blob,
+            ids=ids,
+        )
+
+    def save(self, dir_path: Path) -> None:
+        """Write the binary chunk store into dir_path."""
+        dir_path.mkdir(parents=True, exist_ok=True)
+        meta = np.stack(
+            [self.source_codes, self.chunk_id, self.start_char, self.end_char],
+            axis=1,
+        ).astype(np.int64)
+        np.asarray(self.text_blob, dtype=np.uint8).tofile(dir_path / BLOB_FILE)
+        np.save(dir_path / OFFSETS_FILE, np.asarray(self.text_offsets, dtype=np.int64))
+        np.save(dir_path / META_FILE, meta.reshape(-1, 4))
+        np.save(dir_path / IDS_FILE, np.asarray(self.ids, dtype=np.int64))
+        (dir_path / SOURCES_FILE).write_text(
+            json.dumps(self.sources, ensure_ascii=False),
+            encoding="utf-8",
+        )
+
+    # -----------------------------------------------------------------------
+    # Section: Row operations (used by incremental index updates)
+    # -----------------------------------------------------------------------
+    def rows_for_sources(self, paths: Iterable[str]) -> np.ndarray:
+        """Return row positions whose source path is in paths."""
+        wanted = set(paths)
+        codes = [i for i, sp in enumerate(self.sources) if sp in wanted]
+        if not codes:
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero(np.isin(self.source_codes, codes))
+
+    def rows_for_ids(self, labels: np.ndarray) -> np.ndarray:
+        """Map FAISS ids to row positions (-1 for unknown ids)."""
+        labels = np.asarray(labels, dtype=np.int64)
+        if len(self) == 0:
+            return np.full(labels.shape, -1, dtype=np.int64)
+        rows = np.searchsorted(self.ids, labels)
+        rows = np.minimum(rows, len(self) - 1)
+        return np.where(np.asarray(self.ids)[rows] == labels, rows, -1)
+
+    def take(self, rows: np.ndarray) -> "ChunkColumns":
+        """Return an in-memory table with the given rows (in order)."""
+        rows = np.asarray(rows, dtype=np.int64)
+        return ChunkColumns.from_records((self[int(i)] for i in rows), ids=np.asarray(self.ids)[rows])
+
+    def concat(self, other: "ChunkColumns") -> "ChunkColumns":
+        """Return an in-memory table with other's rows appended."""
+        ids = np.concatenate([np.asarray(self.ids), np.asarray(other.ids)])
+        return ChunkColumns.from_records(chain(self, other), ids=ids)
+
+    # -----------------------------------------------------------------------
+    # Section: Sequence protocol (materialises ChunkRecord per row)
+    # -----------------------------------------------------------------------
+    def __len__(self) -> int:
+        return int(self.chunk_id.shape[0])
+
+    def text_at(self, i: int) -> str:
+        """Decode the text of row i."""
+        start, end = int(self.text_offsets[i]), int(self.text_offsets[i + 1])
+        return bytes(self.text_blob[start:end]).decode("utf-8")
+
+    def source_at(self, i: int) -> str:
+        """Return the source path of row i."""
+        return self.sources[int(self.source_codes[i])]
+
+    def __getitem__(self, i):  # type: ignore[override]
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("chunk index out of range")
+        return ChunkRecord(
+            source_path=self.source_at(i),
+            chunk_id=int(self.chunk_id[i]),
+            start_char=int(self.start_char[i]),
+            end_char=int(self.end_char[i]),
+            text=self.text_at(i),
+        )
+
+    def __iter__(self) -> Iterator[ChunkRecord]:
+        for i in range(len(self)):
+            yield self[i]
+
+    # -----------------------------------------------------------------------
+    # Section: Memory accounting
+    # -----------------------------------------------------------------------
+    def memory_usage(self, sample: int = 256) -> Dict[str, Any]:
+        """Report columnar memory vs an estimated List[ChunkRecord] footprint.
+
+        The list estimate measures a sample of materialised records
+        (dataclass + its str/int fields + list slot) and scales it to n.
+        """
+        arrays = (
+            self.chunk_id, self.start_char, self.end_char, self.source_codes,
+            self.text_offsets, self.text_blob, self.ids,
+        )
+        columnar = int(sum(a.nbytes for a in arrays))
+        columnar += sys.getsizeof(self.sources) + sum(sys.getsizeof(s) for s in self.sources)
+
+        n = len(self)
+        est_list = 0
+        if n:
+            step = max(1, n // sample)
+            rows = range(0, n, step)
+            per_row = 0
+            for i in rows:
+                r = self[i]
+                per_row += sys.getsizeof(r) + sys.getsizeof(vars(r))
+                per_row += sys.getsizeof(r.source_path) + sys.getsizeof(r.text)
+                per_row += sys.getsizeof(r.chunk_id) + sys.getsizeof(r.start_char) + sys.getsizeof(r.end_char)
+                per_row += 8  # list slot
+            est_list = int(per_row / len(rows) * n)
+
+        return {
+            "rows": n,
+            "mmapped": self.mmapped,
+            "columnar_bytes": columnar,
+            "records_list_bytes_estimate": est_list,
+        }
+
@@ -3,22 +3,21 @@
 from __future__ import annotations
 
 import json
+import math
+import struct
 from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import List, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import faiss
 import numpy as np
 
+from src.core.logging import get_logger
+from src.index.chunk_store import ChunkColumns, ChunkRecord, chunk_store_exists
 
-@dataclass(frozen=True)
-class ChunkRecord:
-    """Persisted record for a chunk stored in FAISS."""
-    source_path: str
-    chunk_id: int
-    start_char: int
-    end_char: int
-    text: str
+log = get_logger(__name__)
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "ivfpq")
 
 
 @dataclass(frozen=True)
@@ -28,27 +27,304 @@ class SearchHit:
     record: ChunkRecord
 
 
+@dataclass(frozen=True)
+class IndexParams:
+    """Index type and build parameters (persisted in index_meta.json)."""
+    index_type: str = "flat"
+    nlist: int = 0  # 0 -> auto
+    hnsw_m: int = 32
+    hnsw_ef_construction: int = 200
+    pq_m: int = 0  # 0 -> auto
+    pq_bits: int = 8
+    train_size: int = 100_000
+    seed: int = 1234
+
+    @staticmethod
+    def from_settings(settings) -> "IndexParams":
+        """Create build parameters from application settings."""
+        return IndexParams(
+            index_type=settings.index_type,
+            nlist=settings.index_nlist,
+            hnsw_m=settings.index_hnsw_m,
+            hnsw_ef_construction=settings.index_hnsw_ef_construction,
+            pq_m=settings.index_pq_m,
+            pq_bits=settings.index_pq_bits,
+            train_size=settings.index_train_size,
+        )
+
+
+# ---------------------------------------------------------------------------
+# Section: Index factory
+# ---------------------------------------------------------------------------
+# All index types use inner product: with normalized embeddings it is cosine.
+def _auto_nlist(n: int) -> int:
+    """Pick the number of IVF lists for a corpus of n vectors."""
+    return max(1, min(int(4 * math.sqrt(n)), n // 39 or 1))
+
+
+def _auto_pq_m(d: int) -> int:
+    """Pick a PQ subquantizer count that divides d (>= 8 dims per code)."""
+    for m in (64, 48, 32, 24, 16, 12, 8, 4, 2, 1):
+        if d % m == 0 and d // m >= 8:
+            return m
+    return 1
+
+
+def select_training_sample(vectors: np.ndarray, max_size: int, seed: int = 1234) -> np.ndarray:
+    """Return a random subset of rows used to train IVF/PQ quantizers.
+
+    Uniform sampling keeps the coarse centroids representative of the
+    whole corpus while bounding k-means time on large builds.
+    """
+    n = vectors.shape[0]
+    if max_size <= 0 or n <= max_size:
+        return vectors
+    rng = np.random.default_rng(seed)
+    ids = np.sort(rng.choice(n, size=max_size, replace=False))
+    return np.ascontiguousarray(vectors[ids])
+
+
+def create_index(vectors: np.ndarray, params: IndexParams) -> Tuple[faiss.Index, IndexParams]:
+    """Create and train an index for the given vectors (vectors are not added).
+
+    Returns:
+        The (trained) index and the effective parameters, with auto values
+        resolved. Falls back to a flat index when the corpus is too small
+        to train the requested quantizers.
+    """
+    if params.index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index_type: {params.index_type!r} (expected one of {INDEX_TYPES})")
+
+    n, d = vectors.shape
+    metric = faiss.METRIC_INNER_PRODUCT
+
+    if params.index_type == "flat":
+        return faiss.IndexFlatIP(d), params
+
+    if params.index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(d, params.hnsw_m, metric)
+        index.hnsw.efConstruction = params.hnsw_ef_construction
+        return index, params
+
+    nlist = params.nlist if params.nlist > 0 else _auto_nlist(n)
+    nlist = min(nlist, n)
+    sample = select_training_sample(vectors, params.train_size, seed=params.seed)
+
+    if params.index_type == "ivfpq":
+        if sample.shape[0] < 2 ** params.pq_bits:
+            log.warning(
+                "Not enough vectors to train IVF-PQ (%d < %d), falling back to flat index.",
+                sample.shape[0], 2 ** params.pq_bits,
+            )
+            return faiss.IndexFlatIP(d), IndexParams(index_type="flat")
+        pq_m = params.pq_m if params.pq_m > 0 else _auto_pq_m(d)
+        if d % pq_m != 0:
+            raise ValueError(f"pq_m={pq_m} must divide vector dim {d}")
+        quantizer = faiss.IndexFlatIP(d)
+        index = faiss.IndexIVFPQ(quantizer, d, nlist, pq_m, params.pq_bits, metric)
+        effective = IndexParams(
+            index_type="ivfpq", nlist=nlist, pq_m=pq_m, pq_bits=params.pq_bits,
+            train_size=int(sample.shape[0]), seed=params.seed,
+        )
+    else:
+        quantizer = faiss.IndexFlatIP(d)
+        index = faiss.IndexIVFFlat(quantizer, d, nlist, metric)
+        effective = IndexParams(
+            index_type="ivf", nlist=nlist, train_size=int(sample.shape[0]), seed=params.seed,
+        )
+
+    index.train(sample)
+    return index, effective
+
+
+def infer_index_params(index: faiss.Index) -> IndexParams:
+    """Recover index type and parameters from a loaded FAISS index."""
+    if isinstance(index, faiss.IndexIDMap):
+        index = faiss.downcast_index(index.index)
+    if isinstance(index, faiss.IndexIVFPQ):
+        return IndexParams(index_type="ivfpq", nlist=index.nlist, pq_m=index.pq.M, pq_bits=index.pq.nbits)
+    if isinstance(index, faiss.IndexIVF):
+        return IndexParams(index_type="ivf", nlist=index.nlist)
+    if isinstance(index, faiss.IndexHNSW):
+        return IndexParams(
+            index_type="hnsw",
+            hnsw_m=index.hnsw.nb_neighbors(1),
+            hnsw_ef_construction=index.hnsw.efConstruction,
+        )
+    return IndexParams(index_type="flat")
+
+
+_IDMAP_FOURCCS = (b"IxMp", b"IxM2")
+
+
+def _index_fourcc(idx_path: Path) -> bytes:
+    """Fourcc of the stored index, looking through an IndexIDMap wrapper."""
+    with idx_path.open("rb") as f:
+        head = f.read(64)
+    fourcc = head[:4]
+    if fourcc in _IDMAP_FOURCCS and len(head) >= 41:
+        # IDMap header: fourcc, d (i32), ntotal, 2 x dummy (i64), is_trained (u8),
+        # metric_type (i32) [+ metric_arg (f32) for metric_type > 1]; then the wrapped index.
+        metric_type = struct.unpack("<i", head[33:37])[0]
+        offset = 41 if metric_type > 1 else 37
+        fourcc = head[offset:offset + 4]
+    return fourcc
+
+
+def _mmap_flags(idx_path: Path) -> Tuple[int, str]:
+    """Read flags that map the bulk of this index type, and their name.
+
+    IVF/IVF-PQ: IO_FLAG_MMAP maps the inverted lists. Flat/HNSW:
+    IO_FLAG_MMAP_IFC maps the flat code arrays (newer faiss). The two
+    cannot be combined: IVF indexes reject MMAP together with MMAP_IFC.
+    """
+    ifc = getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+    if _index_fourcc(idx_path).startswith(b"Iw") or not ifc:
+        return faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY, "mmap"
+    return ifc | faiss.IO_FLAG_READ_ONLY, "mmap_ifc"
+
+
+def _read_index_mmap(idx_path: Path) -> Tuple[faiss.Index, str]:
+    """Open a FAISS index with mmap flags (shared, read-only pages).
+
+    Returns the index and how it was loaded ("mmap", "mmap_ifc", or
+    "heap_fallback" if mapping failed and the index was read into memory).
+    """
+    flags, mode = _mmap_flags(idx_path)
+    try:
+        return faiss.read_index(str(idx_path), flags), mode
+    except RuntimeError as e:
+        log.error("mmap read of %s failed (%s); reading into memory, pages are NOT shared.", idx_path, e)
+        return faiss.read_index(str(idx_path)), "heap_fallback"
+
+
 class FaissStore:
     """Thin wrapper around a FAISS index and its associated records."""
 
-    def __init__(self, index: faiss.Index, records: List[ChunkRecord]) -> None:
-        """Initialize with a FAISS index and corresponding records."""
+    def __init__(
+        self,
+        index: faiss.Index,
+        records: Sequence[ChunkRecord],
+        params: Optional[IndexParams] = None,
+    ) -> None:
+        """Initialize with a FAISS index and corresponding records.
+
+        Records are stored column-wise (`ChunkColumns`); a plain list of
+        `ChunkRecord` is converted on the way in.
+        """
         self.index = index
-        self.records = records
+        self.records = records if isinstance(records, ChunkColumns) else ChunkColumns.from_records(records)
+        self.params = params or IndexParams()
+        # How the index was loaded: heap | mmap | mmap_ifc | heap_fallback (see /debug/index).
+        self.load_mode = "heap"
 
     @staticmethod
-    def build(vectors: np.ndarray, records: List[ChunkRecord]) -> "FaissStore":
-        """Build a FAISS store from vectors and records."""
+    def build(
+        vectors: np.ndarray,
+        records: List[ChunkRecord],
+        params: Optional[IndexParams] = None,
+        id_map: bool = False,
+    ) -> "FaissStore":
+        """Build a FAISS store from vectors and records.
+
+        Args:
+            vectors: Embedding matrix (n, d), float32.
+            records: Chunk records aligned with vector rows.
+            params: Index type/build parameters (flat when None).
+            id_map: Store explicit vector ids so that vectors can later be
+                removed/added per document (see `remove_sources`/`add`).
+                Flat indexes are wrapped in IndexIDMap2, IVF indexes use
+                their native ids; HNSW does not support removal.
+        """
         if len(records) != vectors.shape[0]:
             raise ValueError("records count must match vectors rows")
 
-        d = vectors.shape[1]
-        index = faiss.IndexFlatIP(d)  # inner product, с normalize_embeddings=True это косинус
-        index.add(vectors)
-        return FaissStore(index=index, records=records)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        # inner product, с normalize_embeddings=True это косинус
+        index, effective = create_index(vectors, params or IndexParams())
+        ids = np.arange(vectors.shape[0], dtype=np.int64)
+
+        if id_map and effective.index_type == "flat":
+            index = faiss.IndexIDMap2(index)
+        if id_map and effective.index_type != "hnsw":
+            index.add_with_ids(vectors, ids)
+        else:
+            index.add(vectors)
+
+        columns = ChunkColumns.from_records(records, ids=ids)
+        return FaissStore(index=index, records=columns, params=effective)
+
+    @property
+    def supports_updates(self) -> bool:
+        """True if vectors can be removed/added by id (see `build(id_map=True)`)."""
+        if isinstance(self.index, faiss.IndexIDMap):
+            return True
+        return isinstance(self.index, faiss.IndexIVF)
+
+    def remove_sources(self, source_paths: Sequence[str]) -> int:
+        """Remove all vectors and records of the given source documents."""
+        if not self.supports_updates:
+            raise RuntimeError(f"Index type '{self.params.index_type}' does not support removal; rebuild instead.")
+        rows = self.records.rows_for_sources(source_paths)
+        if rows.size == 0:
+            return 0
+        ids = np.ascontiguousarray(np.asarray(self.records.ids)[rows], dtype=np.int64)
+        self.index.remove_ids(ids)
+        keep = np.setdiff1d(np.arange(len(self.records)), rows, assume_unique=True)
+        self.records = self.records.take(keep)
+        return int(rows.size)
+
+    def add(self, vectors: np.ndarray, records: Sequence[ChunkRecord]) -> None:
+        """Append vectors and records with fresh ids (after the current max id)."""
+        if not self.supports_updates:
+            raise RuntimeError(f"Index type '{self.params.index_type}' does not support updates; rebuild instead.")
+        if len(records) != vectors.shape[0]:
+            raise ValueError("records count must match vectors rows")
+        if not len(records):
+            return
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        start = int(np.max(self.records.ids)) + 1 if len(self.records) else 0
+        ids = np.arange(start, start + vectors.shape[0], dtype=np.int64)
+        self.index.add_with_ids(vectors, ids)
+        self.records = self.records.concat(ChunkColumns.from_records(records, ids=ids))
+
+    def index_meta(self) -> Dict[str, Any]:
+        """Return index type and build parameters for index_meta.json."""
+        p = self.params
+        meta: Dict[str, Any] = {"type": p.index_type, "id_map": self.supports_updates}
+        if p.index_type in ("ivf", "ivfpq"):
+            meta.update(nlist=p.nlist, train_size=p.train_size)
+        if p.index_type == "ivfpq":
+            meta.update(pq_m=p.pq_m, pq_bits=p.pq_bits)
+        if p.index_type == "hnsw":
+            meta.update(M=p.hnsw_m, efConstruction=p.hnsw_ef_construction)
+        return meta
+
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> Dict[str, int]:
+        """Apply runtime search knobs for ANN indexes.
+
+        Knobs that do not apply to the loaded index type are ignored.
+        Returns the values that were actually set.
+        """
+        applied: Dict[str, int] = {}
+        index = self.index
+        if isinstance(index, faiss.IndexIDMap):
+            index = faiss.downcast_index(index.index)
+
+        if isinstance(index, faiss.IndexIVF) and nprobe:
+            index.nprobe = max(1, min(int(nprobe), index.nlist))
+            applied["nprobe"] = int(index.nprobe)
+        if isinstance(index, faiss.IndexHNSW) and ef_search:
+            index.hnsw.efSearch = max(1, int(ef_search))
+            applied["efSearch"] = int(index.hnsw.efSearch)
+        return applied
 
     def save(self, dir_path: Path) -> None:
-        """Persist FAISS index and chunk records to disk."""
+        """Persist FAISS index and chunk records to disk.
+
+        chunks.jsonl stays the human-readable source of truth; the binary
+        chunk store is written alongside it for memory-mapped loading.
+        """
         dir_path.mkdir(parents=True, exist_ok=True)
         faiss.write_index(self.index, str(dir_path / "faiss.index"))
 
@@ -57,39 +333,83 @@ class FaissStore:
             for r in self.records:
                 f.write(json.dumps(asdict(r), ensure_ascii=False) + "\n")
 
+        self.records.save(dir_path)
+
     @staticmethod
-    def load(dir_path: Path) -> "FaissStore":
-        """Load a FAISS index and records from disk."""
+    def load(dir_path: Path, mmap: bool = False) -> "FaissStore":
+        """Load a FAISS index and records from disk.
+
+        Args:
+            dir_path: Index directory.
+            mmap: Memory-map the FAISS index and the binary chunk store
+                instead of reading them into private heap memory. Falls
+                back to a regular load for indexes without a chunk store.
+        """
         idx_path = dir_path / "faiss.index"
         meta_path = dir_path / "chunks.jsonl"
 
         if not idx_path.exists() or not meta_path.exists():
             raise FileNotFoundError(f"Index files not found in {dir_path}")
 
-        index = faiss.read_index(str(idx_path))
+        has_store = chunk_store_exists(dir_path)
+        if mmap and not has_store:
+            log.warning("Binary chunk store not found in %s; rebuild the index to enable mmap loading.", dir_path)
+            mmap = False
 
-        records: List[ChunkRecord] = []
-        with meta_path.open("r", encoding="utf-8") as f:
-            for line in f:
-                obj = json.loads(line)
-                records.append(ChunkRecord(**obj))
+        if mmap:
+            index, load_mode = _read_index_mmap(idx_path)
+        else:
+            index, load_mode = faiss.read_index(str(idx_path)), "heap"
+        # Prefer the binary store: no per-line JSON parsing on startup.
+        records = ChunkColumns.open(dir_path, mmap=mmap) if has_store else ChunkColumns.from_jsonl(meta_path)
+        if len(records) != index.ntotal:
+            raise RuntimeError(
+                f"Chunk store has {len(records)} rows but index has {index.ntotal} vectors. Rebuild the index."
+            )
 
-        return FaissStore(index=index, records=records)
+        store = FaissStore(index=index, records=records, params=infer_index_params(index))
+        store.load_mode = load_mode
+        return store
 
     def search(self, query_vec: np.ndarray, k: int = 5) -> List[SearchHit]:
         """Search the index with a query vector and return hits."""
         if query_vec.ndim == 1:
             query_vec = query_vec.reshape(1, -1)
-        if query_vec.dtype != np.float32:
-            query_vec = query_vec.astype(np.float32)
+        return self.search_batch(query_vec[:1], k=k)[0]
+
+    def search_batch(self, matrix: np.ndarray, k: int = 5) -> List[List[SearchHit]]:
+        """Search the index with a (n, d) query matrix in one FAISS call.
+
+        Returns:
+            One hit list per query row, in input order.
+        """
+        scores, rows = self.search_rows(matrix, k=k)
+        return [self.hits_for_rows(s, r) for s, r in zip(scores.tolist(), rows.tolist())]
+
+    def search_rows(self, matrix: np.ndarray, k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """Search without materialising records.
 
-        scores, ids = self.index.search(query_vec, k)
-        hits: List[SearchHit] = []
+        Returns:
+            (scores, rows) arrays of shape (n, k); rows are positions in
+            `records` and -1 marks empty result slots.
+        """
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(1, -1)
+        if matrix.shape[0] == 0:
+            return np.zeros((0, k), dtype=np.float32), np.zeros((0, k), dtype=np.int64)
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
 
-        for score, idx in zip(scores[0].tolist(), ids[0].tolist()):
-            if idx == -1:
-                continue
-            hits.append(SearchHit(score=float(score), record=self.records[idx]))
+        scores, labels = self.index.search(matrix, k)
+        # Labels are vector ids; they equal row positions unless the index
+        # has been updated incrementally.
+        rows = self.records.rows_for_ids(labels)
+        rows[labels == -1] = -1
+        return scores, rows
 
-        return hits
-    
\ No newline at end of file
+    def hits_for_rows(self, scores: Sequence[float], rows: Sequence[int]) -> List[SearchHit]:
+        """Materialise hits for one query's (scores, rows), skipping -1 rows."""
+        return [
+            SearchHit(score=float(score), record=self.records[int(idx)])
+            for score, idx in zip(scores, rows)
+            if idx != -1
+        ]
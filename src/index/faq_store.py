@@ -0,0 +1,92 @@
+"""Small exact index of FAQ questions with their stored answers.
+
+Saved next to the main index:
+    faq.index    FAISS IndexFlatIP over normalised question embeddings
+    faq.jsonl    one FAQEntry per vector (same order)
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import faiss
+import numpy as np
+
+FAQ_INDEX_FILE = "faq.index"
+FAQ_ENTRIES_FILE = "faq.jsonl"
+
+
+@dataclass(frozen=True)
+class FAQEntry:
+    """Stored answer and where it comes from (chunk_id = -1 if unknown)."""
+    source_path: str
+    chunk_id: int
+    question: str
+    answer: str
+
+
+@dataclass(frozen=True)
+class FAQMatch:
+    """Best FAQ question for a query."""
+    score: float
+    entry: FAQEntry
+
+
+class FAQStore:
+    """Exact inner-product search over FAQ question vectors."""
+
+    def __init__(self, index: faiss.Index, entries: List[FAQEntry]) -> None:
+        if index.ntotal != len(entries):
+            raise RuntimeError(f"FAQ index has {index.ntotal} vectors but {len(entries)} entries.")
+        self.index = index
+        self.entries = entries
+
+    @staticmethod
+    def build(vectors: np.ndarray, entries: Sequence[FAQEntry]) -> "FAQStore":
+        """Create a store from question embeddings (n, d) and their entries."""
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        index = faiss.IndexFlatIP(int(vectors.shape[1]))
+        index.add(vectors)
+        return FAQStore(index, list(entries))
+
+    def save(self, dir_path: Path) -> None:
+        """Persist the FAQ index and entries to disk."""
+        dir_path.mkdir(parents=True, exist_ok=True)
+        faiss.write_index(self.index, str(dir_path / FAQ_INDEX_FILE))
+        with (dir_path / FAQ_ENTRIES_FILE).open("w", encoding="utf-8") as f:
+            for e in self.entries:
+                f.write(json.dumps(asdict(e), ensure_ascii=False) + "\n")
+
+    @staticmethod
+    def load(dir_path: Path) -> Optional["FAQStore"]:
+        """Load the FAQ index; None if it was not built."""
+        idx_path = dir_path / FAQ_INDEX_FILE
+        entries_path = dir_path / FAQ_ENTRIES_FILE
+        if not idx_path.exists() or not entries_path.exists():
+            return None
+        with entries_path.open("r", encoding="utf-8") as f:
+            entries = [FAQEntry(**json.loads(line)) for line in f if line.strip()]
+        return FAQStore(faiss.read_index(str(idx_path)), entries)
+
+    @staticmethod
+    def remove(dir_path: Path) -> None:
+        """Delete FAQ files (e.g. when the corpus no longer has FAQ pairs)."""
+        for name in (FAQ_INDEX_FILE, FAQ_ENTRIES_FILE):
+            (dir_path / name).unlink(missing_ok=True)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def match(self, query_vec: np.ndarray, threshold: float) -> Optional[FAQMatch]:
+        """Return the closest FAQ question if its cosine similarity >= threshold."""
+        if not self.entries:
+            return None
+        q = np.ascontiguousarray(query_vec, dtype=np.float32).reshape(1, -1)
+        scores, ids = self.index.search(q, 1)
+        score, idx = float(scores[0][0]), int(ids[0][0])
+        if idx < 0 or score < threshold:
+            return None
+        return FAQMatch(score=score, entry=self.entries[idx])
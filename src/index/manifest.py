@@ -0,0 +1,61 @@
+"""Per-file content manifest used for incremental index updates."""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+MANIFEST_FILE = "manifest.json"
+
+
+@dataclass
+class ManifestDiff:
+    """Difference between the indexed files and the current docs dir."""
+    added: List[str] = field(default_factory=list)
+    changed: List[str] = field(default_factory=list)
+    removed: List[str] = field(default_factory=list)
+    unchanged: List[str] = field(default_factory=list)
+
+    @property
+    def is_empty(self) -> bool:
+        """True if nothing has to be re-indexed."""
+        return not (self.added or self.changed or self.removed)
+
+
+def load_manifest(dir_path: Path) -> Optional[Dict[str, str]]:
+    """Return {source_path: sha256} or None if no manifest exists."""
+    path = dir_path / MANIFEST_FILE
+    if not path.exists():
+        return None
+    obj = json.loads(path.read_text(encoding="utf-8"))
+    files = obj.get("files")
+    return dict(files) if isinstance(files, dict) else None
+
+
+def save_manifest(dir_path: Path, files: Dict[str, str]) -> None:
+    """Persist {source_path: sha256} next to the index."""
+    payload = {
+        "updated_at": datetime.now().isoformat(),
+        "files": dict(sorted(files.items())),
+    }
+    (dir_path / MANIFEST_FILE).write_text(
+        json.dumps(payload, ensure_ascii=False, indent=2),
+        encoding="utf-8",
+    )
+
+
+def diff_manifest(old: Dict[str, str], new: Dict[str, str]) -> ManifestDiff:
+    """Compare old and new {source_path: sha256} maps."""
+    diff = ManifestDiff()
+    for path, digest in sorted(new.items()):
+        if path not in old:
+            diff.added.append(path)
+        elif old[path] != digest:
+            diff.changed.append(path)
+        else:
+            diff.unchanged.append(path)
+    diff.removed = sorted(set(old) - set(new))
+    return diff
@@ -0,0 +1,164 @@
+"""Persistent on-disk cache of chunk embeddings for index builds.
+
+One cache directory per (model name, normalisation):
+    vectors.f32   append-only float32 rows, memory-mapped for reads
+    keys.bin      append-only 16-byte BLAKE2b digests of the texts (row i -> key i)
+    meta.json     model name, vector dim, normalisation flag
+
+Rows are appended vectors-first, so a crash between the two writes leaves
+at most an orphan vector row, which is ignored on the next open.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from src.core.logging import get_logger
+
+log = get_logger(__name__)
+
+KEY_BYTES = 16
+
+
+def text_key(text: str) -> bytes:
+    """Return the cache key (digest) of a chunk text."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=KEY_BYTES).digest()
+
+
+def _model_slug(model_name: str) -> str:
+    """Make a filesystem-safe directory name from a model name."""
+    return re.sub(r"[^A-Za-z0-9._-]+", "__", model_name).strip("_") or "model"
+
+
+class EmbeddingCache:
+    """Append-only (text hash -> vector) store for one embedding model."""
+
+    def __init__(self, root_dir: Path, model_name: str, normalize: bool = True) -> None:
+        """Open (or create) the cache for model_name under root_dir."""
+        suffix = "norm" if normalize else "raw"
+        self.dir = Path(root_dir) / f"{_model_slug(model_name)}__{suffix}"
+        self.model_name = model_name
+        self.normalize = normalize
+        self.dim: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self._rows: Dict[bytes, int] = {}
+        self._vectors: Optional[np.ndarray] = None
+        self._load()
+
+    # -----------------------------------------------------------------------
+    # Section: Storage
+    # -----------------------------------------------------------------------
+    @property
+    def _vectors_path(self) -> Path:
+        return self.dir / "vectors.f32"
+
+    @property
+    def _keys_path(self) -> Path:
+        return self.dir / "keys.bin"
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.dir / "meta.json"
+
+    def _load(self) -> None:
+        """Read meta and key index; map existing vectors."""
+        if not self._meta_path.exists():
+            return
+        meta = json.loads(self._meta_path.read_text(encoding="utf-8"))
+        if meta.get("model_name") != self.model_name:
+            raise RuntimeError(f"Embedding cache at {self.dir} belongs to model {meta.get('model_name')!r}")
+        self.dim = int(meta["dim"])
+
+        keys = self._keys_path.read_bytes() if self._keys_path.exists() else b""
+        n_keys = len(keys) // KEY_BYTES
+        n_vecs = self._vectors_path.stat().st_size // (4 * self.dim) if self._vectors_path.exists() else 0
+        n = min(n_keys, n_vecs)
+        if n_keys != n_vecs:
+            log.warning("Embedding cache %s is inconsistent (%d keys, %d vectors); using %d rows.", self.dir, n_keys, n_vecs, n)
+            self._truncate(n)
+
+        for i in range(n):
+            self._rows.setdefault(keys[i * KEY_BYTES:(i + 1) * KEY_BYTES], i)
+        self._map(n)
+
+    def _truncate(self, n: int) -> None:
+        """Drop partially written rows beyond n."""
+        for path, row_bytes in ((self._keys_path, KEY_BYTES), (self._vectors_path, 4 * int(self.dim or 0))):
+            if path.exists():
+                with path.open("r+b") as f:
+                    f.truncate(n * row_bytes)
+
+    def _map(self, n: int) -> None:
+        """(Re)map the vectors file for n rows."""
+        if n == 0 or self.dim is None:
+            self._vectors = None
+            return
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+
+    def _append(self, keys: List[bytes], vectors: np.ndarray) -> None:
+        """Append new rows (vectors first, then keys)."""
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+            self.dir.mkdir(parents=True, exist_ok=True)
+            self._meta_path.write_text(
+                json.dumps(
+                    {"model_name": self.model_name, "dim": self.dim, "normalize": self.normalize},
+                    ensure_ascii=False,
+                    indent=2,
+                ),
+                encoding="utf-8",
+            )
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"vector dim {vectors.shape[1]} != cache dim {self.dim}")
+
+        start = len(self)
+        with self._vectors_path.open("ab") as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        with self._keys_path.open("ab") as f:
+            f.write(b"".join(keys))
+        for i, k in enumerate(keys):
+            self._rows.setdefault(k, start + i)
+        self._map(start + len(keys))
+
+    def __len__(self) -> int:
+        return 0 if self._vectors is None else int(self._vectors.shape[0])
+
+    # -----------------------------------------------------------------------
+    # Section: Lookup
+    # -----------------------------------------------------------------------
+    def embed(self, texts: List[str], encode: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Return embeddings for texts, calling encode only for unseen texts.
+
+        Args:
+            texts: Texts to embed (duplicates are encoded once).
+            encode: Model call, e.g. `HFEmbedder(...).embed_texts`.
+        """
+        keys = [text_key(t) for t in texts]
+        missing: Dict[bytes, str] = {}
+        for k, t in zip(keys, texts):
+            if k not in self._rows and k not in missing:
+                missing[k] = t
+
+        n_missing = sum(1 for k in keys if k in missing)
+        self.misses += n_missing
+        self.hits += len(keys) - n_missing
+
+        if missing:
+            new_vecs = encode(list(missing.values()))
+            self._append(list(missing.keys()), new_vecs)
+
+        if not texts:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        rows = np.fromiter((self._rows[k] for k in keys), dtype=np.int64, count=len(keys))
+        return np.asarray(self._vectors[rows], dtype=np.float32)
+
+    def stats(self) -> Dict[str, int]:
+        """Return hit/miss counters and cache size."""
+        return {"hits": self.hits, "misses": self.misses, "rows": len(self)}
@@ -0,0 +1,92 @@
+"""Question/answer pair extraction from FAQ-style Markdown."""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from .md_chunker import split_markdown_by_headers
+
+
+# "**Q: ...?**" / "Q: ..." / "**Вопрос:** ..." and the matching answer markers.
+Q_RE = re.compile(r"^\s*(?:\*\*)?\s*(?:Q|Вопрос)\s*:\s*(?:\*\*)?\s*(.+?)\s*(?:\*\*)?\s*$", re.IGNORECASE)
+A_RE = re.compile(r"^\s*(?:\*\*)?\s*(?:A|Ответ)\s*:\s*(?:\*\*)?\s*(.*?)\s*$", re.IGNORECASE)
+FAQ_SECTION_RE = re.compile(r"faq|вопрос", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class FAQPair:
+    """One question with its answer, as written in the source document."""
+    source_path: str
+    faq_id: int
+    question: str
+    answer: str
+
+
+def _clean_answer(lines: List[str]) -> str:
+    """Drop blank/indent noise left by Markdown exporters, keep list items."""
+    return "\n".join(ln.strip() for ln in lines if ln.strip()).strip()
+
+
+def _pairs_from_markers(text: str) -> List[Tuple[str, str]]:
+    """Pairs written as "Q: ..." followed by "A: ..." lines."""
+    pairs: List[Tuple[str, str]] = []
+    question: Optional[str] = None
+    answer: Optional[List[str]] = None
+
+    def flush() -> None:
+        if question and answer is not None:
+            cleaned = _clean_answer(answer)
+            if cleaned:
+                pairs.append((question, cleaned))
+
+    for line in text.splitlines():
+        if line.lstrip().startswith("#"):
+            # A new section ends the current answer.
+            flush()
+            question, answer = None, None
+            continue
+        q = Q_RE.match(line)
+        if q:
+            flush()
+            question, answer = q.group(1).strip("* "), None
+            continue
+        a = A_RE.match(line) if question else None
+        if a and answer is None:
+            answer = [a.group(1)]
+            continue
+        if answer is not None:
+            answer.append(line)
+    flush()
+    return pairs
+
+
+def _pairs_from_headers(text: str) -> List[Tuple[str, str]]:
+    """Pairs written as "### Question?" sub-headers with the answer as body."""
+    pairs: List[Tuple[str, str]] = []
+    for title, section in split_markdown_by_headers(text):
+        question = title.lstrip("#").strip()
+        if not question.endswith("?"):
+            continue
+        body = section[len(title):]
+        cleaned = _clean_answer(body.splitlines())
+        if cleaned:
+            pairs.append((question, cleaned))
+    return pairs
+
+
+def extract_faq_pairs(source_path: str, md_text: str) -> List[FAQPair]:
+    """Pull Q/A pairs out of a Markdown document.
+
+    Explicit "Q:/A:" markers are used anywhere in the document; header
+    questions ("## Как вернуть товар?") only in documents or sections that
+    look like a FAQ, so ordinary headings ending with "?" are not treated
+    as answers.
+    """
+    raw = _pairs_from_markers(md_text)
+    if not raw:
+        title = md_text.strip().splitlines()[0] if md_text.strip() else ""
+        if FAQ_SECTION_RE.search(title) or FAQ_SECTION_RE.search(source_path):
+            raw = _pairs_from_headers(md_text)
+    return [FAQPair(source_path, i, q, a) for i, (q, a) in enumerate(raw)]
@@ -81,14 +81,20 @@ def load_document(path: Path) -> Document:
     return Document(source_path=str(path), text=text)
 
 
-def iter_documents(root_dir: Path) -> Iterable[Document]:
-    """Yield non-empty documents from the given root directory."""
+def iter_source_paths(root_dir: Path) -> Iterable[Path]:
+    """Yield supported document paths under root_dir in a stable order."""
     if not root_dir.exists():
         raise FileNotFoundError(f"Docs directory not found: {root_dir}")
 
     for path in sorted(root_dir.rglob("*")):
         if path.is_file() and path.suffix.lower() in SUPPORTED_EXTS:
-            doc = load_document(path)
-            # пропускаем пустые документы
-            if doc.text.strip():
-                yield doc
+            yield path
+
+
+def iter_documents(root_dir: Path) -> Iterable[Document]:
+    """Yield non-empty documents from the given root directory."""
+    for path in iter_source_paths(root_dir):
+        doc = load_document(path)
+        # пропускаем пустые документы
+        if doc.text.strip():
+            yield doc
@@ -1,35 +1,48 @@
 """Ingestion pipeline utilities for building chunks."""
 
+import hashlib
 from pathlib import Path
 from typing import List
 
 from src.core.config import Settings
-from src.ingest.loader import iter_documents
+from src.ingest.loader import Document, iter_documents
 from src.ingest.chunker import Chunk, chunk_text
 from src.ingest.md_chunker import chunk_markdown
 
 
+def file_sha256(path: Path) -> str:
+    """Return the SHA-256 hex digest of a file's raw bytes."""
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def chunk_document(doc: Document, settings: Settings) -> List[Chunk]:
+    """Chunk one document using the Markdown or plain-text chunker."""
+    sp = doc.source_path.lower()
+    if sp.endswith(".md"):
+        return chunk_markdown(
+            doc.source_path,
+            doc.text,
+            chunk_size=settings.chunk_size,
+            overlap=settings.chunk_overlap,
+        )
+    return chunk_text(
+        doc.source_path,
+        doc.text,
+        chunk_size=settings.chunk_size,
+        overlap=settings.chunk_overlap,
+    )
+
+
 def build_chunks(settings: Settings) -> List[Chunk]:
     """Load documents from disk and build text/Markdown chunks."""
     docs_dir = Path(settings.docs_dir)
 
     all_chunks: List[Chunk] = []
     for doc in iter_documents(docs_dir):
-        sp = doc.source_path.lower()
-        if sp.endswith(".md"):
-            chunks = chunk_markdown(
-                doc.source_path,
-                doc.text,
-                chunk_size=settings.chunk_size,
-                overlap=settings.chunk_overlap,
-            )
-        else:
-            chunks = chunk_text(
-                doc.source_path,
-                doc.text,
-                chunk_size=settings.chunk_size,
-                overlap=settings.chunk_overlap,
-            )
-        all_chunks.extend(chunks)
+        all_chunks.extend(chunk_document(doc, settings))
 
     return all_chunks
@@ -1,33 +1,19 @@
 from __future__ import annotations
 
-from typing import Iterable, List
+from typing import List
 
 from langchain_core.prompts import PromptTemplate
 from langchain_core.runnables import RunnableLambda, RunnableSequence
 
+from src.core.config import get_settings
+from src.core.errors import DeadlineExceeded, ServiceOverloaded
+from src.rag.context_builder import build_context
 from src.rag.llm_clients import BaseLLMClient, LLMError
+from src.rag.relevance import NO_ANSWER, gate as relevance_gate
 from src.rag.retriever import Retriever
 from src.rag.schemas import SourceItem
 
 
-def _build_context(hits: Iterable, max_chars: int = 3500) -> str:
-    parts: list[str] = []
-    total = 0
-
-    for h in hits:
-        src = h.record.source_path
-        cid = h.record.chunk_id
-        snippet = h.record.text.strip()
-
-        block = f"[SOURCE: {src} | chunk={cid}]\n{snippet}\n"
-        if total + len(block) > max_chars:
-            break
-        parts.append(block)
-        total += len(block)
-
-    return "\n".join(parts).strip()
-
-
 def _prompt_template() -> PromptTemplate:
     return PromptTemplate.from_template(
         "Ты помощник службы поддержки маркетплейса. Отвечай на русском.\n"
@@ -45,18 +31,20 @@ async def run_langchain_rag(
     llm_client: BaseLLMClient,
     top_k: int,
 ) -> tuple[str, List[SourceItem]]:
-    hits = retriever.search(question, top_k=top_k)
+    hits = await retriever.asearch(question, top_k=top_k)
+    if relevance_gate((h.score for h in hits), retriever.relevance_min_score, "ask_langchain"):
+        return NO_ANSWER, []
 
     build_inputs = RunnableLambda(
-        lambda q: {"question": q, "context": _build_context(hits, max_chars=3500)}
+        lambda q: {"question": q, "context": build_context(hits, max_tokens=get_settings().context_max_tokens)}
     )
     prompt = _prompt_template()
     chain = RunnableSequence(build_inputs, prompt)
 
     prompt_value = chain.invoke(question)
     try:
-        answer = await llm_client.generate(prompt_value.to_string(), timeout_s=90.0)
-    except LLMError:
+        answer = await llm_client.generate(prompt_value.to_string(), timeout_s=get_settings().llm_timeout_s)
+    except (LLMError, ServiceOverloaded, DeadlineExceeded):
         raise
     except Exception as exc:
         raise LLMError(str(exc)) from exc
@@ -6,6 +6,7 @@ import json
 from typing import Any, Dict
 from urllib import request, error
 
+from src.core.deadline import DEADLINE_HEADER, budget
 from src.core.logging import get_logger
 
 
@@ -28,8 +29,11 @@ class MCPClient:
         data = json.dumps(payload).encode("utf-8")
         req = request.Request(url, data=data, method="POST")
         req.add_header("Content-Type", "application/json")
+        # Remaining request budget bounds the HTTP call and is forwarded to the server.
+        timeout_s = budget("mcp", self.timeout_s)
+        req.add_header(DEADLINE_HEADER, f"{timeout_s:.3f}")
         try:
-            with request.urlopen(req, timeout=self.timeout_s) as resp:
+            with request.urlopen(req, timeout=timeout_s) as resp:
                 raw = resp.read().decode("utf-8")
         except error.HTTPError as exc:
             try:
@@ -38,6 +42,8 @@ class MCPClient:
                 return {"error": f"HTTP error: {exc.code}"}
         except error.URLError as exc:
             return {"error": f"Connection error: {exc.reason}"}
+        except TimeoutError:
+            return {"error": f"Timeout after {timeout_s:.1f}s"}
 
         try:
             data_obj = json.loads(raw)
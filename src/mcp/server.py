@@ -8,8 +8,15 @@ from typing import Any, Dict
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import JSONResponse
 
-from src.agent.tool_impl import search_docs_impl, calc_impl
+from src.agent.tool_impl import asearch_docs_impl, calc_impl
+from src.core.errors import (
+    DeadlineExceeded,
+    ServiceOverloaded,
+    deadline_exceeded_handler,
+    service_overloaded_handler,
+)
 from src.core.logging import get_logger
+from src.core.middleware import DeadlineMiddleware
 from src.rag.retriever import Retriever
 
 
@@ -21,6 +28,9 @@ ALLOWED_TOOLS = {"search_docs", "calc"}
 def create_mcp_app() -> FastAPI:
     """Create and configure the MCP FastAPI application."""
     app = FastAPI(title="MCP Tools Server", version="0.1.0")
+    app.add_middleware(DeadlineMiddleware)
+    app.add_exception_handler(ServiceOverloaded, service_overloaded_handler)
+    app.add_exception_handler(DeadlineExceeded, deadline_exceeded_handler)
 
     @app.on_event("startup")
     async def startup_event() -> None:
@@ -32,6 +42,13 @@ def create_mcp_app() -> FastAPI:
             app.state.retriever = None
             log.warning("MCP retriever not ready: %s", exc)
 
+    @app.on_event("shutdown")
+    async def shutdown_event() -> None:
+        """Stop retriever background helpers."""
+        retriever = getattr(app.state, "retriever", None)
+        if retriever is not None:
+            await retriever.aclose()
+
     @app.post("/tools/{tool_name}")
     async def call_tool(tool_name: str, payload: Dict[str, Any]) -> JSONResponse:
         """Dispatch tool calls with strict allowlisting."""
@@ -45,7 +62,7 @@ def create_mcp_app() -> FastAPI:
             query = str(payload.get("query", ""))
             top_k = payload.get("top_k", 5)
             log.info("tool_backend=mcp tool=search_docs")
-            return JSONResponse(search_docs_impl(retriever, query=query, top_k=top_k))
+            return JSONResponse(await asearch_docs_impl(retriever, query=query, top_k=top_k))
 
         if tool_name == "calc":
             expression = str(payload.get("expression", ""))
@@ -0,0 +1,215 @@
+"""Exact answer cache for the RAG endpoints.
+
+Key = normalised question + retrieved chunk ids + LLM mode/model + prompt
+template version. Two tiers:
+    memory   TTLCache (LRU + TTL), per process
+    SQLite   persistent file under data/, shared across restarts/workers
+
+Every entry is tagged with the index version it was produced for and only
+served for that version. When this process switches to a new version, the
+memory tier is cleared and the rows of the version it replaced are dropped;
+rows of other versions (e.g. workers still on the old index during a rolling
+update) are left alone and age out with the TTL. Expired rows are purged and
+the table is capped at `max_rows` (oldest first) at most every PURGE_INTERVAL_S.
+
+The SQLite tier is blocking; async callers use `aget` / `aset`, which run it
+in a worker thread.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+from src.core.cache import TTLCache, normalize_query
+from src.core.logging import get_logger
+from src.core.metrics import REGISTRY
+
+log = get_logger(__name__)
+
+ANSWER_CACHE_LOOKUPS = REGISTRY.counter(
+    "answer_cache_lookups_total",
+    "Answer cache lookups by result (hit_memory, hit_disk, miss).",
+    ("endpoint", "result"),
+)
+
+# Minimum seconds between TTL/row-cap purges of the SQLite tier.
+PURGE_INTERVAL_S = 60.0
+
+
+def answer_cache_key(
+    question: str,
+    hits: Sequence[Any],
+    llm_mode: str,
+    llm_model: str,
+    template_version: str,
+) -> str:
+    """Build the cache key for one (question, retrieved chunks, model, prompt) tuple."""
+    chunks = [[h.record.source_path, int(h.record.chunk_id)] for h in hits]
+    raw = json.dumps(
+        [normalize_query(question), chunks, llm_mode, llm_model, template_version],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """Two-tier (memory + SQLite) answer cache bound to an index version."""
+
+    def __init__(
+        self,
+        db_path: Optional[Path],
+        maxsize: int = 1024,
+        ttl_s: float = 86400.0,
+        max_rows: int = 100_000,
+    ) -> None:
+        """Create the cache.
+
+        Args:
+            db_path: SQLite file for the persistent tier (None -> memory only).
+            maxsize: Max entries in the memory tier.
+            ttl_s: Entry lifetime in both tiers.
+            max_rows: Max rows kept in the SQLite tier (oldest purged first).
+        """
+        self.ttl_s = float(ttl_s)
+        self.max_rows = int(max_rows)
+        self._last_purge = 0.0
+        self.memory: TTLCache[str] = TTLCache(maxsize, ttl_s, name="answer")
+        self.index_version: Optional[str] = None
+        self.disk_hits = 0
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path is not None:
+            db_path = Path(db_path)
+            db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(db_path), check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers ("
+                " key TEXT PRIMARY KEY,"
+                " index_version TEXT NOT NULL,"
+                " answer TEXT NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS answers_created_at ON answers (created_at)")
+
+    def _sync_version(self, index_version: str) -> None:
+        """Clear the memory tier and drop the rows of the version this process replaced."""
+        if index_version == self.index_version:
+            return
+        with self._lock:
+            if index_version == self.index_version:
+                return
+            self.memory.clear()
+            if self._db is not None and self.index_version is not None:
+                cur = self._db.execute("DELETE FROM answers WHERE index_version = ?", (self.index_version,))
+                if cur.rowcount:
+                    log.info("Answer cache: dropped %d entries of index version %s.", cur.rowcount, self.index_version)
+            self.index_version = index_version
+
+    def _purge(self, now: float) -> None:
+        """Delete expired rows and the oldest rows above max_rows (caller holds the lock)."""
+        assert self._db is not None
+        expired = self._db.execute("DELETE FROM answers WHERE created_at < ?", (now - self.ttl_s,)).rowcount
+        over = self._db.execute(
+            "DELETE FROM answers WHERE key IN"
+            " (SELECT key FROM answers ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_rows,),
+        ).rowcount
+        if expired or over:
+            log.info("Answer cache: purged %d expired and %d over-limit entries.", expired, over)
+        self._last_purge = now
+
+    def _get_memory(self, key: str, index_version: str, endpoint: str) -> Optional[str]:
+        """Memory-tier lookup; counts the miss only when there is no disk tier."""
+        self._sync_version(index_version)
+        answer = self.memory.get(key)
+        if answer is not None:
+            ANSWER_CACHE_LOOKUPS.inc(endpoint=endpoint, result="hit_memory")
+        elif self._db is None:
+            ANSWER_CACHE_LOOKUPS.inc(endpoint=endpoint, result="miss")
+        return answer
+
+    def _get_disk(self, key: str, index_version: str, endpoint: str) -> Optional[str]:
+        """SQLite lookup (blocking); a hit is promoted to the memory tier."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT answer FROM answers WHERE key = ? AND index_version = ? AND created_at >= ?",
+                (key, index_version, time.time() - self.ttl_s),
+            ).fetchone()
+        if row is None:
+            ANSWER_CACHE_LOOKUPS.inc(endpoint=endpoint, result="miss")
+            return None
+        self.disk_hits += 1
+        self.memory.set(key, row[0])
+        ANSWER_CACHE_LOOKUPS.inc(endpoint=endpoint, result="hit_disk")
+        return row[0]
+
+    def _set_disk(self, key: str, index_version: str, answer: str) -> None:
+        """SQLite write (blocking), purging expired/over-limit rows now and then."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers (key, index_version, answer, created_at) VALUES (?, ?, ?, ?)",
+                (key, index_version, answer, now),
+            )
+            if now - self._last_purge >= PURGE_INTERVAL_S:
+                self._purge(now)
+
+    def get(self, key: str, index_version: str, endpoint: str = "ask") -> Optional[str]:
+        """Return a cached answer or None."""
+        answer = self._get_memory(key, index_version, endpoint)
+        if answer is not None or self._db is None:
+            return answer
+        return self._get_disk(key, index_version, endpoint)
+
+    def set(self, key: str, index_version: str, answer: str) -> None:
+        """Store an answer in both tiers."""
+        self._sync_version(index_version)
+        self.memory.set(key, answer)
+        if self._db is not None:
+            self._set_disk(key, index_version, answer)
+
+    async def aget(self, key: str, index_version: str, endpoint: str = "ask") -> Optional[str]:
+        """`get` for the event loop: a memory hit is returned inline, SQLite runs in a thread."""
+        if index_version != self.index_version:
+            await asyncio.to_thread(self._sync_version, index_version)
+        answer = self._get_memory(key, index_version, endpoint)
+        if answer is not None or self._db is None:
+            return answer
+        return await asyncio.to_thread(self._get_disk, key, index_version, endpoint)
+
+    async def aset(self, key: str, index_version: str, answer: str) -> None:
+        """`set` for the event loop: the SQLite write runs in a thread."""
+        if index_version != self.index_version:
+            await asyncio.to_thread(self._sync_version, index_version)
+        self.memory.set(key, answer)
+        if self._db is not None:
+            await asyncio.to_thread(self._set_disk, key, index_version, answer)
+
+    def close(self) -> None:
+        """Close the SQLite connection."""
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+            self._db = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return memory-tier counters plus persistent-tier size and hits."""
+        rows = None
+        if self._db is not None:
+            with self._lock:
+                rows = self._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        return {
+            "memory": self.memory.stats(),
+            "disk_rows": rows,
+            "disk_hits": self.disk_hits,
+            "index_version": self.index_version,
+        }
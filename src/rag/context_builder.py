@@ -0,0 +1,121 @@
+"""LLM context assembly from retrieved chunks under a token budget.
+
+- Tokens are estimated without a tokenizer dependency (`estimate_tokens`);
+  any exact counter (e.g. a HF tokenizer's `len(encode(text))`) can be
+  passed instead.
+- Neighbouring chunks of the same document (consecutive chunk ids whose
+  [start_char, end_char) ranges overlap) are merged into one block and the
+  overlap written by the chunker is kept only once.
+- Hits are taken in rank order while the rendered context fits the budget;
+  merged blocks are emitted in the order of their best-ranked chunk.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+TokenCounter = Callable[[str], int]
+
+# Conservative for Llama/Qwen-class BPE vocabularies on Russian prose
+# (English averages closer to 4 chars per token).
+_CHARS_PER_TOKEN = 3
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Fast token count approximation: ~3 chars per word piece, 1 per punctuation mark."""
+    n = 0
+    for m in _TOKEN_RE.finditer(text):
+        n += max(1, -(-(m.end() - m.start()) // _CHARS_PER_TOKEN))
+    return n
+
+
+def _overlap_len(prev: str, nxt: str, expected: int) -> int:
+    """Length of the chunker overlap shared by the end of prev and the start of nxt.
+
+    Chunk texts are stripped, so the real overlap can be a few chars shorter
+    than the offsets suggest; 0 means the texts do not actually overlap.
+    """
+    hi = min(len(prev), len(nxt), expected)
+    lo = max(1, expected // 2)
+    for k in range(hi, lo - 1, -1):
+        if prev.endswith(nxt[:k]):
+            return k
+    return 0
+
+
+@dataclass
+class _Block:
+    source_path: str
+    first_id: int
+    last_id: int
+    end_char: int
+    text: str
+    rank: int
+
+
+@dataclass
+class _Selection:
+    records: Dict[Tuple[str, int], Tuple[int, Any]] = field(default_factory=dict)
+
+    def add(self, rank: int, record: Any) -> None:
+        self.records.setdefault((record.source_path, int(record.chunk_id)), (rank, record))
+
+    def blocks(self) -> List[_Block]:
+        """Merge selected chunks into per-document blocks, best-ranked first."""
+        ordered = sorted(self.records.values(), key=lambda rr: (rr[1].source_path, int(rr[1].chunk_id)))
+        blocks: List[_Block] = []
+        for rank, r in ordered:
+            text = r.text.strip()
+            last = blocks[-1] if blocks else None
+            if (
+                last is not None
+                and last.source_path == r.source_path
+                and int(r.chunk_id) == last.last_id + 1
+                and r.start_char < last.end_char
+            ):
+                k = _overlap_len(last.text, text, last.end_char - r.start_char)
+                if k:
+                    last.text += text[k:]
+                    last.last_id = int(r.chunk_id)
+                    last.end_char = r.end_char
+                    last.rank = min(last.rank, rank)
+                    continue
+            blocks.append(_Block(r.source_path, int(r.chunk_id), int(r.chunk_id), r.end_char, text, rank))
+        blocks.sort(key=lambda b: b.rank)
+        return blocks
+
+
+def _render(blocks: Sequence[_Block]) -> str:
+    parts = []
+    for b in blocks:
+        cid = str(b.first_id) if b.first_id == b.last_id else f"{b.first_id}-{b.last_id}"
+        parts.append(f"[SOURCE: {b.source_path} | chunk={cid}]\n{b.text}\n")
+    return "\n".join(parts).strip()
+
+
+def build_context(
+    hits: Sequence[Any],
+    max_tokens: int,
+    count_tokens: TokenCounter = estimate_tokens,
+) -> str:
+    """Assemble the context for the LLM from ranked hits within max_tokens.
+
+    A hit that would overflow the budget is skipped; later (smaller or
+    overlapping) hits may still fit.
+    """
+    selection = _Selection()
+    context = ""
+    for rank, h in enumerate(hits):
+        key = (h.record.source_path, int(h.record.chunk_id))
+        if key in selection.records:
+            continue
+        candidate = _Selection(dict(selection.records))
+        candidate.add(rank, h.record)
+        rendered = _render(candidate.blocks())
+        if count_tokens(rendered) > max_tokens:
+            continue
+        selection, context = candidate, rendered
+    return context
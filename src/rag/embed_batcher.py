@@ -0,0 +1,117 @@
+"""Dynamic micro-batching of concurrent query embeddings.
+
+Concurrent requests each need one query vector. Instead of running many
+batch-of-one encoder passes that compete for the same CPU cores, queries
+that arrive within a short window are encoded together in one call and
+every waiter gets its own row back.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.core.logging import get_logger
+
+log = get_logger(__name__)
+
+
+class EmbeddingBatcher:
+    """Collect queries for `window_ms` (up to `max_batch`) and encode them at once."""
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], np.ndarray],
+        max_batch: int = 32,
+        window_ms: float = 3.0,
+        executor: Optional[Executor] = None,
+    ) -> None:
+        """Create a batcher around a synchronous encode(texts) -> (n, d) call.
+
+        Args:
+            encode: Blocking encoder call, run off the event loop.
+            max_batch: Max queries per encoder call.
+            window_ms: How long to wait for more queries after the first one.
+            executor: Executor for the encoder call (default loop executor if None).
+        """
+        self._encode = encode
+        self.max_batch = max(1, int(max_batch))
+        self.window_s = max(0.0, float(window_ms)) / 1000.0
+        self.executor = executor
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+
+    def _ensure_worker(self) -> asyncio.Queue:
+        """Start the collector task on the running loop (lazily)."""
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run(self._queue))
+        return self._queue
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Return the embedding row for one query text."""
+        queue = self._ensure_worker()
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        queue.put_nowait((text, fut))
+        return await fut
+
+    async def _run(self, queue: asyncio.Queue) -> None:
+        """Collector loop: wait for a query, gather a window, encode the batch."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch: List[Tuple[str, asyncio.Future]] = [await queue.get()]
+            if self.window_s > 0:
+                await asyncio.sleep(self.window_s)
+            while len(batch) < self.max_batch and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            # Waiters that were cancelled meanwhile do not need encoding.
+            live = [(t, f) for t, f in batch if not f.done()]
+            if not live:
+                continue
+
+            try:
+                vecs = await loop.run_in_executor(self.executor, self._encode, [t for t, _ in live])
+            except Exception as e:
+                log.warning("Batched query embedding failed (batch=%d): %r", len(live), e)
+                for _, f in live:
+                    if not f.done():
+                        f.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(live)
+            self.max_batch_seen = max(self.max_batch_seen, len(live))
+            for (_, f), row in zip(live, vecs):
+                if not f.done():
+                    f.set_result(row)
+
+    async def aclose(self) -> None:
+        """Stop the collector task."""
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
+        self._queue = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Return batch counters (average batch size shows coalescing)."""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch_seen": self.max_batch_seen,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
@@ -2,85 +2,806 @@
 
 from __future__ import annotations
 
+import asyncio
+import json
+import math
 import os
+import time
+from contextlib import aclosing, asynccontextmanager
 from dataclasses import dataclass
-from typing import Any, Optional
+from typing import Any, AsyncIterator, Dict, Optional, Union
 
 import httpx
 
 from src.core.config import get_settings
+from src.core.deadline import budget as deadline_budget, check as check_deadline, remaining, with_deadline
+from src.core.errors import ServiceOverloaded
 from src.core.logging import get_logger
+from src.core.metrics import REGISTRY
+from src.core.resilience import CircuitBreaker, RetryBudget, RetryPolicy
+from src.rag.context_builder import estimate_tokens
+from src.rag.llm_endpoints import Endpoint, EndpointPool, parse_endpoints
 
 log = get_logger(__name__)
 
+LLM_QUEUE_DEPTH = REGISTRY.gauge("llm_queue_depth", "Requests waiting for an LLM slot.", ("backend",))
+LLM_INFLIGHT = REGISTRY.gauge("llm_inflight", "LLM generations in progress.", ("backend",))
+LLM_QUEUE_WAIT = REGISTRY.histogram(
+    "llm_queue_wait_seconds",
+    "Time spent waiting for an LLM slot (admitted requests).",
+    ("backend",),
+)
+LLM_RETRIES = REGISTRY.counter(
+    "llm_retries_total",
+    "LLM call retries by outcome (retried, budget_exhausted, deadline).",
+    ("backend", "outcome"),
+)
+LLM_HEDGES = REGISTRY.counter(
+    "llm_hedged_requests_total",
+    "Hedged LLM requests (fired) and which copy produced the first token.",
+    ("backend", "outcome"),
+)
+LLM_REJECTED = REGISTRY.counter(
+    "llm_rejected_total",
+    "LLM requests shed by admission control (queue_full -> 429, wait_timeout -> 503).",
+    ("backend", "reason"),
+)
+LLM_TOKENS = REGISTRY.counter(
+    "llm_tokens_total",
+    "Tokens reported by the backend (kind: prompt = evaluated prompt tokens, completion = generated).",
+    ("backend", "model", "kind"),
+)
+LLM_PREFILL_SECONDS = REGISTRY.histogram(
+    "llm_prefill_seconds",
+    "Prompt evaluation (prefill) time reported by the backend.",
+    ("backend", "model"),
+)
+LLM_DECODE_SECONDS = REGISTRY.histogram(
+    "llm_decode_seconds",
+    "Token generation (decode) time reported by the backend.",
+    ("backend", "model"),
+)
+_TPS_BUCKETS = (1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 50.0, 75.0, 100.0, 200.0, 500.0, 1000.0, 2000.0, 5000.0)
+LLM_PREFILL_TPS = REGISTRY.histogram(
+    "llm_prefill_tokens_per_second",
+    "Prompt evaluation speed per request.",
+    ("backend", "model"),
+    buckets=_TPS_BUCKETS,
+)
+LLM_DECODE_TPS = REGISTRY.histogram(
+    "llm_decode_tokens_per_second",
+    "Generation speed per request.",
+    ("backend", "model"),
+    buckets=_TPS_BUCKETS,
+)
+LLM_MODEL_LOADS = REGISTRY.counter(
+    "llm_model_loads_total",
+    "Requests that had to load the model first (load time >= COLD_LOAD_MIN_S).",
+    ("backend", "model"),
+)
+LLM_NUM_CTX = REGISTRY.counter(
+    "llm_num_ctx_total",
+    "Ollama requests by num_ctx bucket (context window sent with the request).",
+    ("bucket",),
+)
+
 
 class LLMError(RuntimeError):
-    """LLM client error wrapper."""
+    """LLM client error wrapper.
+
+    `status_code` is set for HTTP errors, `timeout` for client-side timeouts.
+    Only timeouts, connection errors, 429 and 5xx are retryable; other 4xx
+    mean the request itself is wrong and would fail again.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        status_code: Optional[int] = None,
+        timeout: bool = False,
+        retryable: Optional[bool] = None,
+    ) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.timeout = timeout
+        if retryable is None:
+            retryable = status_code is None or status_code in (408, 429) or status_code >= 500
+        self.retryable = retryable
+
+
+class LLMOverloaded(ServiceOverloaded):
+    """LLM admission queue is full or the wait for a slot timed out."""
     pass
 
 
+class AdmissionController:
+    """Per-backend concurrency limit with a bounded, time-limited wait queue.
+
+    At most `max_concurrency` generations run at once; up to `max_queue`
+    callers wait for a slot for at most `max_wait_s`. Beyond that callers
+    are shed immediately (429) instead of piling up inside the backend
+    until their HTTP timeout.
+    """
+
+    def __init__(self, backend: str, max_concurrency: int, max_queue: int, max_wait_s: float) -> None:
+        """Create a controller; backend labels the metrics."""
+        self.backend = backend
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_queue = max(0, int(max_queue))
+        self.max_wait_s = max(0.0, float(max_wait_s))
+        self._sem = asyncio.Semaphore(self.max_concurrency)
+        self.waiting = 0
+        self.inflight = 0
+        self.admitted = 0
+        self.rejected = 0
+        # EWMA of slot hold time, used to suggest Retry-After.
+        self._avg_hold_s = 5.0
+
+    def _retry_after(self) -> float:
+        """Rough time until a new caller could be admitted."""
+        rounds = (self.waiting + 1) / self.max_concurrency
+        return min(60.0, max(1.0, math.ceil(rounds * self._avg_hold_s)))
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one generation slot for the duration of the block."""
+        started = time.monotonic()
+        if not self._sem.locked():
+            # Free slot: acquire() returns without yielding, so the check above is race-free.
+            await self._sem.acquire()
+        else:
+            if self.waiting >= self.max_queue:
+                self.rejected += 1
+                LLM_REJECTED.inc(backend=self.backend, reason="queue_full")
+                raise LLMOverloaded(
+                    f"LLM backend '{self.backend}' is busy ({self.waiting} waiting). Try again later.",
+                    retry_after_s=self._retry_after(),
+                    status_code=429,
+                )
+
+            self.waiting += 1
+            LLM_QUEUE_DEPTH.set(self.waiting, backend=self.backend)
+            try:
+                # Waiting is bounded by max_wait_s and by the request deadline (-> 504).
+                await with_deadline(self._sem.acquire(), "llm_queue", cap=self.max_wait_s or None)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                LLM_REJECTED.inc(backend=self.backend, reason="wait_timeout")
+                raise LLMOverloaded(
+                    f"No LLM slot within {self.max_wait_s:.0f}s on backend '{self.backend}'.",
+                    retry_after_s=self._retry_after(),
+                    status_code=503,
+                ) from None
+            finally:
+                self.waiting -= 1
+                LLM_QUEUE_DEPTH.set(self.waiting, backend=self.backend)
+
+        acquired = time.monotonic()
+        LLM_QUEUE_WAIT.observe(acquired - started, backend=self.backend)
+        self.admitted += 1
+        self.inflight += 1
+        LLM_INFLIGHT.set(self.inflight, backend=self.backend)
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+            LLM_INFLIGHT.set(self.inflight, backend=self.backend)
+            self._avg_hold_s = 0.8 * self._avg_hold_s + 0.2 * (time.monotonic() - acquired)
+            self._sem.release()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return current queue/in-flight numbers and totals."""
+        return {
+            "backend": self.backend,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "max_wait_s": self.max_wait_s,
+            "waiting": self.waiting,
+            "inflight": self.inflight,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_hold_s": round(self._avg_hold_s, 3),
+        }
+
+
+@dataclass(frozen=True)
+class ChatPrompt:
+    """Prompt split into a fixed system message and a user message.
+
+    Sent as chat messages (Ollama /api/chat, OpenAI chat/completions). Keep
+    `system` and the start of `user` identical across requests and put the
+    variable parts (context, question) last: the backend can then reuse the
+    KV cache of the common prefix instead of re-evaluating it.
+    """
+    system: str
+    user: str
+
+
+# Plain text goes to Ollama /api/generate, ChatPrompt to /api/chat.
+Prompt = Union[str, ChatPrompt]
+
+
+def prompt_text(prompt: Prompt) -> str:
+    """Whole prompt as text (for token estimates and logs)."""
+    if isinstance(prompt, ChatPrompt):
+        return f"{prompt.system}\n\n{prompt.user}"
+    return prompt
+
+
+# Ollama reports a few ms of load_duration even for a warm model.
+COLD_LOAD_MIN_S = 0.5
+
+
+def _ns_to_s(value: Any) -> Optional[float]:
+    return value / 1e9 if isinstance(value, (int, float)) else None
+
+
+def _int_or_none(value: Any) -> Optional[int]:
+    return int(value) if isinstance(value, (int, float)) else None
+
+
 @dataclass(frozen=True)
 class LLMResponse:
-    """Typed container for LLM responses (kept for compatibility)."""
+    """Generated text with the token and timing counters the backend reported.
+
+    Fields a backend does not report stay None: Ollama returns all of them,
+    OpenAI-compatible APIs only token usage.
+    """
     text: str
+    model: Optional[str] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    prefill_s: Optional[float] = None
+    decode_s: Optional[float] = None
+    load_s: Optional[float] = None
+    total_s: Optional[float] = None
+
+    @classmethod
+    def from_ollama(cls, text: str, data: dict[str, Any], model: Optional[str] = None) -> "LLMResponse":
+        """Build from an Ollama response (non-streamed body or the final `done` object)."""
+        return cls(
+            text=text,
+            model=data.get("model") or model,
+            prompt_tokens=_int_or_none(data.get("prompt_eval_count")),
+            completion_tokens=_int_or_none(data.get("eval_count")),
+            prefill_s=_ns_to_s(data.get("prompt_eval_duration")),
+            decode_s=_ns_to_s(data.get("eval_duration")),
+            load_s=_ns_to_s(data.get("load_duration")),
+            total_s=_ns_to_s(data.get("total_duration")),
+        )
+
+    @classmethod
+    def from_openai(cls, text: str, data: dict[str, Any], model: Optional[str] = None) -> "LLMResponse":
+        """Build from an OpenAI-compatible response (`usage` block, no timings)."""
+        usage = data.get("usage") or {}
+        return cls(
+            text=text,
+            model=data.get("model") or model,
+            prompt_tokens=_int_or_none(usage.get("prompt_tokens")),
+            completion_tokens=_int_or_none(usage.get("completion_tokens")),
+        )
+
+    @property
+    def prefill_tokens_per_s(self) -> Optional[float]:
+        """Prompt evaluation speed, if reported."""
+        if self.prompt_tokens and self.prefill_s:
+            return self.prompt_tokens / self.prefill_s
+        return None
+
+    @property
+    def decode_tokens_per_s(self) -> Optional[float]:
+        """Generation speed, if reported."""
+        if self.completion_tokens and self.decode_s:
+            return self.completion_tokens / self.decode_s
+        return None
+
+    @property
+    def cold_load(self) -> bool:
+        """True if the backend had to load the model for this request."""
+        return self.load_s is not None and self.load_s >= COLD_LOAD_MIN_S
+
+
+def record_usage(backend: str, resp: LLMResponse) -> None:
+    """Export the counters of one response as metrics (missing ones are skipped)."""
+    model = resp.model or "unknown"
+    if resp.prompt_tokens is not None:
+        LLM_TOKENS.inc(resp.prompt_tokens, backend=backend, model=model, kind="prompt")
+    if resp.completion_tokens is not None:
+        LLM_TOKENS.inc(resp.completion_tokens, backend=backend, model=model, kind="completion")
+    if resp.prefill_s is not None:
+        LLM_PREFILL_SECONDS.observe(resp.prefill_s, backend=backend, model=model)
+    if resp.decode_s is not None:
+        LLM_DECODE_SECONDS.observe(resp.decode_s, backend=backend, model=model)
+    if resp.prefill_tokens_per_s is not None:
+        LLM_PREFILL_TPS.observe(resp.prefill_tokens_per_s, backend=backend, model=model)
+    if resp.decode_tokens_per_s is not None:
+        LLM_DECODE_TPS.observe(resp.decode_tokens_per_s, backend=backend, model=model)
+    if resp.cold_load:
+        LLM_MODEL_LOADS.inc(backend=backend, model=model)
+        log.info("LLM %s loaded model %s in %.2fs", backend, model, resp.load_s)
+
+
+def _make_http_client(headers: Optional[dict[str, str]] = None) -> httpx.AsyncClient:
+    """Create a long-lived, connection-pooled async HTTP client from settings."""
+    s = get_settings()
+    http2 = s.llm_http2
+    if http2:
+        try:
+            import h2  # noqa: F401  (httpx[http2] extra)
+        except ImportError:
+            log.warning("LLM_HTTP2=true but 'h2' is not installed (pip install httpx[http2]); using HTTP/1.1.")
+            http2 = False
+
+    limits = httpx.Limits(
+        max_connections=s.llm_pool_max_connections,
+        max_keepalive_connections=s.llm_pool_max_keepalive,
+        keepalive_expiry=s.llm_pool_keepalive_expiry_s,
+    )
+    return httpx.AsyncClient(
+        limits=limits,
+        http2=http2,
+        headers=headers,
+        timeout=httpx.Timeout(60.0),
+    )
 
 
 class BaseLLMClient:
-    """Interface for async LLM clients."""
+    """Interface for async LLM clients.
+
+    Each client owns one pooled `httpx.AsyncClient` (keep-alive, optional
+    HTTP/2), created on `start()` or first use and closed by `aclose()`,
+    one `AdmissionController` that bounds concurrent generations, and a
+    retry policy / retry budget / circuit breaker for transient failures.
+    Subclasses implement `_generate` / `_stream`.
+    """
+
+    backend = "llm"
+    _http: Optional[httpx.AsyncClient] = None
+    _admission: Optional[AdmissionController] = None
+    _breaker: Optional[CircuitBreaker] = None
+    _retry_budget: Optional[RetryBudget] = None
+    _retry_policy: Optional[RetryPolicy] = None
+
+    def _init_resilience(self) -> None:
+        """Create retry policy, budget and breaker from settings (once)."""
+        if self._breaker is not None:
+            return
+        s = get_settings()
+        self._retry_policy = RetryPolicy(
+            max_attempts=s.llm_retry_max_attempts,
+            base_delay_s=s.llm_retry_base_delay_s,
+            max_delay_s=s.llm_retry_max_delay_s,
+        )
+        self._retry_budget = RetryBudget(ratio=s.llm_retry_budget_ratio)
+        self._breaker = CircuitBreaker(
+            f"llm_{self.backend}",
+            failure_threshold=s.llm_breaker_failures,
+            reset_timeout_s=s.llm_breaker_reset_s,
+        )
+
+    @property
+    def breaker(self) -> CircuitBreaker:
+        """Circuit breaker of this backend."""
+        self._init_resilience()
+        return self._breaker  # type: ignore[return-value]
+
+    def _capacity_units(self) -> float:
+        """How many single-host LLM_MAX_CONCURRENCY limits this client can serve."""
+        return 1.0
+
+    @property
+    def admission(self) -> AdmissionController:
+        """Admission controller of this backend (created from settings).
+
+        LLM_MAX_CONCURRENCY is per host of weight 1; a client routing to
+        several hosts gets the limit times their total weight.
+        """
+        if self._admission is None:
+            s = get_settings()
+            self._admission = AdmissionController(
+                self.backend,
+                max_concurrency=max(1, round(s.llm_max_concurrency * self._capacity_units())),
+                max_queue=s.llm_max_queue,
+                max_wait_s=s.llm_max_queue_wait_s,
+            )
+        return self._admission
+
+    def _default_headers(self) -> Optional[dict[str, str]]:
+        """Headers sent with every request of this backend."""
+        return None
+
+    def _http_client(self) -> httpx.AsyncClient:
+        """Return the shared HTTP client, creating it if needed."""
+        if self._http is None or self._http.is_closed:
+            self._http = _make_http_client(self._default_headers())
+        return self._http
 
-    async def generate(self, prompt: str, timeout_s: float = 60.0) -> str:
-        """Generate a response from a prompt."""
+    async def start(self) -> None:
+        """Create the connection pool (call from the app startup hook)."""
+        self._http_client()
+
+    async def aclose(self) -> None:
+        """Close pooled connections (call from the app shutdown hook)."""
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def generate(self, prompt: Prompt, timeout_s: float = 60.0) -> str:
+        """Generate a response text from a prompt (see `generate_response`)."""
+        return (await self.generate_response(prompt, timeout_s=timeout_s)).text
+
+    async def generate_response(self, prompt: Prompt, timeout_s: float = 60.0) -> LLMResponse:
+        """Generate a response from a prompt, with the backend's token/timing counters.
+
+        Transient failures (timeouts, connection errors, 429/5xx) are retried
+        with jittered exponential backoff while the retry budget allows;
+        other 4xx are not retried. Each attempt goes through the circuit
+        breaker and the admission controller.
+
+        Raises:
+            CircuitOpen: Backend is failing; the call was not attempted.
+            LLMOverloaded: No slot available (queue full or wait timed out).
+            DeadlineExceeded: The request deadline ran out.
+            LLMError: Backend call failed.
+        """
+        self._init_resilience()
+        policy, budget, breaker = self._retry_policy, self._retry_budget, self.breaker
+        budget.record_request()
+
+        attempt = 1
+        while True:
+            # Each attempt gets min(timeout_s, time left before the request deadline).
+            attempt_timeout = deadline_budget("llm", timeout_s)
+            breaker.before_call()
+            try:
+                async with self.admission.slot():
+                    resp = await with_deadline(self._generate(prompt, timeout_s=attempt_timeout), "llm")
+            except LLMError as e:
+                if not e.retryable:
+                    # The backend answered; the request itself is at fault.
+                    breaker.on_success()
+                    raise
+                breaker.on_failure()
+                if attempt >= policy.max_attempts:
+                    raise
+                if not budget.try_spend():
+                    LLM_RETRIES.inc(backend=self.backend, outcome="budget_exhausted")
+                    raise
+                delay = policy.backoff(attempt)
+                left = remaining()
+                if left is not None and left <= delay:
+                    # No time for another attempt: fail now rather than at the deadline.
+                    LLM_RETRIES.inc(backend=self.backend, outcome="deadline")
+                    raise
+                LLM_RETRIES.inc(backend=self.backend, outcome="retried")
+                log.warning("LLM %s failed (attempt %d), retry in %.2fs: %s", self.backend, attempt, delay, e)
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            except BaseException:
+                # Shed by admission control or cancelled: no verdict on the backend.
+                breaker.on_abandoned()
+                raise
+            breaker.on_success()
+            record_usage(self.backend, resp)
+            return resp
+
+    async def stream(self, prompt: Prompt, timeout_s: float = 60.0) -> AsyncIterator[str]:
+        """Yield response text fragments as the model produces them.
+
+        `timeout_s` bounds connect and the gap between fragments, not the
+        whole generation. The admission slot is held until the stream ends.
+        Streams are not retried (fragments may already be delivered) but do
+        go through, and report to, the circuit breaker.
+        """
+        timeout_s = deadline_budget("llm", timeout_s)
+        breaker = self.breaker
+        breaker.before_call()
+        try:
+            async with self.admission.slot(), aclosing(self._stream(prompt, timeout_s=timeout_s)) as pieces:
+                async for piece in pieces:
+                    check_deadline("llm")
+                    yield piece
+        except LLMError as e:
+            if e.retryable:
+                breaker.on_failure()
+            else:
+                breaker.on_success()
+            raise
+        except BaseException:
+            breaker.on_abandoned()
+            raise
+        breaker.on_success()
+
+    async def _generate(self, prompt: Prompt, timeout_s: float) -> LLMResponse:
+        raise NotImplementedError
+
+    def _stream(self, prompt: Prompt, timeout_s: float) -> AsyncIterator[str]:
         raise NotImplementedError
 
 
+# Tokens Ollama adds around the prompt (model template, BOS/EOS).
+NUM_CTX_TEMPLATE_TOKENS = 32
+
+
+def parse_num_ctx_buckets(raw: str) -> tuple[int, ...]:
+    """Parse "2048,4096,8192" into sorted unique sizes; empty -> () (num_ctx not sent)."""
+    sizes = {int(part) for part in raw.replace(";", ",").split(",") if part.strip()}
+    if any(n <= 0 for n in sizes):
+        raise ValueError(f"OLLAMA_NUM_CTX_BUCKETS must be positive integers: {raw!r}")
+    return tuple(sorted(sizes))
+
+
+def pick_num_ctx(needed: int, buckets: tuple[int, ...]) -> int:
+    """Smallest bucket that holds `needed` tokens (the largest one if none does)."""
+    for size in buckets:
+        if size >= needed:
+            return size
+    return buckets[-1]
+
+
 class OllamaClient(BaseLLMClient):
     """
-    Родной Ollama API: POST /api/generate
+    Родной Ollama API: POST /api/generate (ChatPrompt -> POST /api/chat)
     (Надёжнее, чем /v1/chat/completions, потому что это "родной" контракт Ollama)
+
+    Several hosts can be listed in OLLAMA_BASE_URLS; each request goes to the
+    least loaded healthy one (see `EndpointPool`). With hedging enabled a
+    second host is tried when the first is slow to produce its first token.
     """
 
+    backend = "ollama"
+
     def __init__(self) -> None:
         """Initialize client from settings."""
         s = get_settings()
-        self.base_url = s.ollama_base_url.rstrip("/")
+        endpoints = parse_endpoints(s.ollama_base_urls) or parse_endpoints(s.ollama_base_url)
+        self.pool = EndpointPool(
+            endpoints,
+            eject_failures=s.ollama_eject_failures,
+            eject_s=s.ollama_eject_s,
+        )
+        self.base_url = self.pool.endpoints[0].url
         self.model = s.ollama_model
         self.keep_alive = s.ollama_keep_alive
         self.num_predict = s.ollama_num_predict
         self.temperature = s.ollama_temperature
+        self.num_ctx_buckets = parse_num_ctx_buckets(s.ollama_num_ctx_buckets)
+        self.hedging = s.ollama_hedging_enabled and len(self.pool.endpoints) > 1
+        self.hedge_percentile = s.ollama_hedge_percentile
+        self.hedge_min_delay_s = s.ollama_hedge_min_delay_s
+        self.hedge_default_delay_s = s.ollama_hedge_default_delay_s
 
-    async def generate(self, prompt: str, timeout_s: float = 60.0) -> str:
-        """Generate text via the Ollama /api/generate endpoint."""
-        url = f"{self.base_url}/api/generate"
+    def _capacity_units(self) -> float:
+        """Total weight of OLLAMA_BASE_URLS: concurrency scales with the hosts."""
+        return self.pool.total_weight
 
-        payload: dict[str, Any] = {
-            "model": self.model,
-            "prompt": prompt,
-            "stream": False,
-            "keep_alive": self.keep_alive,
-            "options": {
-                "num_predict": self.num_predict,
-                "temperature": self.temperature,
-            },
+    def _num_ctx(self, prompt: Prompt) -> Optional[int]:
+        """Context window for this prompt: prompt + num_predict, rounded up to a bucket.
+
+        A handful of fixed sizes keeps Ollama from reloading the model for
+        every new num_ctx while still avoiding the full default window (KV
+        cache memory and prefill time grow with it).
+        """
+        if not self.num_ctx_buckets:
+            return None
+        prompt_tokens = estimate_tokens(prompt_text(prompt)) + NUM_CTX_TEMPLATE_TOKENS
+        needed = prompt_tokens + self.num_predict
+        num_ctx = pick_num_ctx(needed, self.num_ctx_buckets)
+        LLM_NUM_CTX.inc(bucket=str(num_ctx))
+        if needed > num_ctx:
+            log.warning(
+                "Ollama num_ctx=%d is below prompt_tokens~%d + num_predict=%d; the prompt may be truncated.",
+                num_ctx,
+                prompt_tokens,
+                self.num_predict,
+            )
+        else:
+            log.info("Ollama num_ctx=%d (prompt_tokens~%d + num_predict=%d)", num_ctx, prompt_tokens, self.num_predict)
+        return num_ctx
+
+    @staticmethod
+    def _api_path(prompt: Prompt) -> str:
+        """Endpoint for the prompt: /api/chat for a ChatPrompt, /api/generate for text."""
+        return "/api/chat" if isinstance(prompt, ChatPrompt) else "/api/generate"
+
+    def _payload(self, prompt: Prompt, stream: bool) -> dict[str, Any]:
+        """Build the /api/generate or /api/chat request body."""
+        options: dict[str, Any] = {
+            "num_predict": self.num_predict,
+            "temperature": self.temperature,
         }
+        num_ctx = self._num_ctx(prompt)
+        if num_ctx is not None:
+            options["num_ctx"] = num_ctx
+        payload: dict[str, Any] = {"model": self.model}
+        if isinstance(prompt, ChatPrompt):
+            payload["messages"] = [
+                {"role": "system", "content": prompt.system},
+                {"role": "user", "content": prompt.user},
+            ]
+        else:
+            payload["prompt"] = prompt
+        payload.update({"stream": stream, "keep_alive": self.keep_alive, "options": options})
+        return payload
+
+    @staticmethod
+    def _response_text(obj: dict[str, Any]) -> Any:
+        """Generated text of a response object ("response" or chat "message.content")."""
+        if "message" in obj:
+            return (obj.get("message") or {}).get("content")
+        return obj.get("response")
+
+    # -----------------------------------------------------------------------
+    # Section: Routed calls
+    # -----------------------------------------------------------------------
+    async def _generate(self, prompt: Prompt, timeout_s: float = 60.0) -> LLMResponse:
+        """Generate text on the least loaded endpoint (hedged via streaming if enabled).
+
+        Hedged calls return text only; their counters are recorded by the stream.
+        """
+        if self.hedging:
+            parts = [piece async for piece in self._stream(prompt, timeout_s=timeout_s)]
+            return LLMResponse(text="".join(parts).strip(), model=self.model)
+
+        ep = self.pool.pick()
+        with self.pool.track(ep):
+            try:
+                resp = await self._generate_at(ep.url, prompt, timeout_s)
+            except LLMError as e:
+                if e.retryable:
+                    self.pool.report_failure(ep)
+                raise
+        self.pool.report_success(ep)
+        return resp
+
+    async def _stream(self, prompt: Prompt, timeout_s: float = 60.0) -> AsyncIterator[str]:
+        """Stream from the least loaded endpoint, hedging when enabled."""
+        if self.hedging and self.pool.healthy_count() > 1:
+            pieces = self._hedged_stream(prompt, timeout_s)
+        else:
+            pieces = self._stream_at(self.pool.pick(), prompt, timeout_s)
+        # Closing explicitly (not at GC) drops the upstream connection as soon as
+        # the consumer stops, e.g. on client disconnect.
+        async with aclosing(pieces):
+            async for piece in pieces:
+                yield piece
+
+    async def _stream_at(self, ep: Endpoint, prompt: Prompt, timeout_s: float) -> AsyncIterator[str]:
+        """Stream from one endpoint, tracking load, health and TTFT."""
+        with self.pool.track(ep):
+            started = time.monotonic()
+            first = True
+            try:
+                async with aclosing(self._stream_url(ep.url, prompt, timeout_s)) as pieces:
+                    async for piece in pieces:
+                        if first:
+                            self.pool.record_ttft(time.monotonic() - started)
+                            first = False
+                        yield piece
+            except LLMError as e:
+                if e.retryable:
+                    self.pool.report_failure(ep)
+                raise
+        self.pool.report_success(ep)
+
+    def _hedge_delay(self) -> float:
+        """Delay before hedging: TTFT percentile, or the default until enough samples."""
+        p = self.pool.ttft_percentile(self.hedge_percentile)
+        return max(self.hedge_min_delay_s, p if p is not None else self.hedge_default_delay_s)
+
+    async def _hedged_stream(self, prompt: Prompt, timeout_s: float) -> AsyncIterator[str]:
+        """Start on one endpoint; if no first token within the hedge delay,
+        also start on a second one and keep whichever answers first."""
+        primary = self.pool.pick()
+        first_stream = self._stream_at(primary, prompt, timeout_s)
+        pending: Dict[asyncio.Future, Any] = {asyncio.ensure_future(first_stream.__anext__()): first_stream}
+
+        winner = None
+        first_piece: Optional[str] = None
+        hedged = False
+        last_exc: Optional[BaseException] = None
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self._hedge_delay())
+            if not done:
+                secondary = self.pool.pick(exclude=(primary,))
+                if secondary is not None and secondary.healthy(time.monotonic()):
+                    second_stream = self._stream_at(secondary, prompt, timeout_s)
+                    pending[asyncio.ensure_future(second_stream.__anext__())] = second_stream
+                    hedged = True
+                    LLM_HEDGES.inc(backend=self.backend, outcome="fired")
+
+            while pending and winner is None:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    agen = pending.pop(task)
+                    exc = task.exception()
+                    if exc is None or isinstance(exc, StopAsyncIteration):
+                        winner = agen
+                        first_piece = task.result() if exc is None else None
+                        if hedged:
+                            outcome = "won_primary" if agen is first_stream else "won_hedge"
+                            LLM_HEDGES.inc(backend=self.backend, outcome=outcome)
+                        break
+                    last_exc = exc
+                    await agen.aclose()
+        finally:
+            # Losers: cancel the pending first read and close the stream (drops the connection).
+            for task, agen in pending.items():
+                task.cancel()
+            for task, agen in pending.items():
+                try:
+                    await task
+                except (Exception, asyncio.CancelledError):
+                    pass
+                await agen.aclose()
+
+        if winner is None:
+            raise last_exc if last_exc is not None else LLMError("Ollama error: no endpoint produced a response.")
+        async with aclosing(winner):
+            if first_piece is None:
+                return
+            yield first_piece
+            async for piece in winner:
+                yield piece
+
+    # -----------------------------------------------------------------------
+    # Section: Single-endpoint HTTP calls
+    # -----------------------------------------------------------------------
+    async def _generate_at(self, base_url: str, prompt: Prompt, timeout_s: float) -> LLMResponse:
+        """Generate text via the Ollama /api/generate (or /api/chat) endpoint of one host."""
+        url = f"{base_url}{self._api_path(prompt)}"
+        payload = self._payload(prompt, stream=False)
 
         # Timeout is explicit to avoid hanging on slow model warmups.
         try:
-            async with httpx.AsyncClient(timeout=httpx.Timeout(timeout_s)) as client:
-                resp = await client.post(url, json=payload)
-                resp.raise_for_status()
-                data = resp.json()
+            resp = await self._http_client().post(url, json=payload, timeout=httpx.Timeout(timeout_s))
+            resp.raise_for_status()
+            data = resp.json()
         except httpx.TimeoutException as e:
-            raise LLMError(f"Ollama error: ReadTimeout({repr(e)})") from e
+            raise LLMError(f"Ollama error: ReadTimeout({repr(e)})", timeout=True) from e
         except httpx.HTTPStatusError as e:
             body = e.response.text[:1000] if e.response is not None else ""
-            raise LLMError(f"Ollama HTTP {e.response.status_code}: {body}") from e
+            raise LLMError(f"Ollama HTTP {e.response.status_code}: {body}", status_code=e.response.status_code) from e
         except Exception as e:
             raise LLMError(f"Ollama error: {repr(e)}") from e
 
-        text = data.get("response")
+        text = self._response_text(data)
         if not isinstance(text, str):
-            raise LLMError("Ollama returned invalid response format.")
-        return text.strip()
+            raise LLMError("Ollama returned invalid response format.", retryable=False)
+        return LLMResponse.from_ollama(text.strip(), data, model=self.model)
+
+    async def _stream_url(self, base_url: str, prompt: Prompt, timeout_s: float) -> AsyncIterator[str]:
+        """Stream text via /api/generate or /api/chat of one host (NDJSON, one object per fragment)."""
+        url = f"{base_url}{self._api_path(prompt)}"
+        payload = self._payload(prompt, stream=True)
+
+        try:
+            async with self._http_client().stream(
+                "POST", url, json=payload, timeout=httpx.Timeout(timeout_s)
+            ) as resp:
+                if resp.status_code >= 400:
+                    body = (await resp.aread()).decode("utf-8", errors="replace")[:1000]
+                    raise LLMError(f"Ollama HTTP {resp.status_code}: {body}", status_code=resp.status_code)
+                async for line in resp.aiter_lines():
+                    if not line.strip():
+                        continue
+                    obj = json.loads(line)
+                    if obj.get("error"):
+                        raise LLMError(f"Ollama error: {obj['error']}")
+                    piece = self._response_text(obj)
+                    if isinstance(piece, str) and piece:
+                        yield piece
+                    if obj.get("done"):
+                        # The final object carries the same counters as a non-streamed response.
+                        record_usage(self.backend, LLMResponse.from_ollama("", obj, model=self.model))
+                        break
+        except LLMError:
+            raise
+        except httpx.TimeoutException as e:
+            raise LLMError(f"Ollama error: ReadTimeout({repr(e)})", timeout=True) from e
+        except Exception as e:
+            raise LLMError(f"Ollama error: {repr(e)}") from e
 
 
 class OpenAICompatClient(BaseLLMClient):
@@ -89,6 +810,8 @@ class OpenAICompatClient(BaseLLMClient):
     (может быть OpenAI, или другой провайдер с тем же контрактом)
     """
 
+    backend = "openai"
+
     def __init__(self) -> None:
         """Initialize client from settings and verify API key."""
         s = get_settings()
@@ -96,45 +819,96 @@ class OpenAICompatClient(BaseLLMClient):
         self.api_key = s.openai_api_key
         self.model = s.openai_model
         if not self.api_key:
-            raise LLMError("OPENAI_API_KEY is not set for openai mode.")
+            raise LLMError("OPENAI_API_KEY is not set for openai mode.", retryable=False)
 
-    async def generate(self, prompt: str, timeout_s: float = 60.0) -> str:
-        """Generate text via an OpenAI-compatible chat endpoint."""
-        url = f"{self.base_url}/chat/completions"
-        headers = {
+    def _default_headers(self) -> Optional[dict[str, str]]:
+        """Auth headers for the OpenAI-compatible API."""
+        return {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
         }
 
+    def _payload(self, prompt: Prompt, stream: bool) -> dict[str, Any]:
+        """Build the chat/completions request body."""
+        if isinstance(prompt, ChatPrompt):
+            system, user = prompt.system, prompt.user
+        else:
+            system, user = "Отвечай на русском языке.", prompt
         payload: dict[str, Any] = {
             "model": self.model,
             "messages": [
-                {"role": "system", "content": "Отвечай на русском языке."},
-                {"role": "user", "content": prompt},
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
             ],
             "temperature": 0.2,
         }
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    async def _generate(self, prompt: Prompt, timeout_s: float = 60.0) -> LLMResponse:
+        """Generate text via an OpenAI-compatible chat endpoint."""
+        url = f"{self.base_url}/chat/completions"
+        payload = self._payload(prompt, stream=False)
 
         # Timeout protects the service from long-running upstream calls.
         try:
-            async with httpx.AsyncClient(timeout=httpx.Timeout(timeout_s)) as client:
-                resp = await client.post(url, headers=headers, json=payload)
-                resp.raise_for_status()
-                data = resp.json()
+            resp = await self._http_client().post(url, json=payload, timeout=httpx.Timeout(timeout_s))
+            resp.raise_for_status()
+            data = resp.json()
         except httpx.TimeoutException as e:
-            raise LLMError(f"OpenAI-compatible API error: ReadTimeout({repr(e)})") from e
+            raise LLMError(f"OpenAI-compatible API error: ReadTimeout({repr(e)})", timeout=True) from e
         except httpx.HTTPStatusError as e:
             body = e.response.text[:1200] if e.response is not None else ""
-            raise LLMError(f"OpenAI-compatible API error: HTTP {e.response.status_code}: {body}") from e
+            raise LLMError(
+                f"OpenAI-compatible API error: HTTP {e.response.status_code}: {body}",
+                status_code=e.response.status_code,
+            ) from e
         except Exception as e:
             raise LLMError(f"OpenAI-compatible API error: {repr(e)}") from e
 
         try:
             text = data["choices"][0]["message"]["content"]
         except Exception:
-            raise LLMError("OpenAI-compatible API returned unexpected format.")
+            raise LLMError("OpenAI-compatible API returned unexpected format.", retryable=False)
 
         if not isinstance(text, str):
-            raise LLMError("OpenAI-compatible API returned non-text content.")
-        return text.strip()
-    
\ No newline at end of file
+            raise LLMError("OpenAI-compatible API returned non-text content.", retryable=False)
+        return LLMResponse.from_openai(text.strip(), data, model=self.model)
+
+    async def _stream(self, prompt: Prompt, timeout_s: float = 60.0) -> AsyncIterator[str]:
+        """Stream text via chat/completions (SSE `data:` lines, `[DONE]` terminator)."""
+        url = f"{self.base_url}/chat/completions"
+        payload = self._payload(prompt, stream=True)
+
+        try:
+            async with self._http_client().stream(
+                "POST", url, json=payload, timeout=httpx.Timeout(timeout_s)
+            ) as resp:
+                if resp.status_code >= 400:
+                    body = (await resp.aread()).decode("utf-8", errors="replace")[:1200]
+                    raise LLMError(
+                        f"OpenAI-compatible API error: HTTP {resp.status_code}: {body}",
+                        status_code=resp.status_code,
+                    )
+                async for line in resp.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    obj = json.loads(data)
+                    if obj.get("usage"):
+                        # Sent (as the last chunk) only by servers that report stream usage.
+                        record_usage(self.backend, LLMResponse.from_openai("", obj, model=self.model))
+                    choices = obj.get("choices") or []
+                    delta = (choices[0].get("delta") or {}) if choices else {}
+                    piece = delta.get("content")
+                    if isinstance(piece, str) and piece:
+                        yield piece
+        except LLMError:
+            raise
+        except httpx.TimeoutException as e:
+            raise LLMError(f"OpenAI-compatible API error: ReadTimeout({repr(e)})", timeout=True) from e
+        except Exception as e:
+            raise LLMError(f"OpenAI-compatible API error: {repr(e)}") from e
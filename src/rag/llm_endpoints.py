@@ -0,0 +1,163 @@
+"""Routing across several LLM backend hosts (e.g. a few Ollama servers).
+
+- Weighted least-outstanding-requests: pick the healthy endpoint with the
+  lowest in-flight/weight ratio.
+- Passive health: consecutive failures eject an endpoint for a while; if
+  every endpoint is ejected, the one that comes back first is used.
+- Hedging support: a percentile of recent time-to-first-token tells the
+  client when to fire a second request at another endpoint.
+"""
+
+from __future__ import annotations
+
+import random
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Collection, Deque, Dict, List, Optional
+
+from src.core.logging import get_logger
+from src.core.metrics import REGISTRY
+
+log = get_logger(__name__)
+
+ENDPOINT_OUTSTANDING = REGISTRY.gauge(
+    "llm_endpoint_outstanding",
+    "In-flight requests per LLM endpoint.",
+    ("endpoint",),
+)
+ENDPOINT_EJECTIONS = REGISTRY.counter(
+    "llm_endpoint_ejections_total",
+    "Times an LLM endpoint was ejected after consecutive failures.",
+    ("endpoint",),
+)
+
+
+@dataclass(eq=False)
+class Endpoint:
+    """One backend host and its live routing state."""
+    url: str
+    weight: float = 1.0
+    outstanding: int = 0
+    failures: int = 0
+    ejected_until: float = 0.0
+    requests: int = 0
+    errors: int = 0
+
+    def healthy(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+
+def parse_endpoints(spec: str) -> List[Endpoint]:
+    """Parse "url[|weight], url[|weight], ..." into endpoints.
+
+    Example:
+        "http://gpu1:11434|2, http://gpu2:11434" -> weights 2 and 1
+    """
+    out: List[Endpoint] = []
+    for item in (spec or "").split(","):
+        item = item.strip()
+        if not item:
+            continue
+        url, _, weight = item.partition("|")
+        w = float(weight) if weight.strip() else 1.0
+        if w <= 0:
+            raise ValueError(f"Endpoint weight must be > 0: {item!r}")
+        out.append(Endpoint(url=url.strip().rstrip("/"), weight=w))
+    return out
+
+
+class EndpointPool:
+    """Pick endpoints, track outstanding requests and passive health."""
+
+    def __init__(
+        self,
+        endpoints: List[Endpoint],
+        eject_failures: int = 3,
+        eject_s: float = 30.0,
+        ttft_window: int = 200,
+    ) -> None:
+        """Create a pool; eject an endpoint for eject_s after eject_failures in a row."""
+        if not endpoints:
+            raise ValueError("EndpointPool needs at least one endpoint.")
+        self.endpoints = endpoints
+        self.eject_failures = max(1, int(eject_failures))
+        self.eject_s = float(eject_s)
+        self._ttft: Deque[float] = deque(maxlen=max(1, int(ttft_window)))
+
+    def pick(self, exclude: Collection[Endpoint] = ()) -> Optional[Endpoint]:
+        """Return the least loaded healthy endpoint (None if all are excluded)."""
+        candidates = [ep for ep in self.endpoints if ep not in exclude]
+        if not candidates:
+            return None
+        now = time.monotonic()
+        healthy = [ep for ep in candidates if ep.healthy(now)]
+        if not healthy:
+            # Fail open: everything is ejected, try the one that returns first.
+            return min(candidates, key=lambda ep: ep.ejected_until)
+        best = min(ep.outstanding / ep.weight for ep in healthy)
+        return random.choice([ep for ep in healthy if ep.outstanding / ep.weight == best])
+
+    @property
+    def total_weight(self) -> float:
+        """Sum of endpoint weights (capacity of the pool in single-host units)."""
+        return sum(ep.weight for ep in self.endpoints)
+
+    def healthy_count(self) -> int:
+        now = time.monotonic()
+        return sum(1 for ep in self.endpoints if ep.healthy(now))
+
+    @contextmanager
+    def track(self, ep: Endpoint):
+        """Count a request as outstanding on ep for the duration of the block."""
+        ep.outstanding += 1
+        ep.requests += 1
+        ENDPOINT_OUTSTANDING.set(ep.outstanding, endpoint=ep.url)
+        try:
+            yield ep
+        finally:
+            ep.outstanding -= 1
+            ENDPOINT_OUTSTANDING.set(ep.outstanding, endpoint=ep.url)
+
+    def report_success(self, ep: Endpoint) -> None:
+        ep.failures = 0
+        ep.ejected_until = 0.0
+
+    def report_failure(self, ep: Endpoint) -> None:
+        """Count a failure; eject after `eject_failures` in a row."""
+        ep.failures += 1
+        ep.errors += 1
+        if ep.failures >= self.eject_failures and len(self.endpoints) > 1:
+            ep.ejected_until = time.monotonic() + self.eject_s
+            ep.failures = 0
+            ENDPOINT_EJECTIONS.inc(endpoint=ep.url)
+            log.warning("LLM endpoint %s ejected for %.0fs after repeated failures.", ep.url, self.eject_s)
+
+    def record_ttft(self, seconds: float) -> None:
+        self._ttft.append(float(seconds))
+
+    def ttft_percentile(self, pct: float, min_samples: int = 20) -> Optional[float]:
+        """Return the pct-th percentile of recent TTFT (None if too few samples)."""
+        if len(self._ttft) < min_samples:
+            return None
+        data = sorted(self._ttft)
+        idx = min(len(data) - 1, max(0, int(round(pct / 100.0 * (len(data) - 1)))))
+        return data[idx]
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "endpoints": [
+                {
+                    "url": ep.url,
+                    "weight": ep.weight,
+                    "outstanding": ep.outstanding,
+                    "healthy": ep.healthy(now),
+                    "requests": ep.requests,
+                    "errors": ep.errors,
+                }
+                for ep in self.endpoints
+            ],
+            "ttft_samples": len(self._ttft),
+        }
@@ -0,0 +1,86 @@
+"""Relevance gate: skip the LLM when retrieval found nothing on topic.
+
+The best hit score (cosine similarity, vectors are normalised) is compared
+with a threshold. Where the threshold comes from:
+    RELEVANCE_MIN_SCORE   explicit setting
+    index_meta.json       "relevance.min_score", written by
+                          `python -m scripts.build_index --calibrate-relevance`
+    DEFAULT_MIN_SCORE     otherwise
+
+Calibration searches the index with off-topic probe questions: their best
+scores are what "nothing relevant" looks like for this corpus and model.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+import numpy as np
+
+from src.core.metrics import REGISTRY
+
+NO_ANSWER = "В базе документов нет релевантного ответа по этому вопросу."
+
+DEFAULT_MIN_SCORE = 0.30
+
+RELEVANCE_GATED = REGISTRY.counter(
+    "relevance_gated_total",
+    "Requests answered with the standard no-answer response (no hit passed the score threshold).",
+    ("endpoint",),
+)
+
+# Questions a marketplace support corpus has no answer to.
+OFF_TOPIC_PROBES = (
+    "Какая завтра погода в Москве?",
+    "Как сварить борщ?",
+    "Кто выиграл чемпионат мира по футболу?",
+    "Сколько лет Солнцу?",
+    "Как быстро выучить английский язык?",
+    "Напиши стихотворение про осень.",
+    "Как настроить домашний Wi-Fi роутер?",
+    "Что такое квантовая запутанность?",
+    "Посоветуй хороший фильм на вечер.",
+    "Как приготовить кофе в турке?",
+    "Какая столица Австралии?",
+    "Как похудеть к лету?",
+    "Расскажи анекдот.",
+    "Когда была Куликовская битва?",
+    "Как поменять масло в двигателе?",
+    "Сколько спутников у Юпитера?",
+    "Как ухаживать за кактусом?",
+    "Переведи на французский: доброе утро.",
+    "Какие упражнения полезны для спины?",
+    "Как работает двигатель внутреннего сгорания?",
+)
+
+
+def resolve_min_score(setting: Optional[float], index_meta: Dict[str, Any]) -> float:
+    """Threshold for an index: explicit setting, else calibrated, else default."""
+    if setting is not None:
+        return float(setting)
+    calibrated = (index_meta.get("relevance") or {}).get("min_score")
+    if isinstance(calibrated, (int, float)):
+        return float(calibrated)
+    return DEFAULT_MIN_SCORE
+
+
+def calibrate_min_score(off_topic_top1: Sequence[float], quantile: float = 0.95, margin: float = 0.02) -> float:
+    """Threshold just above the best scores that off-topic probes reach."""
+    if not off_topic_top1:
+        return DEFAULT_MIN_SCORE
+    return round(float(np.quantile(np.asarray(off_topic_top1, dtype=np.float64), quantile)) + margin, 4)
+
+
+def is_relevant(scores: Iterable[float], min_score: Optional[float]) -> bool:
+    """True if any score reaches min_score (always True when the gate is off)."""
+    if min_score is None:
+        return True
+    return any(s >= min_score for s in scores)
+
+
+def gate(scores: Iterable[float], min_score: Optional[float], endpoint: str) -> bool:
+    """Return True (and count it) if the request should get the no-answer response."""
+    if is_relevant(scores, min_score):
+        return False
+    RELEVANCE_GATED.inc(endpoint=endpoint)
+    return True
@@ -0,0 +1,97 @@
+"""Dedicated bounded executor for CPU-bound retrieval work.
+
+Query embedding and FAISS search are synchronous and CPU-heavy. Running
+them on the event loop blocks every other request (including /health),
+so async handlers hand them to this pool instead. The pool has a fixed
+number of workers and a bounded backlog: once `max_queue` tasks are
+waiting, new work is rejected with `RetrievalOverloaded` (HTTP 503).
+
+Threads are used rather than processes: the encoder (torch) and FAISS
+release the GIL in their hot loops, and the model/index stay shared.
+"""
+
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from src.core.errors import ServiceOverloaded
+
+
+class RetrievalOverloaded(ServiceOverloaded):
+    """Retrieval backlog is full."""
+    pass
+
+
+class RetrievalExecutor(Executor):
+    """ThreadPoolExecutor with a queue-depth limit and in-flight/queued counters."""
+
+    def __init__(self, max_workers: int = 2, max_queue: int = 64) -> None:
+        """Create a pool of max_workers threads accepting max_queue waiting tasks."""
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="retrieval")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.cancelled = 0
+
+    def submit(self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any) -> Future:
+        """Schedule fn(*args, **kwargs); raise RetrievalOverloaded if the backlog is full."""
+        with self._lock:
+            # Free workers absorb new tasks; beyond that at most max_queue may wait.
+            if self.queued + self.in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise RetrievalOverloaded(
+                    f"Retrieval queue is full ({self.queued} waiting). Try again later.",
+                    retry_after_s=1.0,
+                )
+            self.queued += 1
+
+        def _run() -> Any:
+            with self._lock:
+                self.queued -= 1
+                self.in_flight += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+                    self.completed += 1
+
+        def _on_done(fut: Future) -> None:
+            # A future cancelled while waiting never runs `_run`: free its queue slot here.
+            # (Once `_run` has started the future can no longer be cancelled.)
+            if fut.cancelled():
+                with self._lock:
+                    self.queued -= 1
+                    self.cancelled += 1
+
+        try:
+            fut = self._pool.submit(_run)
+        except BaseException:
+            with self._lock:
+                self.queued -= 1
+            raise
+        fut.add_done_callback(_on_done)
+        return fut
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        """Shut down the underlying pool."""
+        self._pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+    def stats(self) -> Dict[str, int]:
+        """Return pool size, in-flight/queued counts and totals (cancelled = dropped while queued)."""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "cancelled": self.cancelled,
+            }
@@ -2,17 +2,24 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
-import math
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 import numpy as np
 
+from src.core.cache import TTLCache, normalize_query
 from src.core.config import get_settings
+from src.core.deadline import check as check_deadline, with_deadline
 from src.core.logging import get_logger
 from src.ingest.embedder_hf import HFEmbedder
+from src.rag.embed_batcher import EmbeddingBatcher
+from src.rag.retrieval_executor import RetrievalExecutor
+from src.rag.relevance import resolve_min_score
+from src.rag.semantic_cache import SemanticAnswerCache
 from src.index.faiss_store import FaissStore, SearchHit
+from src.index.faq_store import FAQMatch, FAQStore
 
 log = get_logger(__name__)
 
@@ -22,7 +29,62 @@ class Retriever:
     def __init__(self) -> None:
         """Initialize retriever and validate index metadata."""
         self.settings = get_settings()
-        index_dir = Path(self.settings.index_dir).resolve()
+        self.index_dir = Path(self.settings.index_dir).resolve()
+        self.embedding_model_name: str = self.settings.embedding_model_name
+
+        # -------------------------------------------------------------------
+        # Section: Query caches
+        # -------------------------------------------------------------------
+        # Tier 1: normalised query -> query vector (skips the encoder).
+        # Tier 2: (query, top_k, index version) -> hit rows/scores (skips FAISS).
+        self.query_vec_cache: TTLCache[np.ndarray] = TTLCache(
+            self.settings.query_vec_cache_size,
+            self.settings.query_vec_cache_ttl_s,
+            name="query_vec",
+        )
+        self.result_cache: TTLCache[Tuple[Tuple[float, ...], Tuple[int, ...]]] = TTLCache(
+            self.settings.result_cache_size,
+            self.settings.result_cache_ttl_s,
+            name="retrieval_result",
+        )
+
+        self._load_index()
+
+        # Tier 3 (answers): near-duplicate questions over the same top chunks.
+        self.semantic_cache: Optional[SemanticAnswerCache] = None
+        if self.settings.semantic_cache_enabled:
+            self.semantic_cache = SemanticAnswerCache(
+                dim=int(self.store.index.d),
+                maxsize=self.settings.semantic_cache_size,
+                ttl_s=self.settings.semantic_cache_ttl_s,
+                threshold=self.settings.semantic_cache_threshold,
+                match_top_n=self.settings.semantic_cache_top_n,
+            )
+
+        # -------------------------------------------------------------------
+        # Section: Embedder init
+        # -------------------------------------------------------------------
+        self.embedder = HFEmbedder(self.embedding_model_name)
+
+        # Async callers run CPU-bound work (encoder, FAISS) on a bounded pool.
+        self.executor = RetrievalExecutor(
+            max_workers=self.settings.retrieval_workers,
+            max_queue=self.settings.retrieval_max_queue,
+        )
+
+        # Async callers share encoder passes via micro-batching.
+        self.batcher: Optional[EmbeddingBatcher] = None
+        if self.settings.embed_batching_enabled:
+            self.batcher = EmbeddingBatcher(
+                self.embedder.embed_texts,
+                max_batch=self.settings.embed_batch_max,
+                window_ms=self.settings.embed_batch_window_ms,
+                executor=self.executor,
+            )
+
+    def _load_index(self) -> None:
+        """Load the index from disk, validate metadata and apply search knobs."""
+        index_dir = self.index_dir
 
         # -------------------------------------------------------------------
         # Section: Index presence checks
@@ -40,14 +102,14 @@ class Retriever:
         # -------------------------------------------------------------------
         # Section: Load index and chunks
         # -------------------------------------------------------------------
-        self.store = FaissStore.load(index_dir)
+        self.store = FaissStore.load(index_dir, mmap=self.settings.index_mmap)
 
         # -------------------------------------------------------------------
         # Section: Embedding model compatibility
         # -------------------------------------------------------------------
         # We warn on model mismatch so callers can rebuild the index if needed.
-        model_name: str = self.settings.embedding_model_name
-        self.embedding_model_name: str = model_name
+        model_name: str = self.embedding_model_name
+        meta: dict = {}
 
         meta_path = index_dir / "index_meta.json"
         if meta_path.exists():
@@ -69,15 +131,92 @@ class Retriever:
                 if self.settings.rag_strict_index_meta:
                     raise RuntimeError(f"Failed to read index_meta.json: {e}") from e
                 log.warning("Failed to read index_meta.json: %s", e)
+        self.index_meta: dict = meta if isinstance(meta, dict) else {}
+
+        # Index version keys the result cache (and downstream answer caches).
+        stamp = self.index_meta.get("updated_at") or self.index_meta.get("created_at")
+        if not stamp:
+            stamp = str(faiss_path.stat().st_mtime_ns)
+        self.index_version: str = f"{stamp}:{len(self.store.records)}"
+
+        # FAQ question index built alongside the main one (optional).
+        self.faq: Optional[FAQStore] = None
+        if self.settings.faq_index_enabled:
+            self.faq = FAQStore.load(index_dir)
+            if self.faq is not None and self.faq.index.d != self.store.index.d:
+                log.warning("FAQ index dimension %d != main index %d; FAQ answers disabled.", self.faq.index.d, self.store.index.d)
+                self.faq = None
+
+        # Relevance gate threshold (None = gate off); may be calibrated per index.
+        self.relevance_min_score: Optional[float] = None
+        if self.settings.relevance_gate_enabled:
+            self.relevance_min_score = resolve_min_score(self.settings.relevance_min_score, self.index_meta)
 
         # -------------------------------------------------------------------
-        # Section: Embedder init
+        # Section: ANN runtime knobs
         # -------------------------------------------------------------------
-        self.embedder = HFEmbedder(self.embedding_model_name)
+        # nprobe/efSearch are not persisted by FAISS; they are applied on load.
+        self.search_params = self.store.set_search_params(
+            nprobe=self.settings.index_nprobe,
+            ef_search=self.settings.index_hnsw_ef_search,
+        )
+        log.info(
+            "Index loaded: type=%s load_mode=%s search_params=%s version=%s relevance_min_score=%s faq_pairs=%d",
+            self.store.params.index_type, self.store.load_mode, self.search_params, self.index_version, self.relevance_min_score,
+            len(self.faq) if self.faq is not None else 0,
+        )
+
+    def reload(self) -> str:
+        """Reload the index from disk and invalidate query caches.
+
+        Returns:
+            The new index version.
+        """
+        self._load_index()
+        self.result_cache.clear()
+        # Vectors do not depend on the index, but a rebuild may follow a
+        # model change; clearing both keeps invalidation simple.
+        self.query_vec_cache.clear()
+        if self.semantic_cache is not None:
+            self.semantic_cache.clear()
+        return self.index_version
+
+    def cache_stats(self) -> dict:
+        """Return hit/miss counters of both query cache tiers."""
+        return {
+            "query_vec": self.query_vec_cache.stats(),
+            "retrieval_result": self.result_cache.stats(),
+            "semantic_answer": self.semantic_cache.stats() if self.semantic_cache is not None else None,
+            "index_version": self.index_version,
+            "embed_batcher": self.batcher.stats() if self.batcher is not None else None,
+            "executor": self.executor.stats(),
+        }
+
+    def _embed_queries(self, texts: List[str], keys: List[str]) -> np.ndarray:
+        """Embed queries, reusing cached vectors; misses go in one encode call."""
+        vectors: List[Optional[np.ndarray]] = []
+        to_embed: dict[str, str] = {}
+        for text, key in zip(texts, keys):
+            v = self.query_vec_cache.get((key, self.embedding_model_name))
+            vectors.append(v)
+            if v is None and key not in to_embed:
+                to_embed[key] = text
+
+        fresh: dict[str, np.ndarray] = {}
+        if to_embed:
+            qv = self.embedder.embed_texts(list(to_embed.values()))  # (n, D)
+            for key, row in zip(to_embed.keys(), qv):
+                row = row.copy()
+                fresh[key] = row
+                if np.isfinite(row).all():
+                    self.query_vec_cache.set((key, self.embedding_model_name), row)
+
+        return np.stack([v if v is not None else fresh[k] for v, k in zip(vectors, keys)])
 
     def query_vector_norm(self, query: str) -> float:
         """Return L2 norm of a query embedding (for debugging)."""
-        v = self.embedder.embed_texts([query])
+        q = query.strip()
+        v = self._embed_queries([q], [normalize_query(q)])
         # v: (1, D)
         vv = v[0]
         n = float(np.linalg.norm(vv))
@@ -85,18 +224,129 @@ class Retriever:
 
     def search(self, query: str, top_k: int = 5) -> List[SearchHit]:
         """Search the index and return top-k hits."""
-        query = query.strip()
-        if len(query) < 2:
-            return []
+        return self.search_many([query], top_k=top_k)[0]
+
+    def search_many(self, queries: List[str], top_k: int = 5) -> List[List[SearchHit]]:
+        """Search many queries with one encoder pass and one FAISS call.
+
+        Cached results and cached query vectors are reused; only the
+        remaining queries reach the encoder/FAISS.
+
+        Returns:
+            One hit list per query, in input order. Queries that are too
+            short or produce a bad embedding get an empty list.
+        """
+        results: List[List[SearchHit]] = [[] for _ in queries]
+        cleaned = [q.strip() for q in queries]
+        keys = [normalize_query(q) for q in cleaned]
+        valid = [i for i, q in enumerate(cleaned) if len(q) >= 2]
+        if not valid:
+            return results
 
         top_k = max(1, min(int(top_k), 50))
 
-        qv = self.embedder.embed_texts([query])  # (1, D)
+        pending: List[int] = []
+        for i in valid:
+            cached = self.result_cache.get((keys[i], top_k, self.index_version))
+            if cached is not None:
+                results[i] = self.store.hits_for_rows(*cached)
+            else:
+                pending.append(i)
+        if not pending:
+            return results
+
+        qv = self._embed_queries([cleaned[i] for i in pending], [keys[i] for i in pending])  # (n, D)
+        found = self._search_vectors(qv, [cleaned[i] for i in pending], [keys[i] for i in pending], top_k)
+        for i, hits in zip(pending, found):
+            results[i] = hits
+        return results
+
+    def _search_vectors(self, qv: np.ndarray, texts: List[str], keys: List[str], top_k: int) -> List[List[SearchHit]]:
+        """Run FAISS for query vectors and fill the result cache."""
+        results: List[List[SearchHit]] = [[] for _ in texts]
 
         # Sanity checks: guard against NaN/Inf/zero vectors in embedding output.
-        s = float((qv * qv).sum())
-        if not math.isfinite(s) or s < 1e-12:
-            log.warning("Bad query embedding (nan/inf/zero). query=%r", query[:100])
+        sq = (qv * qv).sum(axis=1)
+        good = np.isfinite(sq) & (sq >= 1e-12)
+        for row in np.flatnonzero(~good).tolist():
+            log.warning("Bad query embedding (nan/inf/zero). query=%r", texts[row][:100])
+        if not good.any():
+            return results
+
+        rows = np.flatnonzero(good)
+        scores, hit_rows = self.store.search_rows(qv[rows], k=top_k)
+        for row, row_scores, row_hits in zip(rows.tolist(), scores.tolist(), hit_rows.tolist()):
+            self.result_cache.set((keys[row], top_k, self.index_version), (tuple(row_scores), tuple(row_hits)))
+            results[row] = self.store.hits_for_rows(row_scores, row_hits)
+        return results
+
+    async def asearch(self, query: str, top_k: int = 5) -> List[SearchHit]:
+        """Async search for request handlers.
+
+        Nothing CPU-heavy runs on the event loop: the query embedding goes
+        through the micro-batcher and FAISS runs on the retrieval executor.
+        Raises RetrievalOverloaded when the executor backlog is full.
+        """
+        q = query.strip()
+        if len(q) < 2:
             return []
 
-        return self.store.search(qv, k=top_k)
+        top_k = max(1, min(int(top_k), 50))
+        key = normalize_query(q)
+
+        cached = self.result_cache.get((key, top_k, self.index_version))
+        if cached is not None:
+            return self.store.hits_for_rows(*cached)
+
+        loop = asyncio.get_running_loop()
+        if self.batcher is None:
+            check_deadline("retrieval")
+            return await with_deadline(
+                loop.run_in_executor(self.executor, self.search, q, top_k), "retrieval"
+            )
+
+        vec = await self.aquery_vector(q)
+        # Past the deadline nothing is submitted; a running FAISS call is not
+        # interruptible, but the request stops waiting for it.
+        check_deadline("faiss")
+        found = await with_deadline(
+            loop.run_in_executor(self.executor, self._search_vectors, vec.reshape(1, -1), [q], [key], top_k),
+            "faiss",
+        )
+        return found[0]
+
+    async def amatch_faq(self, query: str) -> Optional[FAQMatch]:
+        """Return the stored FAQ answer whose question matches the query, if any.
+
+        Costs one (usually cached) query embedding plus an exact search over
+        a few hundred vectors, so it runs before retrieval and the LLM.
+        """
+        if self.faq is None or not len(self.faq):
+            return None
+        vec = await self.aquery_vector(query)
+        return self.faq.match(vec, self.settings.faq_match_threshold)
+
+    async def aquery_vector(self, query: str) -> np.ndarray:
+        """Return the (cached) query embedding without blocking the event loop."""
+        q = query.strip()
+        key = normalize_query(q)
+        vec = self.query_vec_cache.get((key, self.embedding_model_name))
+        if vec is not None:
+            return vec
+        if self.batcher is not None:
+            vec = (await with_deadline(self.batcher.embed(q), "embedding")).copy()
+            if np.isfinite(vec).all():
+                self.query_vec_cache.set((key, self.embedding_model_name), vec)
+            return vec
+        check_deadline("embedding")
+        loop = asyncio.get_running_loop()
+        vecs = await with_deadline(
+            loop.run_in_executor(self.executor, self._embed_queries, [q], [key]), "embedding"
+        )
+        return vecs[0]
+
+    async def aclose(self) -> None:
+        """Stop background helpers (embedding batcher, retrieval executor)."""
+        if self.batcher is not None:
+            await self.batcher.aclose()
+        self.executor.shutdown(wait=False, cancel_futures=True)
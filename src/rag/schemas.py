@@ -8,6 +8,7 @@ from pydantic import BaseModel, Field
 class AskRequest(BaseModel):
     question: str = Field(min_length=2, max_length=2000)
     top_k: Optional[int] = Field(default=None, ge=1, le=20)
+    timeout_s: Optional[float] = Field(default=None, gt=0, le=600)
 
 
 class SourceItem(BaseModel):
@@ -20,3 +21,17 @@ class SourceItem(BaseModel):
 class AskResponse(BaseModel):
     answer: str
     sources: List[SourceItem]
+
+
+class SearchBatchRequest(BaseModel):
+    queries: List[str] = Field(min_length=1, max_length=256)
+    top_k: Optional[int] = Field(default=None, ge=1, le=50)
+
+
+class SearchBatchItem(BaseModel):
+    query: str
+    hits: List[SourceItem]
+
+
+class SearchBatchResponse(BaseModel):
+    results: List[SearchBatchItem]
@@ -0,0 +1,163 @@
+"""Semantic answer cache: reuse answers for near-duplicate questions.
+
+Query embeddings of answered questions live in a small exact FAISS index
+(inner product on normalised vectors = cosine). A new question reuses a
+stored answer only if
+    - cosine(query, cached query) >= threshold,
+    - its top retrieved chunks are the same as when the answer was made,
+    - the LLM/prompt scope matches and the entry has not expired.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+from src.core.metrics import REGISTRY
+
+SEMANTIC_CACHE_LOOKUPS = REGISTRY.counter(
+    "semantic_cache_lookups_total",
+    "Semantic answer cache lookups by result (hit, miss).",
+    ("result",),
+)
+
+
+@dataclass
+class _Entry:
+    answer: str
+    chunks: FrozenSet[Tuple[str, int]]
+    scope: str
+    expires_at: float
+
+
+def top_chunks(hits: Sequence[Any], n: int) -> FrozenSet[Tuple[str, int]]:
+    """Identity of the top-n retrieved chunks (order-insensitive)."""
+    return frozenset((h.record.source_path, int(h.record.chunk_id)) for h in hits[:n])
+
+
+class SemanticAnswerCache:
+    """Bounded LRU + TTL cache of answers indexed by query embedding."""
+
+    def __init__(
+        self,
+        dim: int,
+        maxsize: int = 512,
+        ttl_s: float = 3600.0,
+        threshold: float = 0.93,
+        match_top_n: int = 3,
+        candidates: int = 8,
+    ) -> None:
+        """Create an empty cache for dim-dimensional normalised query vectors.
+
+        Args:
+            dim: Query embedding dimension.
+            maxsize: Max stored answers (least recently used are evicted).
+            ttl_s: Entry lifetime.
+            threshold: Min cosine similarity to reuse an answer.
+            match_top_n: How many top chunks must coincide.
+            candidates: Nearest neighbours checked per lookup.
+        """
+        self.dim = int(dim)
+        self.maxsize = int(maxsize)
+        self.ttl_s = float(ttl_s)
+        self.threshold = float(threshold)
+        self.match_top_n = max(1, int(match_top_n))
+        self.candidates = max(1, int(candidates))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(self.dim))
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _remove(self, ids: Sequence[int]) -> None:
+        """Drop entries from the map and the FAISS index (lock held)."""
+        if not ids:
+            return
+        for i in ids:
+            self._entries.pop(i, None)
+        self._index.remove_ids(np.asarray(ids, dtype=np.int64))
+
+    def lookup(self, vector: np.ndarray, hits: Sequence[Any], scope: str) -> Optional[str]:
+        """Return a stored answer for a near-duplicate question, or None."""
+        if self.maxsize <= 0 or not hits:
+            return None
+        q = np.ascontiguousarray(vector, dtype=np.float32).reshape(1, -1)
+        chunks = top_chunks(hits, self.match_top_n)
+        now = time.monotonic()
+
+        with self._lock:
+            if self._index.ntotal == 0:
+                self.misses += 1
+                SEMANTIC_CACHE_LOOKUPS.inc(result="miss")
+                return None
+            scores, ids = self._index.search(q, min(self.candidates, self._index.ntotal))
+            expired = []
+            found: Optional[str] = None
+            for score, eid in zip(scores[0].tolist(), ids[0].tolist()):
+                if eid < 0 or score < self.threshold:
+                    break
+                entry = self._entries.get(eid)
+                if entry is None:
+                    continue
+                if entry.expires_at < now:
+                    expired.append(eid)
+                    continue
+                if entry.scope == scope and entry.chunks == chunks:
+                    self._entries.move_to_end(eid)
+                    found = entry.answer
+                    break
+            self._remove(expired)
+
+            if found is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        SEMANTIC_CACHE_LOOKUPS.inc(result="miss" if found is None else "hit")
+        return found
+
+    def add(self, vector: np.ndarray, hits: Sequence[Any], scope: str, answer: str) -> None:
+        """Store an answer for a question embedding and its retrieved chunks."""
+        if self.maxsize <= 0 or not hits or not answer:
+            return
+        q = np.ascontiguousarray(vector, dtype=np.float32).reshape(1, -1)
+        with self._lock:
+            eid = self._next_id
+            self._next_id += 1
+            self._index.add_with_ids(q, np.asarray([eid], dtype=np.int64))
+            self._entries[eid] = _Entry(
+                answer=answer,
+                chunks=top_chunks(hits, self.match_top_n),
+                scope=scope,
+                expires_at=time.monotonic() + self.ttl_s,
+            )
+            overflow = len(self._entries) - self.maxsize
+            if overflow > 0:
+                oldest = [k for k, _ in zip(self._entries.keys(), range(overflow))]
+                self._remove(oldest)
+                self.evictions += len(oldest)
+
+    def clear(self) -> None:
+        """Drop all entries (e.g. after an index reload)."""
+        with self._lock:
+            self._entries.clear()
+            self._index.reset()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return size and hit/miss counters."""
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_s": self.ttl_s,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
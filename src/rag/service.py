@@ -3,32 +3,39 @@
 from __future__ import annotations
 
 import os
-from typing import List
+from contextlib import aclosing
+from typing import AsyncIterator, List, Optional
 
 from src.core.config import get_settings
+from src.core.errors import DeadlineExceeded, ServiceOverloaded
 from src.core.logging import get_logger
-from src.rag.llm_clients import LLMError, OllamaClient, OpenAICompatClient
+from src.rag.context_builder import build_context
+from src.rag.llm_clients import (
+    BaseLLMClient,
+    ChatPrompt,
+    LLMError,
+    OllamaClient,
+    OpenAICompatClient,
+    Prompt,
+)
 
 log = get_logger(__name__)
 
+# Bump whenever build_context or the prompt builders change: it is part of the answer cache key.
+PROMPT_TEMPLATE_VERSION = "ask-v2"
 
-def _build_context(hits, max_chars: int = 3500) -> str:
-    """Assemble context blocks from hits with a character budget."""
-    parts: list[str] = []
-    total = 0
+# Fixed parts of the "chat" layout: identical for every request (KV-cache prefix).
+CHAT_SYSTEM_PROMPT = "Ты помощник службы поддержки маркетплейса. Отвечай на русском."
+CHAT_INSTRUCTIONS = (
+    "Используй ТОЛЬКО контекст ниже.\n"
+    "Если ответа нет в контексте — так и скажи и уточни, какой информации не хватает.\n\n"
+)
 
-    for h in hits:
-        src = h.record.source_path
-        cid = h.record.chunk_id
-        snippet = h.record.text.strip()
 
-        block = f"[SOURCE: {src} | chunk={cid}]\n{snippet}\n"
-        if total + len(block) > max_chars:
-            break
-        parts.append(block)
-        total += len(block)
-
-    return "\n".join(parts).strip()
+def prompt_template_version() -> str:
+    """Answer cache key part: template version plus the configured prompt layout."""
+    layout = get_settings().prompt_layout
+    return PROMPT_TEMPLATE_VERSION if layout == "generate" else f"{PROMPT_TEMPLATE_VERSION}-{layout}"
 
 
 def _build_prompt(question: str, context: str) -> str:
@@ -43,13 +50,34 @@ def _build_prompt(question: str, context: str) -> str:
     )
 
 
-async def generate_answer(question: str, hits, llm_mode: str | None = None) -> str:
+def _build_chat_prompt(question: str, context: str) -> ChatPrompt:
+    """Same instructions as `_build_prompt`, fixed parts first, question last."""
+    return ChatPrompt(
+        system=CHAT_SYSTEM_PROMPT,
+        user=f"{CHAT_INSTRUCTIONS}Контекст:\n{context}\n\nВопрос:\n{question}",
+    )
+
+
+def build_prompt(question: str, context: str) -> Prompt:
+    """Prompt in the configured PROMPT_LAYOUT."""
+    if get_settings().prompt_layout == "chat":
+        return _build_chat_prompt(question, context)
+    return _build_prompt(question, context)
+
+
+async def generate_answer(
+    question: str,
+    hits,
+    llm_mode: str | None = None,
+    client: Optional[BaseLLMClient] = None,
+) -> str:
     """Generate an answer for a question using retrieved hits.
 
     Args:
         question: User question.
         hits: Search hits to include in context.
         llm_mode: "ollama" or "openai" (falls back to settings/env when None).
+        client: Shared (pooled) LLM client; a one-off client is created when None.
     """
     settings = get_settings()
 
@@ -57,19 +85,34 @@ async def generate_answer(question: str, hits, llm_mode: str | None = None) -> s
     if mode not in ("ollama", "openai"):
         mode = "ollama"
 
-    context = _build_context(hits, max_chars=3500)
-    prompt = _build_prompt(question, context)
+    context = build_context(hits, max_tokens=get_settings().context_max_tokens)
+    prompt = build_prompt(question, context)
 
+    owned = client is None
     try:
-        if mode == "openai":
-            client = OpenAICompatClient()
-        else:
-            client = OllamaClient()
+        if client is None:
+            client = OpenAICompatClient() if mode == "openai" else OllamaClient()
 
-        # Timeout is conservative because Ollama can be slow on first request.
-        text = await client.generate(prompt, timeout_s=90.0)
+        # LLM_TIMEOUT_S is conservative because Ollama can be slow on first request.
+        text = await client.generate(prompt, timeout_s=settings.llm_timeout_s)
         return text.strip()
-    except LLMError:
+    except (LLMError, ServiceOverloaded, DeadlineExceeded):
+        # ServiceOverloaded covers LLMOverloaded and CircuitOpen (503 + Retry-After).
         raise
     except Exception as e:
         raise LLMError(str(e)) from e
+    finally:
+        if owned and client is not None:
+            await client.aclose()
+
+
+async def stream_answer(question: str, hits, client: BaseLLMClient) -> AsyncIterator[str]:
+    """Yield answer fragments for a question as the LLM produces them.
+
+    Same context and prompt as `generate_answer`; used by the SSE endpoints.
+    """
+    context = build_context(hits, max_tokens=get_settings().context_max_tokens)
+    prompt = build_prompt(question, context)
+    async with aclosing(client.stream(prompt, timeout_s=get_settings().llm_timeout_s)) as pieces:
+        async for piece in pieces:
+            yield piece